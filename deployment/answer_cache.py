@@ -0,0 +1,144 @@
+"""Cache jawaban di depan qa.invoke.
+
+Dua tingkat pencarian:
+1. Exact: kunci berupa teks pertanyaan yang sudah dinormalisasi
+2. Semantic: cosine similarity embedding pertanyaan >= threshold, dan token
+   berangka (nomor formulir/pasal) serta kata negasi sama persis: embedding
+   "SPT 1770S" vs "SPT 1770SS", atau "yang dapat" vs "yang tidak dapat",
+   hampir identik tetapi jawabannya berbeda
+
+Entri kedaluwarsa setelah TTL, dibatasi ukuran maksimum (LRU), dan seluruh
+cache dikosongkan ketika versi korpus FAQ berubah.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from normalization import guard_tokens, normalize_query
+
+
+class AnswerCache:
+    def __init__(self, max_size=1000, ttl=86400, similarity_threshold=0.95, corpus_version=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.corpus_version = corpus_version
+        # key -> (answer, unit embedding atau None, waktu simpan)
+        self._entries = OrderedDict()
+        self._matrix = None
+        self._matrix_keys = []
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def get(self, query, embedding=None):
+        """Jawaban tersimpan untuk query, atau None.
+
+        Tier semantic hanya dipakai jika embedding query diberikan.
+        """
+        key = normalize_query(query)
+        with self._lock:
+            answer = self._get_exact(key)
+            if answer is not None:
+                self.exact_hits += 1
+                return answer
+            if embedding is not None:
+                answer = self._get_semantic(key, embedding)
+                if answer is not None:
+                    self.semantic_hits += 1
+                    return answer
+            self.misses += 1
+            return None
+
+    def get_exact(self, query):
+        """Hanya tier exact, tanpa menghitung miss (embedding belum tersedia)"""
+        key = normalize_query(query)
+        with self._lock:
+            answer = self._get_exact(key)
+            if answer is not None:
+                self.exact_hits += 1
+            return answer
+
+    def put(self, query, answer, embedding=None):
+        key = normalize_query(query)
+        vector = _unit(embedding) if embedding is not None else None
+        with self._lock:
+            self._entries[key] = (answer, vector, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def set_corpus_version(self, version):
+        """Kosongkan cache jika korpus FAQ sudah berganti versi"""
+        with self._lock:
+            if version != self.corpus_version:
+                self.corpus_version = version
+                self._entries.clear()
+                self._matrix = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self):
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            total = hits + self.misses
+            return {
+                "size": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "similarity_threshold": self.similarity_threshold,
+                "corpus_version": self.corpus_version,
+            }
+
+    def _expired(self, stored_at):
+        return self.ttl is not None and time.monotonic() - stored_at > self.ttl
+
+    def _get_exact(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        answer, _, stored_at = entry
+        if self._expired(stored_at):
+            del self._entries[key]
+            self._matrix = None
+            return None
+        self._entries.move_to_end(key)
+        return answer
+
+    def _get_semantic(self, key, embedding):
+        if self._matrix is None:
+            for expired in [k for k, (_, _, stored_at) in self._entries.items() if self._expired(stored_at)]:
+                del self._entries[expired]
+            self._matrix_keys = [k for k, (_, v, _) in self._entries.items() if v is not None]
+            if not self._matrix_keys:
+                return None
+            self._matrix = np.stack([self._entries[k][1] for k in self._matrix_keys])
+        if not self._matrix_keys:
+            return None
+        keys = self._matrix_keys
+        scores = self._matrix @ _unit(embedding)
+        candidates = np.flatnonzero(scores >= self.similarity_threshold)
+        guards = guard_tokens(key)
+        # Urut skor: kandidat yang kedaluwarsa, beda nomor formulir atau beda negasi dilewati
+        for i in candidates[np.argsort(-scores[candidates])]:
+            if guard_tokens(keys[i]) != guards:
+                continue
+            answer = self._get_exact(keys[i])
+            if answer is not None:
+                return answer
+        return None
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
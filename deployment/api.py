@@ -0,0 +1,158 @@
+"""Server HTTP jawaban Astrax, terpisah dari UI Streamlit.
+
+Endpoint:
+    GET  /health   -> proses hidup
+    GET  /ready    -> engine sudah dibangun dan dipanaskan (503 jika belum)
+    GET  /stats    -> statistik cache, latensi, antrian
+    GET  /metrics  -> metrik Prometheus (jika ASTRAX_TELEMETRY berisi "prometheus")
+    POST /answer   -> {"query": "...", "stream": false, "history": null}
+                      history = ConversationMemory.history() untuk pertanyaan lanjutan
+                      stream=true mengirim NDJSON: {"token": ...} ... {"done": true, ...}
+
+Menjalankan server (setiap worker adalah proses terpisah dengan engine sendiri):
+    python api.py --host 0.0.0.0 --port 8000 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+import openai
+from pydantic import BaseModel
+
+import config
+from async_engine import Overloaded
+from engine import AstraxEngine
+from service import AnswerService
+
+
+class AnswerRequest(BaseModel):
+    query: str
+    stream: bool = False
+    history: Optional[dict] = None
+
+
+def create_engine():
+    # Default AstraxEngine = konfigurasi GPT-4 (k=3, score_threshold=0.78)
+    return AstraxEngine(streaming=config.STREAMING_ENABLED)
+
+
+async def start_service(app):
+    try:
+        # Konstruksi engine dan pemanasan bersifat blocking (MongoDB, embedding), jalankan di thread
+        engine = await asyncio.to_thread(create_engine)
+        service = AnswerService(engine)
+        await asyncio.to_thread(service.warm_up)
+        await service.awarm_up()
+        app.state.service = service
+    except Exception as e:
+        app.state.startup_error = str(e)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    app.state.service = None
+    app.state.startup_error = None
+    # Server langsung menjawab /health; /ready dan /answer baru aktif setelah pemanasan selesai
+    startup = asyncio.create_task(start_service(app))
+    yield
+    startup.cancel()
+    if app.state.service is not None:
+        await app.state.service.engine.aclose()
+
+
+app = FastAPI(title="Astrax Answering API", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def add_timing_header(request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    response.headers["Server-Timing"] = f"total;dur={(time.perf_counter() - started) * 1000:.1f}"
+    return response
+
+
+def get_service(request):
+    service = request.app.state.service
+    if service is None:
+        raise HTTPException(
+            status_code=503, detail=request.app.state.startup_error or "Engine sedang disiapkan (warmup)"
+        )
+    return service
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready(request: Request):
+    get_service(request)
+    return {"status": "ready"}
+
+
+@app.get("/stats")
+async def stats(request: Request):
+    return get_service(request).stats()
+
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    body = get_service(request).metrics()
+    if body is None:
+        raise HTTPException(status_code=404, detail="Telemetry tidak aktif (ASTRAX_TELEMETRY)")
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
+@app.post("/answer")
+async def answer(body: AnswerRequest, request: Request):
+    service = get_service(request)
+    query = body.query.strip()
+    if not query:
+        raise HTTPException(status_code=422, detail="Pertanyaan kosong")
+
+    if body.stream:
+        async def events():
+            try:
+                async for event in service.astream(query, history=body.history):
+                    yield json.dumps(event, ensure_ascii=False) + "\n"
+            except Overloaded as e:
+                yield json.dumps({"error": "overloaded", "detail": str(e)}) + "\n"
+            except openai.RateLimitError as e:
+                yield json.dumps({"error": "rate_limited", "detail": str(e)}) + "\n"
+            except Exception as e:
+                yield json.dumps({"error": type(e).__name__, "detail": str(e)}) + "\n"
+
+        return StreamingResponse(events(), media_type="application/x-ndjson")
+
+    try:
+        return await service.aanswer(query, history=body.history)
+    except Overloaded as e:
+        return JSONResponse(status_code=429, content={"error": "overloaded", "detail": str(e)})
+    except openai.RateLimitError as e:
+        # Batas OpenAI tetap terlampaui setelah retry (ratelimit.py)
+        return JSONResponse(
+            status_code=429,
+            content={"error": "rate_limited", "detail": str(e)},
+            headers={"Retry-After": str(config.RATE_LIMIT_RETRY_AFTER)}
+        )
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Server API jawaban Astrax")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=config.API_WORKERS)
+    args = parser.parse_args()
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
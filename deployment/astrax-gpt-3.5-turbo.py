@@ -1,13 +1,16 @@
+import openai
 import streamlit as st
-from pymongo import MongoClient
-from langchain_mongodb import MongoDBAtlasVectorSearch
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate
-from dotenv import load_dotenv
 from streamlit_option_menu import option_menu
-import os
-import re
+from engine import AstraxEngine
+from postprocess import BUSY_MESSAGE
+from prompts import MTAX_PROMPT
+from rendering import THEMES, apply_theme, get_renderer
+from telemetry import RequestTrace, get_registry
+from warmup import warm_up, warmup_questions
+import config
+import time
+
+RERUN_STARTED = time.perf_counter()
 
 # --- Set Page Config First ---
 st.set_page_config(
@@ -17,85 +20,15 @@ st.set_page_config(
 )
 
 # Memilih Tema
-theme_choice = st.sidebar.selectbox("Pilih Tema:", ["Light ☀️", "Dark 🌙"])
-
-# Menggunakan tema yang diinginkan
-if theme_choice == "Light ☀️":
-    primary_color = "#2A5C82"
-    secondary_color = "#F0F4F8"
-    accent_color = "#FF6B35"
-    sidebar_bg = "#ffffff"
-    sidebar_text = "#000000"
-    selected_bg = "#2A5C82"
-    selected_text = "#ffffff"
-    text_color = "#ffffff"
-    bg_color = "#f8f9fa"
-    header = "#F0F4F8"
-elif theme_choice == "Dark 🌙":
-    primary_color = "#ffffff"
-    secondary_color = "#1E1E1E"
-    accent_color = "#FF6B35"
-    sidebar_bg = "#0e1117"
-    sidebar_text = "#ffffff"
-    selected_bg = "#f39c12"
-    selected_text = "#000000"
-    text_color = "#000000"
-    bg_color = "#252422"
-    header = "#1E1E1E"
-
-
-# --- Custom CSS ---
-st.markdown(f"""
-<style>
-    :root {{
-        --primary: {primary_color};
-        --secondary: {secondary_color};
-        --accent: {accent_color};
-        --text: {text_color};
-    }}
-
-    .stApp {{
-        background-color: {bg_color};
-    }}
-
-    .header {{
-        padding: 1rem 0;
-        border-bottom: 2px solid var(--primary);
-        margin-bottom: 2rem;
-    }}
-
-    .chat-container {{
-        max-width: 800px;
-        margin: 0 auto;
-        padding: 1rem;
-    }}
-
-    .user-message {{
-        background: var(--secondary);
-        border-radius: 15px;
-        padding: 1rem;
-        margin: 0.5rem 0;
-        border: 1px solid #DEE2E6;
-    }}
-
-    .assistant-message {{
-        background: var(--primary);
-        color: var(--text);
-        border-radius: 15px;
-        padding: 1rem;
-        margin: 0.5rem 0;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        border: 1px solid #DEE2E6;
-    }}
+theme_choice = st.sidebar.selectbox("Pilih Tema:", list(THEMES))
 
-    .pdf-ref {{
-        color: var(--primary);
-        border-left: 3px solid var(--accent);
-        padding-left: 1rem;
-        margin-top: 1rem;
-    }}
-</style>
-""", unsafe_allow_html=True)
+# CSS tema hanya dibangun ulang saat pilihan tema berubah (rendering.py)
+theme = apply_theme(st, theme_choice)
+accent_color = theme["accent_color"]
+sidebar_bg = theme["sidebar_bg"]
+sidebar_text = theme["sidebar_text"]
+selected_bg = theme["selected_bg"]
+selected_text = theme["selected_text"]
 
 # Sidebar Menu
 with st.sidebar:
@@ -114,83 +47,29 @@ with st.sidebar:
         }
     )
 
-# Load Environment Variables
-load_dotenv()
-MONGODB_URI = os.environ.get("MONGO_URI")
-OPENAI_KEY = os.environ.get("OPENAI_API_KEY")
-
-# MongoDB Connection with Caching
+# Engine dibangun sekali per proses dan dipakai bersama oleh semua sesi
 @st.cache_resource
-def init_mongodb():
+def init_engine():
     try:
-        client = MongoClient(MONGODB_URI)
-        client.server_info()
-        return client['Astrax_db']['Astrax']
-    except Exception as e:
-        st.error(f"⚠️ Gagal terhubung ke database: {str(e)}")
-        st.stop()
-
-collection = init_mongodb()
-
-# Initialize Embeddings
-embeddings = OpenAIEmbeddings(openai_api_key=OPENAI_KEY)
-
-# Vector Store Configuration
-vector_store = MongoDBAtlasVectorSearch(
-    collection=collection,
-    embedding=embeddings,
-    index_name='vector_index'
-)
-
-# Model Definition
-llm = ChatOpenAI(model_name="gpt-3.5-turbo", openai_api_key=OPENAI_KEY, temperature=0)
-
-# Create Prompt
-template = """
-Anda adalah asisten digital resmi bernama M-Tax yang bekerja untuk Direktorat Jenderal Pajak Indonesia. 
-Tugas Anda adalah membantu wajib pajak memahami informasi perpajakan, khususnya yang berkaitan dengan layanan digital seperti M-Tax, e-filing, e-billing, dan sistem pajak online lainnya.
-
-Jawaban Anda harus:
-- Disampaikan dalam Bahasa Indonesia,
-- Ramah, sopan, dan profesional,
-- Berdasarkan informasi dari konteks yang tersedia,
-- Fokus pada topik perpajakan dan layanan digital DJP.
-
-Jika pertanyaan tidak relevan dengan perpajakan atau layanan resmi DJP, sampaikan dengan sopan bahwa Anda hanya dapat menjawab pertanyaan seputar pajak dan layanan digital pemerintah Indonesia.
-
----
-
-{context}
-
-**Pertanyaan dari pengguna:**
-{question}
-
-**Jawaban M-Tax:**
-"""
-
-prompt = PromptTemplate(
-    template=template, 
-    input_variables=[
-        'context', 
-        'question'])
-
-# Retrieval Chain with Error Handling
-@st.cache_resource
-def create_qa_chain():
-    try:
-        return RetrievalQA.from_chain_type(
-            llm=llm,chain_type="stuff",
-            retriever=vector_store.as_retriever(
-                search_type="similarity",
-                search_kwargs={"k": 3}
-                ),
-            chain_type_kwargs={"prompt": prompt}
+        engine = AstraxEngine(
+            model_name="gpt-3.5-turbo",
+            max_tokens=None,
+            prompt=MTAX_PROMPT,
+            search_kwargs={"k": 3},
+            embedding_kwargs={},
+            text_key="text",
+            server_selection_timeout_ms=None,
+            return_source_documents=False
         )
+        if config.WARMUP_ENABLED:
+            warm_up(engine, warmup_questions(), concurrency=config.WARMUP_CONCURRENCY)
+        return engine
     except Exception as e:
         st.error(f"⚠️ Gagal inisialisasi sistem: {str(e)}")
         st.stop()
 
-qa = create_qa_chain()
+engine = init_engine()
+qa = engine.qa
 
 # --- Streamlit UI ---
 if selected == "Chatbot":
@@ -227,26 +106,12 @@ if selected == "Chatbot":
             "content": "Selamat datang! Saya Astrax , asisten virtual Direktorat Jenderal Pajak. Bagaimana saya bisa membantu Anda hari ini?"
         }]
 
-    # Display Chat History
-    for message in st.session_state.messages:
-        if message["role"] == "user":
-            st.markdown(f"""
-            <div class="chat-container">
-                <div class="user-message">
-                    😀 <strong>Anda</strong><br>
-                    {message["content"]}
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        else:
-            st.markdown(f"""
-            <div class="chat-container">
-                <div class="assistant-message">
-                    🤖 <strong>Astrax</strong><br>
-                    {message["content"]}
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+    # Display Chat History: satu elemen, HTML per pesan dimemo (kunci hash isi) dan di-escape
+    render_started = time.perf_counter()
+    st.markdown(get_renderer().render_all(st.session_state.messages), unsafe_allow_html=True)
+    telemetry = get_registry()
+    if telemetry is not None:
+        telemetry.observe_span("render", time.perf_counter() - render_started)
 
     # Input Chat
     question = st.chat_input("Tulis pertanyaan pajak Anda di sini... (Contoh: Bagaimana cara reset password DJP Online?)")
@@ -257,16 +122,26 @@ if selected == "Chatbot":
         
         # Prepare Answer
         with st.spinner("Mencari informasi..."):
+            telemetry = get_registry()
+            trace = RequestTrace(question) if telemetry is not None else None
             try:
-                result = qa.invoke({"query": question})
+                result = qa.invoke({"query": question}, config={"callbacks": [trace] if trace else []})
                 answer = result['result'].strip()
+                if trace is not None:
+                    telemetry.record(trace.record())
 
                 with st.chat_message("assistant"):
                     st.markdown(answer)
                 st.session_state.messages.append({"role": "assistant", "content": answer})
 
             except Exception as e:
-                error_msg = f"Terjadi kesalahan sistem: {str(e)}\nSilakan coba lagi atau hubungi 1500200"
+                if trace is not None:
+                    telemetry.record(trace.record(error=e))
+                if isinstance(e, openai.RateLimitError):
+                    # Batas laju OpenAI tetap terlampaui setelah retry (ratelimit.py)
+                    error_msg = BUSY_MESSAGE
+                else:
+                    error_msg = f"Terjadi kesalahan sistem: {str(e)}\nSilakan coba lagi atau hubungi 1500200"
                 st.session_state.messages.append({"role": "assistant", "content": error_msg})
     
         st.rerun()
@@ -303,4 +178,12 @@ st.markdown("""
     <p style="margin: 0.5rem 0;">Direktorat Jenderal Pajak Republik Indonesia</p>
     <p style="margin: 0;">© 2025 Sistem Layanan Pajak Digital</p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# Waktu startup engine vs. biaya satu kali rerun (hanya render UI)
+with st.sidebar.expander("Performa"):
+    st.json({
+        "engine_build_ms": round(engine.build_seconds * 1000, 1),
+        "rerun_ms": round((time.perf_counter() - RERUN_STARTED) * 1000, 1),
+        "render_cache": get_renderer().stats()
+    })
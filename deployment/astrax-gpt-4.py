@@ -1,13 +1,20 @@
+import openai
 import streamlit as st
-from pymongo import MongoClient
-from langchain_mongodb import MongoDBAtlasVectorSearch
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate
-from dotenv import load_dotenv
 from streamlit_option_menu import option_menu
-import os
-import re
+from async_engine import Overloaded
+from client import AstraxClient, Busy
+from engine import AstraxEngine
+from memory import ConversationMemory, visible_messages
+from postprocess import BUSY_MESSAGE, SYSTEM_ERROR_MESSAGE
+from prompts import PROFESSIONAL_PROMPT
+from rendering import THEMES, apply_theme, get_renderer
+from service import AnswerService
+from streaming import StreamHandler
+from telemetry import get_registry
+import config
+import time
+
+RERUN_STARTED = time.perf_counter()
 
 # --- Set Page Config First ---
 st.set_page_config(
@@ -17,85 +24,15 @@ st.set_page_config(
 )
 
 # Memilih Tema
-theme_choice = st.sidebar.selectbox("Pilih Tema:", ["Light ☀️", "Dark 🌙"])
+theme_choice = st.sidebar.selectbox("Pilih Tema:", list(THEMES))
 
-# Menggunakan tema yang diinginkan
-if theme_choice == "Light ☀️":
-    primary_color = "#2A5C82"
-    secondary_color = "#F0F4F8"
-    accent_color = "#FF6B35"
-    sidebar_bg = "#ffffff"
-    sidebar_text = "#000000"
-    selected_bg = "#2A5C82"
-    selected_text = "#ffffff"
-    text_color = "#ffffff"
-    bg_color = "#f8f9fa"
-    header = "#F0F4F8"
-elif theme_choice == "Dark 🌙":
-    primary_color = "#ffffff"
-    secondary_color = "#1E1E1E"
-    accent_color = "#FF6B35"
-    sidebar_bg = "#0e1117"
-    sidebar_text = "#ffffff"
-    selected_bg = "#f39c12"
-    selected_text = "#000000"
-    text_color = "#000000"
-    bg_color = "#252422"
-    header = "#1E1E1E"
-
-
-# --- Custom CSS ---
-st.markdown(f"""
-<style>
-    :root {{
-        --primary: {primary_color};
-        --secondary: {secondary_color};
-        --accent: {accent_color};
-        --text: {text_color};
-    }}
-
-    .stApp {{
-        background-color: {bg_color};
-    }}
-
-    .header {{
-        padding: 1rem 0;
-        border-bottom: 2px solid var(--primary);
-        margin-bottom: 2rem;
-    }}
-
-    .chat-container {{
-        max-width: 800px;
-        margin: 0 auto;
-        padding: 1rem;
-    }}
-
-    .user-message {{
-        background: var(--secondary);
-        border-radius: 15px;
-        padding: 1rem;
-        margin: 0.5rem 0;
-        border: 1px solid #DEE2E6;
-    }}
-
-    .assistant-message {{
-        background: var(--primary);
-        color: var(--text);
-        border-radius: 15px;
-        padding: 1rem;
-        margin: 0.5rem 0;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        border: 1px solid #DEE2E6;
-    }}
-
-    .pdf-ref {{
-        color: var(--primary);
-        border-left: 3px solid var(--accent);
-        padding-left: 1rem;
-        margin-top: 1rem;
-    }}
-</style>
-""", unsafe_allow_html=True)
+# CSS tema hanya dibangun ulang saat pilihan tema berubah (rendering.py)
+theme = apply_theme(st, theme_choice)
+accent_color = theme["accent_color"]
+sidebar_bg = theme["sidebar_bg"]
+sidebar_text = theme["sidebar_text"]
+selected_bg = theme["selected_bg"]
+selected_text = theme["selected_text"]
 
 # Sidebar Menu
 with st.sidebar:
@@ -114,128 +51,62 @@ with st.sidebar:
         }
     )
 
-# Load Environment Variables
-load_dotenv()
-MONGODB_URI = os.environ.get("MONGO_URI")
-OPENAI_KEY = os.environ.get("OPENAI_API_KEY")
-
-# Initialize Embeddings
-embeddings = OpenAIEmbeddings(
-    model="text-embedding-3-small",
-    openai_api_key=OPENAI_KEY,
-    dimensions=1536
-)
-
-# MongoDB Connection with Caching
+# Backend jawaban: server API (thin client) atau engine in-process.
+# Keduanya dibangun sekali per proses dan dipakai bersama oleh semua sesi
 @st.cache_resource
-def init_mongodb():
+def init_backend():
+    if config.API_URL:
+        return AstraxClient(config.API_URL)
     try:
-        client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
-        client.server_info()
-        return client['Astrax_db']['Astrax']
-    except Exception as e:
-        st.error(f"⚠️ Gagal terhubung ke database: {str(e)}")
-        st.stop()
-
-collection = init_mongodb()
-
-# Vector Store Configuration
-vector_store = MongoDBAtlasVectorSearch(
-    collection=collection,
-    embedding=embeddings,
-    index_name='vector_index',
-    text_key="text"
-)
-
-# Template Prompt 
-PROFESSIONAL_PROMPT = PromptTemplate(
-    input_variables=["context", "question"],
-    template="""
-    Anda adalah Asisten Pajak Profesional Direktorat Jenderal Pajak Indonesia. 
-    Tugas utama:
-    1. Jawab pertanyaan pajak berdasarkan FAQ resmi DJP
-    2. Berikan panduan teknis pelaporan pajak dan masalah akun DJP Online
-    3. Jelaskan konsep perpajakan dengan bahasa sederhana
-    4. Bantu masalah teknis terkait layanan digital DJP
-    
-    Aturan jawaban:
-    - Hanya jawab pertanyaan terkait layanan pajak digital Indonesia
-    - Tolak tegas pertanyaan di luar lingkup pajak dengan sopan
-    - Gunakan format numerik untuk langkah prosedural
-    - Fokus pada poin penting
-    - Jangan cantumkan link/referensi apapun
-    
-    Konteks resmi:
-    {context}
-    
-    Pertanyaan: {question}
-    
-    Jawaban profesional:
-    """
-)
-
-# Model Configuration
-llm = ChatOpenAI(
-    model_name="gpt-4",
-    openai_api_key=OPENAI_KEY,
-    temperature=0,
-    max_tokens=800
-)
-
-# Retrieval Chain with Error Handling
-@st.cache_resource
-def create_qa_chain():
-    try:
-        return RetrievalQA.from_chain_type(
-            llm=llm,
-            chain_type="stuff",
-            retriever=vector_store.as_retriever(
-                search_type="similarity",
-                search_kwargs={"k": 3, "score_threshold": 0.78}
-            ),
-            chain_type_kwargs={"prompt": PROFESSIONAL_PROMPT},
-            return_source_documents=True
+        engine = AstraxEngine(
+            model_name="gpt-4",
+            max_tokens=800,
+            prompt=PROFESSIONAL_PROMPT,
+            search_kwargs={"k": 3, "score_threshold": 0.78},
+            streaming=config.STREAMING_ENABLED
         )
+        service = AnswerService(engine)
+        # Pertanyaan populer di-embed dan retrieval dipanaskan sebelum sesi pertama dilayani
+        service.warm_up()
+        return service
     except Exception as e:
         st.error(f"⚠️ Gagal inisialisasi sistem: {str(e)}")
         st.stop()
 
-qa = create_qa_chain()
+backend = init_backend()
 
-def clean_answer(raw_answer):
-    """Membersihkan jawaban dari referensi dan format khusus"""
-    # Format daftar bernomor
-    formatted = re.sub(r'(\d+\.)\s', r'\n\1 ', raw_answer)
-    # Hapus karakter khusus
-    cleaned = re.sub(r'[*_]{2}', '', formatted)
-    return cleaned.strip()
+def add_message(role, content):
+    # Riwayat chat dibatasi; pesan tertua dibuang (konteksnya sudah ada di ringkasan memori)
+    st.session_state.messages.append({"role": role, "content": content})
+    del st.session_state.messages[:-config.CHAT_HISTORY_MAX]
 
 def ask(query):
+    memory = st.session_state.memory
     try:
-        # Proses query langsung tanpa validasi awal
-        result = qa.invoke({"query": query})
-
-        if not result['source_documents']:
-            return "Informasi tidak ditemukan dalam database resmi. Silakan hubungi Kring Pajak 1500200"
-        else:
-            raw_answer = result['result'].strip()
-            answer = clean_answer(raw_answer)
-
-        # Tambahkan Respons Asisten
         with st.chat_message("assistant"):
-            st.markdown(answer)
-        st.session_state.messages.append({"role": "assistant", "content": answer})
-
-    except Exception as e:
-        error_msg = f"""
-        <div class="assistant-message">
-            ⚠️ Gangguan Sistem<br>
-            Mohon maaf, terjadi kesalahan teknis. Silakan coba lagi atau hubungi:<br>
-            • Hotline: 1500200<br>
-            • Email: djp@pajak.go.id
-        </div>
-        """
-        st.session_state.messages.append({"role": "assistant", "content": error_msg})
+            placeholder = st.empty()
+            handler = None
+            if config.STREAMING_ENABLED:
+                # Token ditampilkan begitu datang dari LLM
+                placeholder.markdown("Mencari informasi...")
+                handler = StreamHandler(placeholder.markdown)
+            result = backend.answer(query, stream_handler=handler, history=memory.history())
+
+            if not result["found"]:
+                return result["answer"]
+            answer = result["answer"]
+
+            # Tambahkan Respons Asisten
+            placeholder.markdown(answer)
+        add_message("assistant", answer)
+        # Pertanyaan mandiri hasil kondensasi yang disimpan, agar rujukan berantai tetap jelas
+        memory.add(result.get("question", query), answer)
+
+    except (openai.RateLimitError, Overloaded, Busy):
+        # Batas laju OpenAI / antrian penuh setelah retry: minta pengguna mengirim ulang
+        add_message("assistant", BUSY_MESSAGE)
+    except Exception:
+        add_message("assistant", SYSTEM_ERROR_MESSAGE)
     
 # --- Streamlit UI ---
 if selected == "Chatbot":
@@ -272,37 +143,41 @@ if selected == "Chatbot":
             "content": "Selamat datang! Saya Astrax , asisten virtual Direktorat Jenderal Pajak. Bagaimana saya bisa membantu Anda hari ini?"
         }]
 
-    # Display Chat History
-    for message in st.session_state.messages:
-        if message["role"] == "user":
-            st.markdown(f"""
-            <div class="chat-container">
-                <div class="user-message">
-                    😀 <strong>Anda</strong><br>
-                    {message["content"]}
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-        else:
-            st.markdown(f"""
-            <div class="chat-container">
-                <div class="assistant-message">
-                    🤖 <strong>Astrax</strong><br>
-                    {message["content"]}
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+    if "memory" not in st.session_state:
+        st.session_state.memory = ConversationMemory(
+            window=config.MEMORY_WINDOW,
+            summary_max_tokens=config.MEMORY_SUMMARY_TOKENS,
+            answer_max_tokens=config.MEMORY_ANSWER_TOKENS
+        )
+        st.session_state.chat_pages = 1
+
+    # Display Chat History: hanya halaman terakhir, dirender dalam satu elemen
+    hidden, visible = visible_messages(
+        st.session_state.messages, st.session_state.chat_pages, config.CHAT_PAGE_SIZE
+    )
+    if hidden and st.button(f"Tampilkan pesan sebelumnya ({hidden})"):
+        st.session_state.chat_pages += 1
+        st.rerun()
+    # HTML per pesan dimemo (kunci hash isi) dan isi pesan di-escape
+    render_started = time.perf_counter()
+    st.markdown(get_renderer().render_all(visible), unsafe_allow_html=True)
+    telemetry = get_registry()
+    if telemetry is not None:
+        telemetry.observe_span("render", time.perf_counter() - render_started)
 
     # Input Chat
     prompt = st.chat_input("Tulis pertanyaan pajak Anda di sini... (Contoh: Bagaimana cara reset password DJP Online?)")
 
     if prompt:
         # Add User Message
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        add_message("user", prompt)
         
         # Prepare Answer
-        with st.spinner("Mencari informasi..."):
+        if config.STREAMING_ENABLED:
             ask(prompt)
+        else:
+            with st.spinner("Mencari informasi..."):
+                ask(prompt)
     
         st.rerun()
 
@@ -339,3 +214,12 @@ st.markdown("""
     <p style="margin: 0;">© 2025 Sistem Layanan Pajak Digital</p>
 </div>
 """, unsafe_allow_html=True)
+
+# Waktu startup engine vs. biaya satu kali rerun (hanya render UI),
+# plus statistik cache dan latensi dari backend
+with st.sidebar.expander("Performa"):
+    rerun_ms = round((time.perf_counter() - RERUN_STARTED) * 1000, 1)
+    try:
+        st.json({"rerun_ms": rerun_ms, "render_cache": get_renderer().stats(), **backend.stats()})
+    except Exception as e:
+        st.json({"rerun_ms": rerun_ms, "render_cache": get_renderer().stats(), "stats_error": str(e)})
@@ -0,0 +1,209 @@
+"""Jalur jawaban asyncio untuk melayani banyak percakapan sekaligus.
+
+- Retrieval Atlas memakai driver async PyMongo (AsyncMongoClient) dan
+  embedding async, generasi memakai ChatOpenAI.ainvoke lewat chain.ainvoke
+- Jumlah request yang diproses bersamaan dibatasi semaphore; request yang
+  menunggu dibatasi panjang antrian, kelebihannya ditolak (Overloaded)
+
+Objek di modul ini terikat ke satu event loop yang berumur panjang
+(mis. server API atau load test), bukan ke rerun Streamlit.
+"""
+import asyncio
+import time
+from typing import Callable, Optional
+
+from langchain_core.retrievers import BaseRetriever
+from langchain.chains import RetrievalQA
+
+import config
+from context import BudgetedRetriever
+from engine import DB_NAME, COLLECTION_NAME, INDEX_NAME, to_document, vector_search_pipeline
+from hybrid import candidate_search_kwargs, create_hybrid_retriever
+from model_router import create_routed_qa
+from retrieval_cache import VectorSearchRetriever
+from telemetry import areport_spans, report_spans
+from topic_router import create_routed_retriever
+from postprocess import NOT_FOUND_MESSAGE, clean_answer
+
+
+class Overloaded(Exception):
+    """Antrian request penuh, klien sebaiknya mencoba lagi nanti"""
+
+
+class AsyncAtlasRetriever(BaseRetriever):
+    """Retriever $vectorSearch di atas koleksi AsyncMongoClient.
+
+    invoke() sinkron (warmup, tooling) memakai search, pencarian sinkron
+    dengan signature yang sama (mis. engine.search_by_vector).
+    """
+
+    collection: object
+    embeddings: object
+    search: Callable
+    index_name: str = INDEX_NAME
+    text_key: str = "text"
+    embedding_key: str = "embedding"
+    search_kwargs: dict = {"k": 4}
+    oversampling_factor: int = 10
+    max_time_ms: Optional[int] = None
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _search_args(self, query_vector):
+        return (
+            query_vector,
+            self.search_kwargs.get("k", 4),
+            self.search_kwargs.get("score_threshold"),
+            self.search_kwargs.get("pre_filter")
+        )
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        started = time.perf_counter()
+        query_vector = self.embeddings.embed_query(query)
+        embedded = time.perf_counter()
+        documents = self.search(*self._search_args(query_vector))
+        report_spans(run_manager, embed=embedded - started, vector_search=time.perf_counter() - embedded)
+        return documents
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        started = time.perf_counter()
+        query_vector = await self.embeddings.aembed_query(query)
+        embedded = time.perf_counter()
+        documents = await self.asearch_by_vector(*self._search_args(query_vector))
+        await areport_spans(run_manager, embed=embedded - started, vector_search=time.perf_counter() - embedded)
+        return documents
+
+    async def asearch_by_vector(self, query_vector, k=4, score_threshold=None, pre_filter=None):
+        pipeline = vector_search_pipeline(
+            query_vector, k, score_threshold, pre_filter,
+            index_name=self.index_name,
+            embedding_key=self.embedding_key,
+            oversampling_factor=self.oversampling_factor
+        )
+        aggregate_kwargs = {"maxTimeMS": self.max_time_ms} if self.max_time_ms else {}
+        cursor = await self.collection.aggregate(pipeline, **aggregate_kwargs)
+        return [to_document(doc, self.text_key) async for doc in cursor]
+
+
+def create_async_retriever(engine, search_kwargs):
+    """Retriever async sesuai backend engine (routing topik / hybrid / budget konteks seperti engine)"""
+    if engine.retriever_backend != "atlas":
+        # Index lokal: pencarian NumPy cukup cepat, dijalankan di thread executor
+        return engine.retriever
+
+    from pymongo import AsyncMongoClient
+
+    # Satu klien per engine (dipakai ulang antar answerer), ditutup engine.aclose()
+    if engine.async_mongo_client is None:
+        engine.async_mongo_client = AsyncMongoClient(config.MONGODB_URI, maxPoolSize=config.MONGO_MAX_POOL_SIZE)
+    client = engine.async_mongo_client
+    retriever = AsyncAtlasRetriever(
+        collection=client[DB_NAME][COLLECTION_NAME],
+        embeddings=engine.embeddings,
+        search=engine.search_by_vector,
+        search_kwargs=candidate_search_kwargs(search_kwargs) if engine.lexical_index else search_kwargs
+    )
+    asearch = retriever.asearch_by_vector
+    if engine.shards is not None:
+        def shard_asearch(shard):
+            return AsyncAtlasRetriever(
+                collection=client[shard.spec.get("db", DB_NAME)][shard.spec.get("collection", COLLECTION_NAME)],
+                embeddings=engine.embeddings,
+                search=shard.search,
+                index_name=shard.spec.get("index", INDEX_NAME),
+                max_time_ms=int(shard.timeout * 1000)
+            ).asearch_by_vector
+
+        # Fan-out async: asyncio.wait_for per shard
+        engine.shards.attach_async(shard_asearch)
+        asearch = engine.shards.asearch
+    if engine.retrieval_cache is not None:
+        # Cache yang sama dengan jalur sinkron engine (retrieval_cache.py)
+        asearch = engine.retrieval_cache.wrap_async(asearch)
+    if engine.shards is not None or engine.retrieval_cache is not None:
+        retriever = VectorSearchRetriever(
+            embeddings=engine.embeddings,
+            search=engine.search_by_vector,
+            asearch=asearch,
+            search_kwargs=retriever.search_kwargs
+        )
+    if engine.topic_router is not None:
+        retriever = create_routed_retriever(engine, engine.topic_router, retriever.search_kwargs, asearch=asearch)
+    if engine.lexical_index is not None:
+        retriever = create_hybrid_retriever(retriever, engine.lexical_index, search_kwargs)
+    if engine.context_builder is not None:
+        retriever = BudgetedRetriever(retriever=retriever, builder=engine.context_builder)
+    return retriever
+
+
+class AsyncAnswerer:
+    def __init__(self, qa, max_concurrency=16, max_queue=256):
+        self.qa = qa
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.waiting = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def answer(self, query, callbacks=None):
+        """Jawab satu pertanyaan; raise Overloaded jika antrian penuh"""
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(f"Antrian penuh ({self.waiting} request menunggu)")
+
+        queued = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        started = time.perf_counter()
+        self.active += 1
+        try:
+            invoke_config = {"callbacks": callbacks} if callbacks else None
+            result = await self.qa.ainvoke({"query": query}, config=invoke_config)
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+        sources = result.get("source_documents", [])
+        answer = clean_answer(result["result"]) if sources else NOT_FOUND_MESSAGE
+        self.completed += 1
+        return {
+            "answer": answer,
+            "sources": [doc.metadata.get("Question") for doc in sources],
+            "queue_seconds": started - queued,
+            "seconds": time.perf_counter() - started,
+        }
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+def create_async_answerer(engine, search_kwargs=None, max_concurrency=None, max_queue=None):
+    """AsyncAnswerer yang memakai LLM, prompt dan embedding milik engine"""
+    retriever = create_async_retriever(engine, search_kwargs or engine.search_kwargs)
+    if engine.model_router is not None:
+        qa = create_routed_qa(retriever, engine.fast_llm, engine.llm, engine.prompt, engine.model_router)
+    else:
+        qa = RetrievalQA.from_chain_type(
+            llm=engine.llm,
+            chain_type="stuff",
+            retriever=retriever,
+            chain_type_kwargs={"prompt": engine.prompt},
+            return_source_documents=True
+        )
+    return AsyncAnswerer(
+        qa,
+        max_concurrency=max_concurrency or config.ASYNC_MAX_CONCURRENCY,
+        max_queue=max_queue or config.ASYNC_MAX_QUEUE
+    )
@@ -0,0 +1,422 @@
+"""Mode batch: jawab ribuan pertanyaan sekaligus tanpa UI.
+
+Masukan CSV (kolom Question, opsional id), JSONL ({"id", "question"}) atau
+teks satu pertanyaan per baris. Alur per potongan (chunk) pertanyaan:
+1. pertanyaan yang bukan jalur cepat FAQ di-embed massal (embed_documents
+   per batch, paralel) ke lookup memori PrewarmedEmbeddings; vektornya
+   dibuang lagi setelah potongan itu selesai dijawab,
+2. backend menjawab:
+   - "pool" (default): AnswerService.answer di pool thread terbatas
+     (retrieval + LLM bersamaan, pembatas laju ratelimit.py tetap berlaku),
+   - "openai-batch": retrieval bersamaan, prompt dikirim ke OpenAI Batch
+     API (biaya lebih murah, selesai dalam 24 jam); batch yang sudah dikirim
+     dicatat di <output>.batch.json dan ditunggu lagi saat dijalankan ulang.
+Setiap jawaban langsung ditulis ke file output (JSONL atau CSV) dan file itu
+sekaligus checkpoint: id yang sudah ada di output dilewati saat dijalankan
+ulang. Pertanyaan yang gagal tidak ditulis sehingga dicoba lagi.
+
+Contoh:
+    python batch.py --input email.csv --output jawaban.jsonl --workers 8
+    python batch.py --input pertanyaan.txt --output hasil.csv --backend openai-batch
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import config
+from postprocess import NOT_FOUND_MESSAGE, clean_answer, is_not_found
+
+OUTPUT_FIELDS = ["id", "question", "answer", "found", "sources", "cached", "seconds"]
+
+
+def load_questions(path, column="Question"):
+    """[{"id", "question"}] dari CSV / JSONL / teks; id default nomor baris"""
+    items = []
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            rows = ((row.get("id"), row.get(column)) for row in csv.DictReader(f))
+        elif path.endswith(".jsonl"):
+            records = (json.loads(line) for line in f if line.strip())
+            rows = ((record.get("id"), record.get("question") or record.get("query")) for record in records)
+        else:
+            rows = ((None, line) for line in f)
+        for number, (item_id, question) in enumerate(rows, start=1):
+            question = (question or "").strip()
+            if question:
+                items.append({"id": str(item_id) if item_id not in (None, "") else str(number), "question": question})
+    return items
+
+
+def completed_ids(path):
+    """id yang sudah ada di file output (checkpoint)"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            return {row["id"] for row in csv.DictReader(f)}
+        ids = set()
+        for line in f:
+            try:
+                ids.add(str(json.loads(line)["id"]))
+            except (ValueError, KeyError):
+                # Baris terakhir bisa terpotong jika proses dihentikan paksa
+                continue
+        return ids
+
+
+class ResultWriter:
+    """Tulis hasil satu per satu (append + flush) dari banyak thread"""
+
+    def __init__(self, path):
+        self.path = path
+        self.csv = path.endswith(".csv")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", encoding="utf-8", newline="")
+        self._lock = threading.Lock()
+        if self.csv:
+            self._writer = csv.DictWriter(self._file, fieldnames=OUTPUT_FIELDS)
+            if is_new:
+                self._writer.writeheader()
+
+    def write(self, record):
+        with self._lock:
+            if self.csv:
+                self._writer.writerow({**record, "sources": json.dumps(record["sources"], ensure_ascii=False)})
+            else:
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class Progress:
+    """Hitung jawaban selesai/gagal dan laporkan pertanyaan per menit"""
+
+    def __init__(self, total, interval=5.0, stream=sys.stderr):
+        self.total = total
+        self.interval = interval
+        self.stream = stream
+        self.done = 0
+        self.failed = 0
+        self.cached = {}
+        self.started = time.perf_counter()
+        self._reported = self.started
+        self._lock = threading.Lock()
+
+    def record(self, result=None, error=None):
+        with self._lock:
+            if error is not None:
+                self.failed += 1
+                print(f"Gagal: {error}", file=self.stream)
+            else:
+                self.done += 1
+                tier = result.get("cached") or "llm"
+                self.cached[tier] = self.cached.get(tier, 0) + 1
+            now = time.perf_counter()
+            if now - self._reported >= self.interval:
+                self._reported = now
+                print(f"{self.done + self.failed}/{self.total} | {self.per_minute():.1f} pertanyaan/menit",
+                      file=self.stream)
+
+    def per_minute(self):
+        elapsed = time.perf_counter() - self.started
+        return self.done / elapsed * 60 if elapsed else 0.0
+
+    def summary(self):
+        return {
+            "questions": self.total,
+            "answered": self.done,
+            "failed": self.failed,
+            "seconds": round(time.perf_counter() - self.started, 1),
+            "questions_per_minute": round(self.per_minute(), 1),
+            "served_by": self.cached,
+        }
+
+
+def result_record(item, result, seconds):
+    return {
+        "id": item["id"],
+        "question": item["question"],
+        "answer": result["answer"],
+        "found": result["found"],
+        "sources": [source for source in result["sources"] if source],
+        "cached": result["cached"],
+        "seconds": round(seconds, 3),
+    }
+
+
+def prewarm(service, questions, batch_size, concurrency):
+    """Embed massal pertanyaan yang akan sampai ke retrieval/answer cache.
+
+    Hasilnya teks yang baru ditambahkan ke lookup (untuk release); vektor
+    pemanasan saat start tidak ikut dibuang.
+    """
+    embeddings = service.engine.embeddings
+    if not hasattr(embeddings, "warm"):
+        return []
+    if service.faq_index is not None:
+        questions = [question for question in questions if service.faq_index.match(question) is None]
+    questions = [question for question in dict.fromkeys(questions) if question not in embeddings.vectors]
+    embeddings.warm(questions, batch_size=batch_size, concurrency=concurrency)
+    return questions
+
+
+def release(service, questions):
+    """Buang vektor pertanyaan batch dari lookup setelah dijawab (memori tidak tumbuh per batch)"""
+    embeddings = service.engine.embeddings
+    if questions and hasattr(embeddings, "evict"):
+        embeddings.evict(questions)
+
+
+class PoolBackend:
+    """AnswerService.answer per pertanyaan di pool thread terbatas"""
+
+    name = "pool"
+
+    def __init__(self, service, workers=config.BATCH_WORKERS):
+        self.service = service
+        self.workers = workers
+
+    def _answer(self, item):
+        started = time.perf_counter()
+        result = self.service.answer(item["question"])
+        return result_record(item, result, time.perf_counter() - started)
+
+    def run(self, chunks, writer, progress, prepare, release):
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = []
+            warmed = []
+            for chunk in chunks:
+                # Embed potongan berikutnya selagi pool masih menjawab potongan sebelumnya
+                texts = prepare(chunk)
+                futures = [pool.submit(self._answer, item) for item in chunk]
+                warmed.append((futures, texts))
+                pending += futures
+                # Sisakan satu potongan di antrian agar pool tidak menganggur saat embed berikutnya
+                pending = self._drain(pending, writer, progress, keep=len(chunk))
+                warmed = self._release_done(warmed, release)
+            self._drain(pending, writer, progress, keep=0)
+            self._release_done(warmed, release)
+
+    @staticmethod
+    def _release_done(warmed, release):
+        """Vektor potongan yang semua pertanyaannya sudah dijawab dibuang dari lookup"""
+        remaining = []
+        for futures, texts in warmed:
+            if all(future.done() for future in futures):
+                release(texts)
+            else:
+                remaining.append((futures, texts))
+        return remaining
+
+    @staticmethod
+    def _drain(futures, writer, progress, keep):
+        """Tulis hasil yang selesai sampai sisa antrian <= keep"""
+        if len(futures) <= keep:
+            return futures
+        remaining = set(futures)
+        for future in as_completed(futures):
+            remaining.discard(future)
+            try:
+                record = future.result()
+            except Exception as e:
+                progress.record(error=e)
+            else:
+                writer.write(record)
+                progress.record(record)
+            if len(remaining) <= keep:
+                break
+        return [future for future in futures if future in remaining]
+
+
+class OpenAIBatchBackend:
+    """Retrieval bersamaan, generasi lewat OpenAI Batch API (/v1/chat/completions)"""
+
+    name = "openai-batch"
+    MAX_REQUESTS = 50_000
+
+    def __init__(self, service, state_path, workers=config.BATCH_WORKERS, poll_seconds=config.BATCH_POLL_SECONDS):
+        import openai
+
+        self.service = service
+        self.engine = service.engine
+        self.state_path = state_path
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.client = openai.OpenAI(api_key=config.OPENAI_KEY, http_client=self.engine.http_client)
+        self.state = {"batches": []}
+        if os.path.exists(state_path):
+            with open(state_path, encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def _save_state(self):
+        with open(self.state_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+
+    def _prepare_request(self, item):
+        """(request Batch API atau None, sumber) untuk satu pertanyaan"""
+        documents = self.engine.retriever.invoke(item["question"])
+        if not documents:
+            return None, []
+        prompt = self.engine.prompt.format(
+            context="\n\n".join(doc.page_content for doc in documents), question=item["question"]
+        )
+        body = {
+            "model": self.engine.llm.model_name,
+            "temperature": 0,
+            "messages": [{"role": "user", "content": prompt}],
+        }
+        if self.engine.llm.max_tokens:
+            body["max_tokens"] = self.engine.llm.max_tokens
+        request = {"custom_id": item["id"], "method": "POST", "url": "/v1/chat/completions", "body": body}
+        return request, [doc.metadata.get("Question") for doc in documents]
+
+    def _submit(self, items, writer, progress):
+        requests, pending = [], {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for item, (request, sources) in zip(items, pool.map(self._prepare_request, items)):
+                if request is None:
+                    record = result_record(item, {"answer": NOT_FOUND_MESSAGE, "found": False, "sources": [],
+                                                  "cached": None}, 0.0)
+                    writer.write(record)
+                    progress.record(record)
+                    continue
+                requests.append(request)
+                pending[item["id"]] = {"question": item["question"], "sources": sources}
+        for start in range(0, len(requests), self.MAX_REQUESTS):
+            lines = "".join(json.dumps(request, ensure_ascii=False) + "\n"
+                            for request in requests[start:start + self.MAX_REQUESTS])
+            upload = self.client.files.create(file=("astrax-batch.jsonl", io.BytesIO(lines.encode("utf-8"))),
+                                              purpose="batch")
+            batch = self.client.batches.create(
+                input_file_id=upload.id, endpoint="/v1/chat/completions", completion_window="24h"
+            )
+            ids = [request["custom_id"] for request in requests[start:start + self.MAX_REQUESTS]]
+            self.state["batches"].append({"id": batch.id, "items": {i: pending[i] for i in ids}})
+            self._save_state()
+
+    def _collect(self, entry, writer, progress):
+        """Tunggu satu batch selesai lalu tulis hasilnya"""
+        while True:
+            batch = self.client.batches.retrieve(entry["id"])
+            if batch.status in ("completed", "failed", "expired", "cancelled"):
+                break
+            counts = batch.request_counts
+            print(f"Batch {batch.id}: {batch.status} ({counts.completed if counts else 0} selesai)", file=sys.stderr)
+            time.sleep(self.poll_seconds)
+
+        answered = set()
+        # Batch kedaluwarsa/dibatalkan tetap bisa berisi sebagian hasil
+        if batch.output_file_id:
+            for line in self.client.files.content(batch.output_file_id).text.splitlines():
+                output = json.loads(line)
+                item = entry["items"].get(output["custom_id"])
+                response = output.get("response") or {}
+                if item is None or response.get("status_code") != 200:
+                    continue
+                answer = clean_answer(response["body"]["choices"][0]["message"]["content"])
+                # Konteks ada tetapi model menjawab "Maaf, ... tidak ditemukan": sama seperti backend pool
+                record = result_record(
+                    {"id": output["custom_id"], "question": item["question"]},
+                    {"answer": answer, "found": not is_not_found(answer), "sources": item["sources"],
+                     "cached": None}, 0.0
+                )
+                writer.write(record)
+                progress.record(record)
+                answered.add(output["custom_id"])
+        for missing in set(entry["items"]) - answered:
+            progress.record(error=f"{missing}: batch {batch.id} {batch.status}")
+
+    def run(self, chunks, writer, progress, prepare, release):
+        done = completed_ids(writer.path)
+        submitted = {item_id for entry in self.state["batches"] for item_id in entry["items"]}
+        items = [item for chunk in chunks for item in chunk if item["id"] not in submitted]
+        if items:
+            texts = prepare(items)
+            try:
+                self._submit(items, writer, progress)
+            finally:
+                # Vektor hanya dipakai retrieval sebelum dikirim ke Batch API
+                release(texts)
+        for entry in list(self.state["batches"]):
+            if set(entry["items"]) <= done:
+                continue
+            self._collect(entry, writer, progress)
+        self.state["batches"] = []
+        self._save_state()
+
+
+def create_service():
+    """AnswerService untuk proses batch; lookup PrewarmedEmbeddings wajib aktif untuk embed massal"""
+    config.WARMUP_ENABLED = True
+    from engine import AstraxEngine
+    from service import AnswerService
+
+    return AnswerService(AstraxEngine())
+
+
+def run(service, items, output, backend="pool", workers=config.BATCH_WORKERS,
+        chunk_size=config.BATCH_CHUNK_SIZE, embed_batch_size=config.BATCH_EMBED_SIZE):
+    """Jawab `items` yang belum ada di output; hasilnya ringkasan (pertanyaan/menit dll)"""
+    done = completed_ids(output)
+    todo = [item for item in items if item["id"] not in done]
+    progress = Progress(len(todo))
+    embed_seconds = []
+
+    def prepare(chunk):
+        started = time.perf_counter()
+        questions = [item["question"] for item in chunk]
+        texts = prewarm(service, questions, embed_batch_size, config.WARMUP_CONCURRENCY)
+        embed_seconds.append(time.perf_counter() - started)
+        return texts
+
+    chunks = (todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size))
+    if backend == "openai-batch":
+        runner = OpenAIBatchBackend(service, f"{output}.batch.json", workers=workers)
+    else:
+        runner = PoolBackend(service, workers=workers)
+
+    writer = ResultWriter(output)
+    try:
+        runner.run(chunks, writer, progress, prepare, lambda texts: release(service, texts))
+    finally:
+        writer.close()
+    return {
+        "backend": runner.name,
+        "skipped": len(items) - len(todo),
+        **progress.summary(),
+        "embed_seconds": round(sum(embed_seconds), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jawab pertanyaan secara massal (CSV/JSONL/teks)")
+    parser.add_argument("--input", required=True)
+    parser.add_argument("--output", required=True, help="File hasil .jsonl atau .csv (sekaligus checkpoint)")
+    parser.add_argument("--column", default="Question", help="Kolom pertanyaan untuk input CSV")
+    parser.add_argument("--backend", choices=["pool", "openai-batch"], default="pool")
+    parser.add_argument("--workers", type=int, default=config.BATCH_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=config.BATCH_CHUNK_SIZE)
+    parser.add_argument("--embed-batch-size", type=int, default=config.BATCH_EMBED_SIZE)
+    args = parser.parse_args()
+
+    items = load_questions(args.input, args.column)
+    service = create_service()
+    try:
+        summary = run(service, items, args.output, args.backend, args.workers, args.chunk_size,
+                      args.embed_batch_size)
+    finally:
+        service.engine.close()
+    print(json.dumps(summary, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
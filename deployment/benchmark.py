@@ -0,0 +1,262 @@
+"""Benchmark offline pipeline RAG Astrax.
+
+Pertanyaan diambil dari data/faq_combined.csv (sumber jawaban yang benar
+diketahui = baris FAQ itu sendiri), lalu setiap tahap diukur terpisah:
+embed -> vector search -> prompt build -> LLM -> clean_answer.
+
+Laporan berisi p50/p95/p99 per tahap, throughput, token per jawaban dan
+retrieval hit-rate@k / MRR. Simpan sebagai baseline lalu bandingkan:
+    python benchmark.py --output baseline.json
+    python benchmark.py --baseline baseline.json
+    python benchmark.py --hybrid --baseline baseline.json   # BM25 + vector (RRF)
+Default memakai pengganti lokal (fakes.py + index lokal); --live memakai
+OpenAI dan Atlas dari .env.
+"""
+import argparse
+import csv
+import json
+import random
+import re
+import tempfile
+import time
+
+import numpy as np
+
+import config
+from context import ContextBuilder, DOCUMENT_SEPARATOR, count_tokens
+from postprocess import clean_answer
+from prompts import PROFESSIONAL_PROMPT
+
+STAGES = ["embed", "search", "prompt", "llm", "clean"]
+
+
+def load_faq(csv_path):
+    with open(csv_path, encoding="utf-8") as f:
+        return [row for row in csv.DictReader(f) if row.get("Question")]
+
+
+def perturb(question, rng, drop=0.2):
+    """Variasi pertanyaan: huruf kecil, tanpa tanda baca, sebagian kata dibuang"""
+    words = re.sub(r"[^\w\s-]", " ", question.lower()).split()
+    kept = [w for w in words if rng.random() >= drop] or words
+    return " ".join(kept)
+
+
+def build_question_set(rows, size, seed, perturbed):
+    rng = random.Random(seed)
+    sample = rng.sample(rows, min(size, len(rows)))
+    return [
+        {
+            "query": perturb(row["Question"], rng) if perturbed else row["Question"],
+            "expected": row["Question"].strip(),
+        }
+        for row in sample
+    ]
+
+
+class Pipeline:
+    """Tahap-tahap chain "stuff" RetrievalQA yang dipanggil satu per satu"""
+
+    def __init__(self, embed, search, llm, prompt=PROFESSIONAL_PROMPT, context_builder=None):
+        self.embed = embed
+        self.search = search
+        self.llm = llm
+        self.prompt = prompt
+        self.context_builder = context_builder
+
+    def run(self, query, k, score_threshold):
+        timings = {}
+        mark = time.perf_counter()
+        vector = self.embed(query)
+        timings["embed"] = time.perf_counter() - mark
+
+        mark = time.perf_counter()
+        documents = self.search(query, vector, k, score_threshold)
+        timings["search"] = time.perf_counter() - mark
+
+        mark = time.perf_counter()
+        if self.context_builder is not None:
+            documents, _ = self.context_builder.build(documents)
+        # Sama dengan StuffDocumentsChain: konteks digabung dengan "\n\n"
+        context = DOCUMENT_SEPARATOR.join(doc.page_content for doc in documents)
+        prompt_text = self.prompt.format(context=context, question=query)
+        timings["prompt"] = time.perf_counter() - mark
+
+        mark = time.perf_counter()
+        raw_answer = self.llm.invoke(prompt_text).content
+        timings["llm"] = time.perf_counter() - mark
+
+        mark = time.perf_counter()
+        answer = clean_answer(raw_answer)
+        timings["clean"] = time.perf_counter() - mark
+        return documents, prompt_text, answer, timings
+
+
+def hybrid_search(vector_search, lexical_index):
+    """Bungkus fungsi search vector dengan fusi RRF BM25 (sama dengan HybridRetriever)"""
+    from hybrid import reciprocal_rank_fusion
+
+    def search(query, vector, k, score_threshold):
+        vector_documents = vector_search(query, vector, max(k, config.HYBRID_CANDIDATES), score_threshold)
+        if not vector_documents:
+            return []
+        lexical_documents = lexical_index.documents(query, k=config.HYBRID_CANDIDATES)
+        return reciprocal_rank_fusion([vector_documents, lexical_documents], k)
+
+    return search
+
+
+def build_fake_pipeline(csv_path, embed_latency=0.0, search_latency=0.0, llm_latency=0.0, hybrid=False):
+    from fakes import FakeChatModel, FakeEmbeddings, create_fake_index
+    from hybrid import LexicalChunkIndex
+
+    embeddings = FakeEmbeddings()
+    index = create_fake_index(csv_path, f"{tempfile.mkdtemp(prefix='astrax-bench-')}/index", embeddings)
+    embeddings.latency = embed_latency
+
+    def search(query, vector, k, score_threshold):
+        if search_latency:
+            time.sleep(search_latency)
+        return index.documents(vector, k=k, score_threshold=score_threshold)
+
+    if hybrid:
+        search = hybrid_search(search, LexicalChunkIndex(index.records))
+
+    return Pipeline(embeddings.embed_query, search, FakeChatModel(latency=llm_latency))
+
+
+def build_live_pipeline(hybrid=False):
+    from engine import AstraxEngine
+
+    engine = AstraxEngine(hybrid=hybrid)
+
+    def search(query, vector, k, score_threshold):
+        if engine.retriever_backend == "local":
+            return engine.vector_store.documents(vector, k=k, score_threshold=score_threshold)
+        return engine.vector_store.similarity_search_by_vector(vector, k=k)
+
+    if hybrid:
+        search = hybrid_search(search, engine.lexical_index)
+
+    return Pipeline(engine.embeddings.embed_query, search, engine.llm, engine.prompt)
+
+
+def summarize(samples):
+    values = np.asarray(samples) * 1000
+    return {
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+    }
+
+
+def run_benchmark(pipeline, questions, k=3, score_threshold=None):
+    stage_samples = {stage: [] for stage in STAGES}
+    totals, answer_tokens, prompt_tokens = [], [], []
+    hits, reciprocal_ranks = 0, []
+
+    started = time.perf_counter()
+    for item in questions:
+        request_started = time.perf_counter()
+        documents, prompt_text, answer, timings = pipeline.run(item["query"], k, score_threshold)
+        totals.append(time.perf_counter() - request_started)
+        for stage in STAGES:
+            stage_samples[stage].append(timings[stage])
+        answer_tokens.append(count_tokens(answer))
+        prompt_tokens.append(count_tokens(prompt_text))
+
+        retrieved = [doc.metadata.get("Question", "").strip() for doc in documents]
+        if item["expected"] in retrieved:
+            hits += 1
+            reciprocal_ranks.append(1.0 / (retrieved.index(item["expected"]) + 1))
+        else:
+            reciprocal_ranks.append(0.0)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "questions": len(questions),
+        "k": k,
+        "score_threshold": score_threshold,
+        "throughput_qps": round(len(questions) / elapsed, 3) if elapsed else None,
+        "latency": {"total": summarize(totals), **{stage: summarize(stage_samples[stage]) for stage in STAGES}},
+        "tokens": {
+            "answer_mean": round(float(np.mean(answer_tokens)), 1),
+            "prompt_mean": round(float(np.mean(prompt_tokens)), 1),
+        },
+        "retrieval": {
+            f"hit_rate@{k}": round(hits / len(questions), 4),
+            "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+        },
+    }
+
+
+def flatten(report, prefix=""):
+    flat = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(report, baseline):
+    """Baris perbandingan metrik: nilai sekarang vs baseline dan selisih persen"""
+    current, previous = flatten(report), flatten(baseline)
+    lines = []
+    for name, value in current.items():
+        if name not in previous or name.startswith("config."):
+            continue
+        before = previous[name]
+        change = f"{(value - before) / before * 100:+.1f}%" if before else "n/a"
+        lines.append(f"{name:<32} {before:>12} -> {value:>12}  ({change})")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline RAG Astrax")
+    parser.add_argument("--csv", default=config.FAQ_CSV_PATH)
+    parser.add_argument("--size", type=int, default=100, help="Jumlah pertanyaan")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--perturb", action="store_true", help="Pakai variasi pertanyaan, bukan teks persis")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--score-threshold", type=float, default=None)
+    parser.add_argument("--embed-latency", type=float, default=0.0)
+    parser.add_argument("--search-latency", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--context-budget", type=int, default=None,
+                        help="Pakai ContextBuilder dengan budget token ini (0 = hanya dedup)")
+    parser.add_argument("--hybrid", action="store_true", help="Retrieval hybrid BM25 + vector (RRF)")
+    parser.add_argument("--live", action="store_true", help="Pakai OpenAI dan Atlas sungguhan")
+    parser.add_argument("--output", help="Simpan laporan JSON")
+    parser.add_argument("--baseline", help="Laporan JSON pembanding")
+    args = parser.parse_args()
+
+    questions = build_question_set(load_faq(args.csv), args.size, args.seed, args.perturb)
+    if args.live:
+        pipeline = build_live_pipeline(args.hybrid)
+    else:
+        pipeline = build_fake_pipeline(
+            args.csv, args.embed_latency, args.search_latency, args.llm_latency, args.hybrid
+        )
+    if args.context_budget is not None:
+        pipeline.context_builder = ContextBuilder(max_tokens=args.context_budget)
+
+    report = run_benchmark(pipeline, questions, k=args.k, score_threshold=args.score_threshold)
+    report["config"] = {
+        "live": args.live, "hybrid": args.hybrid, "context_budget": args.context_budget, "seed": args.seed, "perturb": args.perturb, "size": args.size
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            print(compare(report, json.load(f)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Klien HTTP untuk api.py, dipakai Streamlit sebagai thin client.
+
+Antarmukanya sama dengan AnswerService.answer sehingga aplikasi bisa
+berganti antara mode in-process dan mode API lewat konfigurasi saja.
+"""
+import json
+
+import httpx
+
+
+class ApiError(Exception):
+    pass
+
+
+class Busy(ApiError):
+    """Server menolak karena antrian penuh / batas laju OpenAI (HTTP 429)"""
+
+
+BUSY_ERRORS = {"overloaded", "rate_limited"}
+
+
+def _raise_for_status(response):
+    if response.status_code == 429:
+        response.read()
+        raise Busy(response.text)
+    response.raise_for_status()
+
+
+class AstraxClient:
+    def __init__(self, base_url, timeout=120.0):
+        self.base_url = base_url.rstrip("/")
+        self.http = httpx.Client(base_url=self.base_url, timeout=timeout)
+
+    def answer(self, query, stream_handler=None, history=None):
+        payload = {"query": query, "history": history}
+        if stream_handler is None:
+            response = self.http.post("/answer", json=payload)
+            _raise_for_status(response)
+            return response.json()
+
+        with self.http.stream("POST", "/answer", json={**payload, "stream": True}) as response:
+            _raise_for_status(response)
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if "token" in event:
+                    stream_handler.on_llm_new_token(event["token"])
+                elif event.get("error") in BUSY_ERRORS:
+                    raise Busy(event.get("detail"))
+                elif "error" in event:
+                    raise ApiError(f"{event['error']}: {event.get('detail')}")
+                elif event.get("done"):
+                    event.pop("done")
+                    return event
+        raise ApiError("Stream jawaban terputus")
+
+    def ready(self):
+        try:
+            return self.http.get("/ready").status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    def stats(self):
+        return self.http.get("/stats").json()
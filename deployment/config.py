@@ -0,0 +1,224 @@
+"""Konfigurasi Astrax yang dibaca dari environment variable / file .env"""
+import hashlib
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+MONGODB_URI = os.environ.get("MONGO_URI")
+OPENAI_KEY = os.environ.get("OPENAI_API_KEY")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FAQ_CSV_PATH = os.environ.get(
+    "ASTRAX_FAQ_CSV",
+    os.path.join(BASE_DIR, "..", "data", "faq_combined.csv")
+)
+
+
+def env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def file_fingerprint(path):
+    """Hash sha256 singkat dari isi file, None jika file tidak ada"""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+# Versi korpus awal: cache jawaban/retrieval dikosongkan saat nilainya berubah. Penanda
+# versi yang ditulis ingest.py (corpus.py) menggantikannya dan dicek ulang paling sering
+# sekali per ASTRAX_CORPUS_CHECK_INTERVAL detik (0 = hanya dibaca saat start)
+CORPUS_VERSION = os.environ.get("ASTRAX_CORPUS_VERSION") or file_fingerprint(FAQ_CSV_PATH) or "default"
+CORPUS_CHECK_INTERVAL = env_float("ASTRAX_CORPUS_CHECK_INTERVAL", 30.0)
+
+# Answer Cache
+ANSWER_CACHE_ENABLED = env_bool("ASTRAX_ANSWER_CACHE", True)
+ANSWER_CACHE_SIMILARITY = env_float("ASTRAX_ANSWER_CACHE_SIMILARITY", 0.95)
+ANSWER_CACHE_TTL = env_int("ASTRAX_ANSWER_CACHE_TTL", 24 * 60 * 60)
+ANSWER_CACHE_MAX_SIZE = env_int("ASTRAX_ANSWER_CACHE_MAX_SIZE", 1000)
+
+# Connection pool (HTTP keep-alive ke OpenAI dan pool koneksi MongoDB)
+HTTP_MAX_CONNECTIONS = env_int("ASTRAX_HTTP_MAX_CONNECTIONS", 50)
+HTTP_MAX_KEEPALIVE = env_int("ASTRAX_HTTP_MAX_KEEPALIVE", 20)
+HTTP_KEEPALIVE_EXPIRY = env_float("ASTRAX_HTTP_KEEPALIVE_EXPIRY", 120.0)
+HTTP_TIMEOUT = env_float("ASTRAX_HTTP_TIMEOUT", 60.0)
+MONGO_MAX_POOL_SIZE = env_int("ASTRAX_MONGO_MAX_POOL_SIZE", 50)
+
+# Streaming token LLM ke chat bubble
+STREAMING_ENABLED = env_bool("ASTRAX_STREAMING", True)
+
+# Backend retriever: "atlas" (MongoDB Atlas Vector Search) atau "local" (index NumPy)
+RETRIEVER_BACKEND = os.environ.get("ASTRAX_RETRIEVER", "atlas")
+LOCAL_INDEX_PATH = os.environ.get(
+    "ASTRAX_LOCAL_INDEX",
+    os.path.join(BASE_DIR, "..", "data", "index", "astrax")
+)
+
+# Cache embedding persisten (SQLite)
+EMBEDDING_CACHE_ENABLED = env_bool("ASTRAX_EMBEDDING_CACHE", True)
+EMBEDDING_CACHE_PATH = os.environ.get(
+    "ASTRAX_EMBEDDING_CACHE_PATH",
+    os.path.join(BASE_DIR, "..", "data", "cache", "embeddings.sqlite")
+)
+
+# File BPE tiktoken (cl100k_base) untuk hitung token; diunduh sekali oleh ingest.py.
+# Host tanpa internet: salin file dari cache ini dan set ASTRAX_TIKTOKEN_DOWNLOAD=false
+# agar tidak menunggu timeout jaringan (fallback 4 karakter/token)
+TIKTOKEN_CACHE_DIR = os.environ.get(
+    "TIKTOKEN_CACHE_DIR",
+    os.path.join(BASE_DIR, "..", "data", "cache", "tiktoken")
+)
+TIKTOKEN_DOWNLOAD = env_bool("ASTRAX_TIKTOKEN_DOWNLOAD", True)
+EMBEDDING_CACHE_MAX_ENTRIES = env_int("ASTRAX_EMBEDDING_CACHE_MAX_ENTRIES", 200_000)
+
+# Jalur async (API / load test)
+ASYNC_MAX_CONCURRENCY = env_int("ASTRAX_ASYNC_MAX_CONCURRENCY", 16)
+ASYNC_MAX_QUEUE = env_int("ASTRAX_ASYNC_MAX_QUEUE", 256)
+
+# Server API (api.py); jika ASTRAX_API_URL diisi, Streamlit menjadi thin client
+API_URL = os.environ.get("ASTRAX_API_URL")
+API_WORKERS = env_int("ASTRAX_API_WORKERS", 1)
+
+# Telemetry: daftar exporter dipisah koma ("prometheus", "jsonl"), kosong = mati
+TELEMETRY = [
+    name.strip() for name in os.environ.get("ASTRAX_TELEMETRY", "").split(",")
+    if name.strip() and name.strip() != "off"
+]
+TELEMETRY_JSONL_PATH = os.environ.get(
+    "ASTRAX_TELEMETRY_JSONL",
+    os.path.join(BASE_DIR, "..", "data", "telemetry", "requests.jsonl")
+)
+METRICS_PORT = env_int("ASTRAX_METRICS_PORT", 0)
+# Default hanya localhost; "0.0.0.0" jika Prometheus men-scrape dari host lain
+METRICS_HOST = os.environ.get("ASTRAX_METRICS_HOST", "127.0.0.1")
+# Teks pertanyaan di JSONL: "hash" (sha256 teks ternormalisasi), "raw" (opt-in) atau "off"
+TELEMETRY_QUERY = os.environ.get("ASTRAX_TELEMETRY_QUERY", "hash").lower()
+
+# Jalur cepat FAQ: pertanyaan yang hampir sama persis dengan kolom Question
+# dijawab langsung dari CSV tanpa LLM (confidence n-gram karakter 0..1).
+# Skor tertinggi pasangan FAQ hampir-kembar ~0.85; nomor formulir dan kata negasi
+# harus sama persis terlepas dari threshold (python faq_index.py evaluate)
+FAQ_FAST_PATH_ENABLED = env_bool("ASTRAX_FAQ_FAST_PATH", True)
+FAQ_FAST_PATH_THRESHOLD = env_float("ASTRAX_FAQ_FAST_PATH_THRESHOLD", 0.90)
+
+# Retrieval hybrid: BM25 atas teks chunk + vector search, digabung dengan RRF
+HYBRID_RETRIEVAL = env_bool("ASTRAX_HYBRID_RETRIEVAL", False)
+HYBRID_CANDIDATES = env_int("ASTRAX_HYBRID_CANDIDATES", 10)
+
+# Partisi topik: pertanyaan diarahkan ke Topik terdekat (centroid embedding),
+# vector search memakai pre-filter Topik; kembali ke pencarian global jika ragu
+FAQ_TOPICS_CSV_PATH = os.environ.get(
+    "ASTRAX_FAQ_TOPICS_CSV", os.path.join(BASE_DIR, "..", "data", "faq_categorization.csv")
+)
+TOPIC_ROUTING = env_bool("ASTRAX_TOPIC_ROUTING", False)
+TOPIC_ROUTER_MIN_MARGIN = env_float("ASTRAX_TOPIC_ROUTER_MIN_MARGIN", 0.02)
+
+# Context builder: batas token konteks prompt (0 = tanpa batas, hanya dedup)
+CONTEXT_BUILDER_ENABLED = env_bool("ASTRAX_CONTEXT_BUILDER", True)
+CONTEXT_MAX_TOKENS = env_int("ASTRAX_CONTEXT_MAX_TOKENS", 1500)
+CONTEXT_NEAR_DUPLICATE = env_float("ASTRAX_CONTEXT_NEAR_DUPLICATE", 0.9)
+
+# Routing model: pertanyaan sederhana + skor retrieval tinggi ke model murah,
+# sisanya ke model utama engine (GPT-4)
+MODEL_ROUTING = env_bool("ASTRAX_MODEL_ROUTING", False)
+MODEL_ROUTING_FAST_MODEL = os.environ.get("ASTRAX_MODEL_ROUTING_FAST_MODEL", "gpt-3.5-turbo")
+MODEL_ROUTING_MIN_SCORE = env_float("ASTRAX_MODEL_ROUTING_MIN_SCORE", 0.85)
+MODEL_ROUTING_MAX_WORDS = env_int("ASTRAX_MODEL_ROUTING_MAX_WORDS", 25)
+MODEL_ROUTING_MAX_QUESTION_WORDS = env_int("ASTRAX_MODEL_ROUTING_MAX_QUESTION_WORDS", 1)
+# JSON {"model": [harga prompt, harga completion]} USD per 1K token
+MODEL_PRICES = os.environ.get("ASTRAX_MODEL_PRICES")
+
+# Request coalescing: pertanyaan identik yang sedang diproses berbagi satu komputasi
+COALESCE_ENABLED = env_bool("ASTRAX_COALESCE", True)
+
+# Pembatas laju OpenAI: jatah RPM/TPM per model (0 = dipelajari dari header
+# x-ratelimit-*), konkurensi adaptif dan retry dengan backoff + retry-after
+RATE_LIMIT_ENABLED = env_bool("ASTRAX_RATE_LIMIT", True)
+RATE_LIMIT_RPM = env_int("ASTRAX_RATE_LIMIT_RPM", 0)
+RATE_LIMIT_TPM = env_int("ASTRAX_RATE_LIMIT_TPM", 0)
+RATE_LIMIT_MAX_CONCURRENCY = env_int("ASTRAX_RATE_LIMIT_MAX_CONCURRENCY", 16)
+RATE_LIMIT_MAX_RETRIES = env_int("ASTRAX_RATE_LIMIT_MAX_RETRIES", 6)
+# Total detik menunggu (antre + backoff) per panggilan sebelum menyerah
+RATE_LIMIT_MAX_WAIT = env_float("ASTRAX_RATE_LIMIT_MAX_WAIT", 30.0)
+# Nilai header Retry-After (detik) saat API membalas 429 karena batas OpenAI
+RATE_LIMIT_RETRY_AFTER = env_int("ASTRAX_RATE_LIMIT_RETRY_AFTER", 10)
+
+# Memori percakapan: pertanyaan lanjutan ditulis ulang (kondensasi) dari
+# `window` giliran terakhir + ringkasan bergulir; riwayat chat dibatasi & dipaging
+MEMORY_ENABLED = env_bool("ASTRAX_MEMORY", True)
+MEMORY_WINDOW = env_int("ASTRAX_MEMORY_WINDOW", 3)
+MEMORY_SUMMARY_TOKENS = env_int("ASTRAX_MEMORY_SUMMARY_TOKENS", 150)
+MEMORY_ANSWER_TOKENS = env_int("ASTRAX_MEMORY_ANSWER_TOKENS", 120)
+CHAT_PAGE_SIZE = env_int("ASTRAX_CHAT_PAGE_SIZE", 20)
+CHAT_HISTORY_MAX = env_int("ASTRAX_CHAT_HISTORY_MAX", 200)
+
+# Pemanasan saat start: pertanyaan populer (FAQ + log telemetry) di-embed ke
+# lookup memori, retrieval dummy, koneksi pool dibuka sebelum /ready = 200
+WARMUP_ENABLED = env_bool("ASTRAX_WARMUP", True)
+WARMUP_MAX_QUESTIONS = env_int("ASTRAX_WARMUP_MAX_QUESTIONS", 500)
+WARMUP_CONCURRENCY = env_int("ASTRAX_WARMUP_CONCURRENCY", 4)
+WARMUP_LOG_PATH = os.environ.get("ASTRAX_WARMUP_LOG", TELEMETRY_JSONL_PATH)
+MONGO_MIN_POOL_SIZE = env_int("ASTRAX_MONGO_MIN_POOL_SIZE", 4)
+
+# Scraper FAQ DJP (scraper.py): fetch paralel, request bersyarat (ETag) dan
+# checkpoint agar run yang terputus bisa dilanjutkan
+SCRAPE_BASE_URL = os.environ.get("ASTRAX_SCRAPE_BASE_URL", "https://pajak.go.id")
+SCRAPE_CONCURRENCY = env_int("ASTRAX_SCRAPE_CONCURRENCY", 4)
+SCRAPE_STATE_PATH = os.environ.get(
+    "ASTRAX_SCRAPE_STATE", os.path.join(BASE_DIR, "..", "data", "raw", "scrape_state.json")
+)
+SCRAPE_OUTPUT_PATH = os.environ.get(
+    "ASTRAX_SCRAPE_OUTPUT", os.path.join(BASE_DIR, "..", "data", "raw", "hasil_scraping.csv")
+)
+
+# Penyimpanan embedding ringkas (quantization.py): tahap pertama atas vektor
+# Matryoshka terpotong dan/atau int8/binary, lalu re-rank float penuh kandidat
+VECTOR_QUANTIZATION = os.environ.get("ASTRAX_VECTOR_QUANTIZATION", "none")
+# Dimensi tahap pertama (0 = penuh); Atlas memakai field embedding_<dimensi>
+VECTOR_DIMENSIONS = env_int("ASTRAX_VECTOR_DIMENSIONS", 0)
+# Kandidat yang di-re-rank dengan float penuh (0 = tanpa re-rank)
+VECTOR_RERANK_CANDIDATES = env_int("ASTRAX_VECTOR_RERANK_CANDIDATES", 40)
+
+# Mode batch (batch.py): pertanyaan per potongan di-embed massal lalu dijawab
+# pool thread terbatas atau OpenAI Batch API
+BATCH_WORKERS = env_int("ASTRAX_BATCH_WORKERS", 8)
+BATCH_CHUNK_SIZE = env_int("ASTRAX_BATCH_CHUNK_SIZE", 500)
+BATCH_EMBED_SIZE = env_int("ASTRAX_BATCH_EMBED_SIZE", 256)
+BATCH_POLL_SECONDS = env_float("ASTRAX_BATCH_POLL_SECONDS", 30.0)
+
+# Render chat UI (rendering.py): HTML per pesan dimemo dengan kunci hash isi,
+# dipakai bersama semua sesi dalam satu proses Streamlit
+RENDER_CACHE_SIZE = env_int("ASTRAX_RENDER_CACHE_SIZE", 2000)
+
+# Cache hasil retrieval (retrieval_cache.py): top-k id dokumen + skor per vektor
+# query terkuantisasi, k, threshold dan versi korpus; teks chunk disimpan sekali
+RETRIEVAL_CACHE_ENABLED = env_bool("ASTRAX_RETRIEVAL_CACHE", True)
+RETRIEVAL_CACHE_MAX_SIZE = env_int("ASTRAX_RETRIEVAL_CACHE_MAX_SIZE", 5000)
+RETRIEVAL_CACHE_TTL = env_int("ASTRAX_RETRIEVAL_CACHE_TTL", 24 * 60 * 60)
+
+# Sharding korpus (shards.py): JSON {nama: {"collection"/"path", "db", "index", "k", "timeout",
+# "boost", "filters"}}, key lain ditolak; kosong = satu koleksi Astrax_db.Astrax seperti biasa
+SHARDS = os.environ.get("ASTRAX_SHARDS")
+SHARD_TIMEOUT = env_float("ASTRAX_SHARD_TIMEOUT", 2.0)
+# Skor antar shard: "none" (skor mentah, satu model embedding) atau "zscore";
+# z-score memakai statistik shard itu sendiri setelah sampel cukup
+SHARD_NORMALIZATION = os.environ.get("ASTRAX_SHARD_NORMALIZATION", "none")
+SHARD_CALIBRATION_SAMPLES = env_int("ASTRAX_SHARD_CALIBRATION_SAMPLES", 50)
@@ -0,0 +1,196 @@
+"""Penyusunan konteks prompt dengan batas token.
+
+RetrievalQA "stuff" menggabungkan seluruh teks chunk apa adanya. Sebelum
+sampai ke prompt, dokumen hasil retrieval diproses:
+1. chunk berurutan dari FAQ yang sama digabung tanpa bagian overlap
+   (splitter memakai overlap 100 karakter),
+2. FAQ berbeda dengan jawaban hampir identik dibuang (ambil peringkat teratas),
+3. dokumen diambil berurutan dari skor tertinggi sampai batas token habis.
+
+Token dihitung lokal dengan tiktoken (cl100k_base, encoding GPT-3.5/GPT-4).
+File encoding dibaca dari TIKTOKEN_CACHE_DIR (diisi ingest.py); jika tidak ada
+dan ASTRAX_TIKTOKEN_DOWNLOAD=false, langsung dipakai perkiraan 4 karakter/token
+tanpa mencoba jaringan.
+"""
+import functools
+import hashlib
+import os
+import threading
+
+from langchain_core.callbacks import adispatch_custom_event, dispatch_custom_event
+from langchain_core.retrievers import BaseRetriever
+
+import config
+from lexical import char_ngrams, ngram_similarity
+
+DOCUMENT_SEPARATOR = "\n\n"  # sama dengan StuffDocumentsChain
+MAX_OVERLAP = 200
+
+
+ENCODING_NAME = "cl100k_base"
+ENCODING_URL = "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken"
+
+
+def encoding_cache_path():
+    """Lokasi file BPE di cache tiktoken (nama file = sha1 URL, sama dengan tiktoken.load)"""
+    cache_dir = os.environ.get("TIKTOKEN_CACHE_DIR", config.TIKTOKEN_CACHE_DIR)
+    return os.path.join(cache_dir, hashlib.sha1(ENCODING_URL.encode()).hexdigest())
+
+
+@functools.lru_cache(maxsize=1)
+def get_encoding():
+    """Encoder tiktoken dimuat sekali; None jika tidak tersedia"""
+    os.environ.setdefault("TIKTOKEN_CACHE_DIR", config.TIKTOKEN_CACHE_DIR)
+    if not config.TIKTOKEN_DOWNLOAD and not os.path.exists(encoding_cache_path()):
+        return None
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(ENCODING_NAME)
+    except Exception:
+        return None
+
+
+def count_tokens(text):
+    encoding = get_encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text))
+
+
+def truncate_tokens(text, max_tokens):
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode(text)[:max_tokens])
+
+
+def overlap_length(left, right, max_overlap=MAX_OVERLAP):
+    """Panjang akhiran left yang sama dengan awalan right"""
+    for size in range(min(len(left), len(right), max_overlap), 0, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def document_score(doc):
+    metadata = doc.metadata
+    return metadata.get("score", metadata.get("rrf_score"))
+
+
+class ContextBuilder:
+    def __init__(self, max_tokens=1500, near_duplicate_threshold=0.9):
+        self.max_tokens = max_tokens
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    def merge_overlaps(self, documents):
+        """Gabungkan chunk berurutan dari Question yang sama, posisi mengikuti chunk pertama"""
+        merged, by_question = [], {}
+        for doc in documents:
+            question = doc.metadata.get("Question")
+            previous = by_question.get(question)
+            chunk = doc.metadata.get("chunk")
+            if previous is not None and chunk is not None and previous.metadata.get("chunk_end") == chunk - 1:
+                size = overlap_length(previous.page_content, doc.page_content)
+                previous.page_content += doc.page_content[size:] if size else " " + doc.page_content
+                previous.metadata["chunk_end"] = chunk
+                continue
+            doc = doc.model_copy(deep=True)
+            doc.metadata["chunk_end"] = chunk
+            merged.append(doc)
+            if question is not None:
+                by_question[question] = doc
+        for doc in merged:
+            doc.metadata.pop("chunk_end", None)
+        return merged
+
+    def drop_near_duplicates(self, documents):
+        kept, grams = [], []
+        for doc in documents:
+            doc_grams = char_ngrams(doc.page_content)
+            if any(ngram_similarity(doc_grams, other) >= self.near_duplicate_threshold for other in grams):
+                continue
+            kept.append(doc)
+            grams.append(doc_grams)
+        return kept
+
+    def fit_budget(self, documents):
+        """Ambil dokumen dari skor tertinggi selama total token <= max_tokens"""
+        ranked = sorted(
+            enumerate(documents),
+            key=lambda item: (document_score(item[1]) is None, -(document_score(item[1]) or 0), item[0])
+        )
+        separator_tokens = count_tokens(DOCUMENT_SEPARATOR)
+        selected, used = [], 0
+        for position, doc in ranked:
+            tokens = count_tokens(doc.page_content) + (separator_tokens if selected else 0)
+            if used + tokens <= self.max_tokens:
+                selected.append((position, doc))
+                used += tokens
+            elif not selected:
+                # Dokumen terbaik sendiri melebihi budget: potong, jangan kosongkan konteks
+                doc = doc.model_copy(update={"page_content": truncate_tokens(doc.page_content, self.max_tokens)})
+                selected.append((position, doc))
+                used = self.max_tokens
+        # Urutan asli retriever dipertahankan di prompt
+        return [doc for _, doc in sorted(selected, key=lambda item: item[0])]
+
+    def build(self, documents):
+        """(dokumen untuk prompt, laporan token sebelum/sesudah)"""
+        tokens_in = count_tokens(DOCUMENT_SEPARATOR.join(doc.page_content for doc in documents))
+        result = self.drop_near_duplicates(self.merge_overlaps(documents))
+        if self.max_tokens:
+            result = self.fit_budget(result)
+        tokens_out = count_tokens(DOCUMENT_SEPARATOR.join(doc.page_content for doc in result))
+        with self._lock:
+            self.requests += 1
+            self.tokens_in += tokens_in
+            self.tokens_out += tokens_out
+        return result, {
+            "documents_in": len(documents),
+            "documents_out": len(result),
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "tokens_saved": tokens_in - tokens_out,
+        }
+
+    def stats(self):
+        return {
+            "max_tokens": self.max_tokens,
+            "requests": self.requests,
+            "context_tokens_in": self.tokens_in,
+            "context_tokens_out": self.tokens_out,
+            "saved_ratio": 1 - self.tokens_out / self.tokens_in if self.tokens_in else 0.0,
+        }
+
+
+class BudgetedRetriever(BaseRetriever):
+    """Bungkus retriever: hasilnya diproses ContextBuilder sebelum masuk prompt.
+
+    Laporan token per request dikirim sebagai custom event "context_report"
+    (dicatat RequestTrace di telemetry.py).
+    """
+
+    retriever: BaseRetriever
+    builder: ContextBuilder
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        callbacks = run_manager.get_child() if run_manager else None
+        documents = self.retriever.invoke(query, config={"callbacks": callbacks})
+        documents, report = self.builder.build(documents)
+        if callbacks:
+            dispatch_custom_event("context_report", report, config={"callbacks": callbacks})
+        return documents
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        callbacks = run_manager.get_child() if run_manager else None
+        documents = await self.retriever.ainvoke(query, config={"callbacks": callbacks})
+        documents, report = self.builder.build(documents)
+        if callbacks:
+            await adispatch_custom_event("context_report", report, config={"callbacks": callbacks})
+        return documents
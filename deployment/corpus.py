@@ -0,0 +1,160 @@
+"""Penanda versi korpus: ditulis ingest.py, dibaca berkala oleh engine.
+
+Cache jawaban dan cache retrieval hanya valid untuk satu versi korpus.
+Setiap run ingest menerbitkan versi = hash singkat dari seluruh _id chunk
+(yang sudah berupa hash isi), sehingga ingest ulang tanpa perubahan menulis
+versi yang sama dan cache tidak dikosongkan percuma:
+- Atlas: satu dokumen per koleksi di Astrax_db.Astrax_meta
+  ({_id: <nama koleksi>, version, updated_at}),
+- index lokal: file <index>.version di samping file index.
+
+CorpusWatcher membaca penanda paling sering sekali per interval
+(ASTRAX_CORPUS_CHECK_INTERVAL) dan memanggil listener saat versinya berubah.
+Tanpa penanda (deployment lama) versi jatuh ke ASTRAX_CORPUS_VERSION /
+fingerprint CSV FAQ.
+"""
+import hashlib
+import os
+import threading
+import time
+
+import config
+
+META_COLLECTION = "Astrax_meta"
+
+
+def corpus_fingerprint(chunk_ids):
+    """Versi korpus dari kumpulan _id chunk, tidak bergantung urutan"""
+    digest = hashlib.sha256("\n".join(sorted(chunk_ids)).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def combine_versions(versions):
+    """Satu versi dari beberapa penanda {nama: versi}; None jika tidak ada penanda"""
+    if not versions:
+        return None
+    if len(versions) == 1:
+        return next(iter(versions.values()))
+    joined = "\n".join(f"{name}={version}" for name, version in sorted(versions.items()))
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()[:16]
+
+
+def version_path(index_path):
+    return f"{index_path}.version"
+
+
+def write_local_version(index_path, version):
+    path = version_path(index_path)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, path)
+
+
+def read_local_version(index_path):
+    try:
+        with open(version_path(index_path), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_atlas_version(collection, version):
+    meta = collection.database[META_COLLECTION]
+    meta.replace_one(
+        {"_id": collection.name},
+        {"version": version, "updated_at": time.time()},
+        upsert=True
+    )
+
+
+def read_atlas_versions(database):
+    return {doc["_id"]: doc["version"] for doc in database[META_COLLECTION].find({}, {"version": 1})}
+
+
+class CorpusWatcher:
+    """Versi korpus terkini dari penanda ingest, dicek paling sering sekali per interval"""
+
+    def __init__(self, read, fallback, interval=30.0):
+        self.read = read
+        self.fallback = fallback
+        self.interval = interval
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.changes = 0
+        self.errors = 0
+        self.version = fallback
+        self.version = self._read()
+        self._checked_at = time.monotonic()
+
+    def _read(self):
+        try:
+            return self.read() or self.fallback
+        except Exception:
+            # Penanda tidak terbaca (mis. Atlas sesaat tidak terjangkau): versi lama tetap dipakai
+            self.errors += 1
+            return self.version
+
+    def subscribe(self, listener):
+        """listener(version) dipanggil setiap kali versi korpus berubah"""
+        self._listeners.append(listener)
+
+    def due(self):
+        return self.interval > 0 and time.monotonic() - self._checked_at >= self.interval
+
+    def check(self):
+        """Baca ulang penanda jika interval sudah lewat; satu thread saja yang membaca"""
+        if not self.due() or not self._lock.acquire(blocking=False):
+            return self.version
+        try:
+            self.checks += 1
+            version = self._read()
+            self._checked_at = time.monotonic()
+            if version != self.version:
+                self.version = version
+                self.changes += 1
+                for listener in self._listeners:
+                    listener(version)
+        finally:
+            self._lock.release()
+        return self.version
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "interval": self.interval,
+            "checks": self.checks,
+            "changes": self.changes,
+            "errors": self.errors,
+        }
+
+
+def create_corpus_watcher(engine, shard_specs=None):
+    """Watcher atas penanda korpus engine: koleksi Atlas (Astrax_meta) dan/atau index lokal"""
+    local_paths = []
+    if engine.retriever_backend == "local":
+        # Shard lokal dengan "path" punya index (dan penanda) sendiri
+        local_paths = [config.LOCAL_INDEX_PATH]
+        local_paths += [spec["path"] for spec in (shard_specs or {}).values() if spec.get("path")]
+
+    def read():
+        versions = {}
+        if engine.mongo_client is not None:
+            from engine import DB_NAME
+
+            versions.update(read_atlas_versions(engine.mongo_client[DB_NAME]))
+            for spec in (shard_specs or {}).values():
+                if spec.get("db") and spec["db"] != DB_NAME:
+                    database = engine.mongo_client[spec["db"]]
+                    versions.update(
+                        (f"{spec['db']}.{name}", version)
+                        for name, version in read_atlas_versions(database).items()
+                    )
+        for path in local_paths:
+            version = read_local_version(path)
+            if version:
+                versions[path] = version
+        return combine_versions(versions)
+
+    return CorpusWatcher(read, config.CORPUS_VERSION, interval=config.CORPUS_CHECK_INTERVAL)
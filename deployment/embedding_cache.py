@@ -0,0 +1,157 @@
+"""Cache embedding persisten (SQLite) di sekeliling objek Embeddings LangChain.
+
+Kunci = sha256(model + dimensi + teks), nilai = vektor float32 dalam bentuk
+blob. Teks yang pernah di-embed (chunk korpus maupun pertanyaan pengguna)
+tidak dikirim lagi ke API, termasuk setelah restart atau re-index.
+Jumlah entri dibatasi; entri yang paling lama tidak dipakai dihapus lebih dulu.
+Di jalur async, query/commit SQLite dijalankan di thread (asyncio.to_thread)
+agar event loop tidak ikut menunggu disk atau lock cache.
+"""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, underlying, path, max_entries=200_000, namespace=None):
+        self.underlying = underlying
+        self.path = path
+        self.max_entries = max_entries
+        if namespace is None:
+            model = getattr(underlying, "model", type(underlying).__name__)
+            dimensions = getattr(underlying, "dimensions", None)
+            namespace = f"{model}:{dimensions}"
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._db.commit()
+        self._count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _key(self, text):
+        return hashlib.sha256(f"{self.namespace}\n{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys):
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update({key: np.frombuffer(blob, dtype=np.float32).tolist() for key, blob in rows})
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._db.commit()
+        return found
+
+    def _store(self, items):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items]
+            )
+            self._count += len(items)
+            if self._count > self.max_entries:
+                self._count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                excess = self._count - self.max_entries
+                if excess > 0:
+                    self._db.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (excess,)
+                    )
+                    self._count -= excess
+            self._db.commit()
+
+    def _partition(self, texts):
+        """Pisahkan teks yang sudah ada di cache dan yang harus di-embed"""
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(list(set(keys)))
+        missing = {}
+        for text, key in zip(texts, keys):
+            if key not in found and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return keys, found, missing
+
+    def embed_documents(self, texts):
+        keys, found, missing = self._partition(texts)
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            computed = [(key, _as_float32(vector)) for key, vector in zip(missing.keys(), vectors)]
+            self._store(computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text):
+        key = self._key(text)
+        found = self._lookup([key])
+        if key in found:
+            self.hits += 1
+            return found[key]
+        self.misses += 1
+        vector = _as_float32(self.underlying.embed_query(text))
+        self._store([(key, vector)])
+        return vector
+
+    async def aembed_documents(self, texts):
+        keys, found, missing = await asyncio.to_thread(self._partition, texts)
+        if missing:
+            vectors = await self.underlying.aembed_documents(list(missing.values()))
+            computed = [(key, _as_float32(vector)) for key, vector in zip(missing.keys(), vectors)]
+            await asyncio.to_thread(self._store, computed)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    async def aembed_query(self, text):
+        key = self._key(text)
+        found = await asyncio.to_thread(self._lookup, [key])
+        if key in found:
+            self.hits += 1
+            return found[key]
+        self.misses += 1
+        vector = _as_float32(await self.underlying.aembed_query(text))
+        await asyncio.to_thread(self._store, [(key, vector)])
+        return vector
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": self._count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _as_float32(vector):
+    # Samakan presisi dengan yang tersimpan di cache
+    return np.asarray(vector, dtype=np.float32).tolist()
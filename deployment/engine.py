@@ -0,0 +1,365 @@
+"""Engine Astrax: semua objek berat (HTTP client, MongoDB, vector store, LLM, chain).
+
+Dibangun sekali per proses (lewat st.cache_resource di aplikasi Streamlit)
+lalu dipakai bersama oleh semua sesi, sehingga rerun Streamlit hanya
+membayar biaya render UI.
+"""
+import time
+
+import httpx
+from pymongo import MongoClient
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_mongodb import MongoDBAtlasVectorSearch
+from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+from langchain.chains import RetrievalQA
+
+import config
+from context import BudgetedRetriever, ContextBuilder
+from corpus import create_corpus_watcher
+from embedding_cache import CachedEmbeddings
+from hybrid import LexicalChunkIndex, candidate_search_kwargs, create_hybrid_retriever, load_chunk_records
+from local_index import LocalRetriever
+from model_router import create_model_router, create_routed_qa
+from prompts import PROFESSIONAL_PROMPT
+from quantization import VectorStorage, open_local_index, rerank_stages
+from ratelimit import AsyncRateLimitedTransport, RateLimitedTransport, get_rate_limiter
+from retrieval_cache import VectorSearchRetriever, create_retrieval_cache
+from shards import create_sharded_search, load_shard_specs
+from telemetry import report_spans
+from topic_router import create_routed_retriever, create_topic_router
+from warmup import PrewarmedEmbeddings
+
+DB_NAME = "Astrax_db"
+COLLECTION_NAME = "Astrax"
+INDEX_NAME = "vector_index"
+
+
+def _http_limits():
+    return httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY
+    )
+
+
+def create_http_client():
+    """HTTP client dengan keep-alive connection pooling untuk OpenAI"""
+    transport = httpx.HTTPTransport(limits=_http_limits())
+    limiter = get_rate_limiter()
+    if limiter is not None:
+        # Jatah RPM/TPM, konkurensi adaptif dan retry 429 (lihat ratelimit.py)
+        transport = RateLimitedTransport(transport, limiter)
+    return httpx.Client(transport=transport, timeout=config.HTTP_TIMEOUT)
+
+
+def create_async_http_client():
+    """Pasangan async dari create_http_client (dipakai ainvoke)"""
+    transport = httpx.AsyncHTTPTransport(limits=_http_limits())
+    limiter = get_rate_limiter()
+    if limiter is not None:
+        transport = AsyncRateLimitedTransport(transport, limiter)
+    return httpx.AsyncClient(transport=transport, timeout=config.HTTP_TIMEOUT)
+
+
+def openai_retry_kwargs():
+    """Retry dilakukan RateLimitedTransport, retry bawaan SDK OpenAI dimatikan"""
+    return {"max_retries": 0} if config.RATE_LIMIT_ENABLED else {}
+
+
+def vector_search_pipeline(query_vector, k, score_threshold=None, pre_filter=None,
+                           index_name=INDEX_NAME, embedding_key="embedding", oversampling_factor=10,
+                           storage=None):
+    """Pipeline aggregate $vectorSearch Atlas.
+
+    pre_filter berupa filter kesamaan metadata ({"Topik": "Regulasi"}); field-nya
+    harus terdaftar sebagai field "filter" di definisi vector index.
+    storage (default dari config, lihat quantization.py): tahap pertama atas field
+    ringkas lalu `candidates` kandidat di-re-rank dengan embedding float penuh.
+    """
+    storage = storage or VectorStorage.from_config()
+    rerank = storage.active and storage.candidates > 0
+    limit = max(k, storage.candidates) if rerank else k
+    stage = {
+        "index": index_name,
+        "path": storage.field(embedding_key),
+        "queryVector": storage.reduce(query_vector)[0].tolist() if storage.dimensions else list(query_vector),
+        "numCandidates": limit * oversampling_factor,
+        "limit": limit,
+    }
+    if pre_filter:
+        stage["filter"] = {field: {"$eq": value} for field, value in pre_filter.items()}
+    pipeline = [{"$vectorSearch": stage}]
+    if rerank:
+        pipeline += rerank_stages(query_vector, k, storage, embedding_key)
+    else:
+        pipeline.append({"$set": {"score": {"$meta": "vectorSearchScore"}}})
+    pipeline.append({"$project": {field: 0 for field in {embedding_key, storage.field(embedding_key)}}})
+    if score_threshold is not None:
+        pipeline.append({"$match": {"score": {"$gte": score_threshold}}})
+    return pipeline
+
+
+def to_document(doc, text_key="text"):
+    """Dokumen hasil aggregate Atlas -> Document LangChain (metadata membawa score)"""
+    text = doc.pop(text_key, "")
+    doc["_id"] = str(doc["_id"])
+    return Document(page_content=text, metadata=doc)
+
+
+def atlas_search_by_vector(collection, query_vector, k=4, score_threshold=None, pre_filter=None, text_key="text",
+                           index_name=INDEX_NAME, max_time_ms=None):
+    pipeline = vector_search_pipeline(query_vector, k, score_threshold, pre_filter, index_name=index_name)
+    # maxTimeMS: query yang melewati batas waktu shard ikut dihentikan di server
+    aggregate_kwargs = {"maxTimeMS": max_time_ms} if max_time_ms else {}
+    return [to_document(doc, text_key) for doc in collection.aggregate(pipeline, **aggregate_kwargs)]
+
+
+class AtlasVectorRetriever(BaseRetriever):
+    """Retriever sinkron lewat vector_search_pipeline (threshold, pre-filter, penyimpanan ringkas + re-rank)"""
+
+    collection: object
+    embeddings: object
+    text_key: str = "text"
+    search_kwargs: dict = {"k": 4}
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        started = time.perf_counter()
+        query_vector = self.embeddings.embed_query(query)
+        embedded = time.perf_counter()
+        documents = atlas_search_by_vector(
+            self.collection,
+            query_vector,
+            k=self.search_kwargs.get("k", 4),
+            score_threshold=self.search_kwargs.get("score_threshold"),
+            pre_filter=self.search_kwargs.get("pre_filter"),
+            text_key=self.text_key
+        )
+        report_spans(run_manager, embed=embedded - started, vector_search=time.perf_counter() - embedded)
+        return documents
+
+
+class AstraxEngine:
+    def __init__(
+        self,
+        model_name="gpt-4",
+        max_tokens=800,
+        prompt=PROFESSIONAL_PROMPT,
+        search_kwargs=None,
+        embedding_kwargs=None,
+        text_key="text",
+        server_selection_timeout_ms=5000,
+        return_source_documents=True,
+        streaming=False,
+        retriever_backend=None,
+        hybrid=None,
+        topic_routing=None,
+        context_max_tokens=None,
+        model_routing=None
+    ):
+        started = time.perf_counter()
+        self.timings = {}
+
+        self.http_client = create_http_client()
+        self.http_async_client = create_async_http_client()
+        # Dibuat jalur async (async_engine.create_async_retriever) di event loop server
+        self.async_mongo_client = None
+
+        # Embeddings
+        if embedding_kwargs is None:
+            embedding_kwargs = {"model": "text-embedding-3-small", "dimensions": 1536}
+        self.embeddings = OpenAIEmbeddings(
+            openai_api_key=config.OPENAI_KEY,
+            http_client=self.http_client,
+            http_async_client=self.http_async_client,
+            **openai_retry_kwargs(),
+            **embedding_kwargs
+        )
+        if config.EMBEDDING_CACHE_ENABLED:
+            self.embeddings = CachedEmbeddings(
+                self.embeddings,
+                config.EMBEDDING_CACHE_PATH,
+                max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES
+            )
+        # Lookup memori: pertanyaan populer (diisi warmup.warm_up jika ASTRAX_WARMUP aktif) dan
+        # vektor query yang sudah dihitung service untuk cache jawaban (PrewarmedEmbeddings.reuse)
+        self.embeddings = PrewarmedEmbeddings(self.embeddings)
+
+        if search_kwargs is None:
+            search_kwargs = {"k": 3, "score_threshold": 0.78}
+        self.search_kwargs = search_kwargs
+        self.retriever_backend = retriever_backend or config.RETRIEVER_BACKEND
+        self.hybrid = config.HYBRID_RETRIEVAL if hybrid is None else hybrid
+        # Mode hybrid: vector search mengambil lebih banyak kandidat untuk difusi RRF
+        vector_kwargs = candidate_search_kwargs(search_kwargs) if self.hybrid else search_kwargs
+        # Cache hasil vector search per vektor query (retrieval_cache.py)
+        self.retrieval_cache = create_retrieval_cache()
+
+        if self.retriever_backend == "local":
+            # Index NumPy di memori, tanpa koneksi ke Atlas
+            mark = time.perf_counter()
+            self.mongo_client = None
+            self.collection = None
+            # Mode penyimpanan ringkas (quantization.py) jika ASTRAX_VECTOR_* diisi
+            self.vector_store = open_local_index(config.LOCAL_INDEX_PATH)
+            self.search_by_vector = self.vector_store.documents
+            self.retriever = LocalRetriever(
+                index=self.vector_store,
+                embeddings=self.embeddings,
+                search_kwargs=vector_kwargs
+            )
+            self.timings["local_index"] = time.perf_counter() - mark
+        elif self.retriever_backend == "atlas":
+            # MongoDB Connection
+            mark = time.perf_counter()
+            # minPoolSize: pool membuka koneksi di background sejak awal, bukan saat request pertama
+            mongo_kwargs = {"maxPoolSize": config.MONGO_MAX_POOL_SIZE, "minPoolSize": config.MONGO_MIN_POOL_SIZE}
+            if server_selection_timeout_ms is not None:
+                mongo_kwargs["serverSelectionTimeoutMS"] = server_selection_timeout_ms
+            self.mongo_client = MongoClient(config.MONGODB_URI, **mongo_kwargs)
+            self.mongo_client.server_info()
+            self.collection = self.mongo_client[DB_NAME][COLLECTION_NAME]
+            self.timings["mongodb"] = time.perf_counter() - mark
+
+            # Vector Store Configuration
+            self.vector_store = MongoDBAtlasVectorSearch(
+                collection=self.collection,
+                embedding=self.embeddings,
+                index_name=INDEX_NAME,
+                text_key=text_key
+            )
+
+            def search_by_vector(query_vector, k, score_threshold=None, pre_filter=None):
+                return atlas_search_by_vector(
+                    self.collection, query_vector, k, score_threshold, pre_filter, text_key=text_key
+                )
+
+            self.search_by_vector = search_by_vector
+            # Selalu lewat vector_search_pipeline: score_threshold diterapkan ($match) dan skor
+            # ikut di metadata; as_retriever(search_type="similarity") mengabaikan threshold.
+            # Mode penyimpanan ringkas: field ringkas tahap pertama, re-rank float di pipeline.
+            self.retriever = AtlasVectorRetriever(
+                collection=self.collection,
+                embeddings=self.embeddings,
+                text_key=text_key,
+                search_kwargs=vector_kwargs
+            )
+        else:
+            raise ValueError(f"Retriever backend tidak dikenal: {self.retriever_backend}")
+
+        # Korpus multi-shard (shards.py): fan-out paralel ke koleksi bernama lalu merge skor
+        self.shards = None
+        shard_specs = load_shard_specs()
+        if shard_specs:
+            self.shards = create_sharded_search(self, shard_specs, text_key=text_key)
+            self.search_by_vector = self.shards.search
+
+        # Penanda versi korpus dari ingest.py, dicek ulang oleh service (corpus.py)
+        self.corpus = create_corpus_watcher(self, shard_specs)
+        if self.retrieval_cache is not None:
+            # Hasil vector search dan teks chunk di DocumentStore basi setelah ingest baru
+            self.retrieval_cache.set_corpus_version(self.corpus.version)
+            self.corpus.subscribe(self.retrieval_cache.set_corpus_version)
+
+        if self.retrieval_cache is not None:
+            # Vector search berulang dilayani dari memori; routing topik ikut memakai search_by_vector
+            self.search_by_vector = self.retrieval_cache.wrap(self.search_by_vector)
+        if self.shards is not None or self.retrieval_cache is not None:
+            self.retriever = VectorSearchRetriever(
+                embeddings=self.embeddings,
+                search=self.search_by_vector,
+                search_kwargs=vector_kwargs
+            )
+
+        # Partisi topik: retriever vector diganti versi yang memakai pre-filter Topik
+        self.topic_router = None
+        if config.TOPIC_ROUTING if topic_routing is None else topic_routing:
+            mark = time.perf_counter()
+            self.topic_router = create_topic_router(self)
+            if self.topic_router is not None:
+                self.retriever = create_routed_retriever(self, self.topic_router, vector_kwargs)
+            self.timings["topic_router"] = time.perf_counter() - mark
+
+        self.lexical_index = None
+        if self.hybrid:
+            mark = time.perf_counter()
+            self.lexical_index = LexicalChunkIndex(load_chunk_records(self, text_key=text_key))
+            self.retriever = create_hybrid_retriever(self.retriever, self.lexical_index, search_kwargs)
+            self.timings["lexical_index"] = time.perf_counter() - mark
+
+        # Konteks prompt: gabung overlap, buang duplikat, potong sesuai budget token
+        self.context_builder = None
+        if config.CONTEXT_BUILDER_ENABLED:
+            self.context_builder = ContextBuilder(
+                max_tokens=config.CONTEXT_MAX_TOKENS if context_max_tokens is None else context_max_tokens,
+                near_duplicate_threshold=config.CONTEXT_NEAR_DUPLICATE
+            )
+            self.retriever = BudgetedRetriever(retriever=self.retriever, builder=self.context_builder)
+
+        # Model Configuration
+        llm_kwargs = {"max_tokens": max_tokens} if max_tokens else {}
+        self.llm = ChatOpenAI(
+            model_name=model_name,
+            openai_api_key=config.OPENAI_KEY,
+            temperature=0,
+            streaming=streaming,
+            stream_usage=streaming,
+            http_client=self.http_client,
+            http_async_client=self.http_async_client,
+            **openai_retry_kwargs(),
+            **llm_kwargs
+        )
+        self.prompt = prompt
+
+        # Routing model: model murah untuk pertanyaan sederhana, model_name untuk sisanya
+        self.fast_llm = None
+        self.model_router = None
+        if config.MODEL_ROUTING if model_routing is None else model_routing:
+            self.fast_llm = ChatOpenAI(
+                model_name=config.MODEL_ROUTING_FAST_MODEL,
+                openai_api_key=config.OPENAI_KEY,
+                temperature=0,
+                streaming=streaming,
+                stream_usage=streaming,
+                http_client=self.http_client,
+                http_async_client=self.http_async_client,
+                **openai_retry_kwargs(),
+                **llm_kwargs
+            )
+            self.model_router = create_model_router(config.MODEL_ROUTING_FAST_MODEL, model_name)
+
+        # Retrieval Chain
+        if self.model_router is not None:
+            self.qa = create_routed_qa(
+                self.retriever, self.fast_llm, self.llm, prompt, self.model_router,
+                return_source_documents=return_source_documents
+            )
+        else:
+            self.qa = RetrievalQA.from_chain_type(
+                llm=self.llm,
+                chain_type="stuff",
+                retriever=self.retriever,
+                chain_type_kwargs={"prompt": prompt},
+                return_source_documents=return_source_documents
+            )
+
+        self.build_seconds = time.perf_counter() - started
+        self.timings["total"] = self.build_seconds
+
+    def close(self):
+        self.http_client.close()
+        if self.shards is not None:
+            self.shards.close()
+        if isinstance(self.embeddings, (CachedEmbeddings, PrewarmedEmbeddings)):
+            self.embeddings.close()
+        if self.mongo_client is not None:
+            self.mongo_client.close()
+
+    async def aclose(self):
+        """close() plus klien async; dipanggil dari event loop yang memakai klien tersebut"""
+        await self.http_async_client.aclose()
+        if self.async_mongo_client is not None:
+            await self.async_mongo_client.close()
+        self.close()
@@ -0,0 +1,211 @@
+"""Server HTML fixture lokal yang meniru halaman FAQ pajak.go.id untuk menguji scraper.py.
+
+Halaman daftar /id/faq-page?page=N (div.view-content, td.views-field-title,
+a[hreflang=id]) dan detail /id/faq/<n> (div.node__content) dibuat deterministik;
+ada jawaban paragraf, daftar bernomor, tabel dan PDF. Setiap respons membawa
+ETag/Last-Modified dan menjawab 304 untuk request bersyarat; latensi dan 503
+acak bisa diinjeksi, jawaban bisa diubah dengan mutate().
+
+Menjalankan server:
+    python fake_djp.py serve --port 8788 --pages 8 --per-page 10
+    python scraper.py --base-url http://127.0.0.1:8788 --state /tmp/state.json --output /tmp/faq.csv
+Demo (run dingin, run ETag, run terputus lalu dilanjutkan, jawaban berubah):
+    python fake_djp.py demo
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PAGE_TEMPLATE = "<html><head><title>{title}</title></head><body><main>{body}</main></body></html>"
+
+
+class FakeDJPState:
+    def __init__(self, pages=8, per_page=10, latency=0.0, error_rate=0.0, seed=None):
+        self.pages = pages
+        self.per_page = per_page
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.revisions = {}
+        self.modified = {}
+        self.started = time.time()
+        self.counts = {"requests": 0, "ok": 0, "not_modified": 0, "injected": 0}
+
+    def question(self, n):
+        return f"Bagaimana ketentuan pajak nomor {n} bagi Wajib Pajak?"
+
+    def mutate(self, n):
+        """Ubah jawaban detail nomor n (revisi baru, ETag berubah)"""
+        with self._lock:
+            self.revisions[n] = self.revisions.get(n, 0) + 1
+            self.modified[n] = time.time()
+
+    def listing(self, page):
+        rows = []
+        for i in range(self.per_page):
+            n = page * self.per_page + i
+            rows.append(
+                f'<tr><td class="views-field views-field-title">{i + 1}. '
+                f'<a href="/id/faq/{n}" hreflang="id">{self.question(n)}</a></td></tr>'
+            )
+        body = f'<div class="view-content"><table>{"".join(rows)}</table></div>'
+        return PAGE_TEMPLATE.format(title=f"FAQ halaman {page}", body=body), self.started
+
+    def detail(self, n):
+        revision = self.revisions.get(n, 0)
+        suffix = f" (pembaruan {revision})" if revision else ""
+        kind = n % 5
+        if kind == 0:
+            content = f"<p>Ketentuan nomor {n} diatur dalam PMK terbaru{suffix}.</p>"
+        elif kind == 1:
+            items = "".join(f"<li>Langkah {i} untuk nomor {n}{suffix}</li>" for i in range(1, 4))
+            content = f"<p>Berikut langkahnya:</p><ol>{items}</ol>"
+        elif kind == 2:
+            content = (f'<table class="table table-striped table-bordered table-hover">'
+                       f"<tr><td>Tarif {n}{suffix}</td></tr></table>")
+        elif kind == 3:
+            content = (f"<p>Dokumen nomor {n} dapat diunduh{suffix}.</p>"
+                       f'<p><a data-asw-orgfontsize="14" href="/system/files/faq-{n}.pdf">PDF</a></p>')
+        else:
+            content = f"<p>Wajib Pajak dapat melapor secara daring{suffix}.</p><p>Nomor rujukan {n}.</p>"
+        body = f'<article><h1>{self.question(n)}</h1><div class="node__content">{content}</div></article>'
+        return PAGE_TEMPLATE.format(title=self.question(n), body=body), self.modified.get(n, self.started)
+
+    def admit(self):
+        with self._lock:
+            self.counts["requests"] += 1
+            if self.random.random() < self.error_rate:
+                self.counts["injected"] += 1
+                return False
+            return True
+
+
+def _handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, body=b"", headers=None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if state.latency:
+                time.sleep(state.latency)
+            if not state.admit():
+                return self._send(503, b"Service Unavailable", {"Retry-After": "1"})
+
+            url = urlparse(self.path)
+            match = re.fullmatch(r"/id/faq/(\d+)", url.path)
+            if url.path == "/id/faq-page":
+                page = int(parse_qs(url.query).get("page", ["0"])[0])
+                if page >= state.pages:
+                    html, modified = PAGE_TEMPLATE.format(title="FAQ", body=""), state.started
+                else:
+                    html, modified = state.listing(page)
+            elif match and int(match.group(1)) < state.pages * state.per_page:
+                html, modified = state.detail(int(match.group(1)))
+            else:
+                return self._send(404, b"Not Found")
+
+            body = html.encode("utf-8")
+            etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+            headers = {"ETag": etag, "Last-Modified": formatdate(modified, usegmt=True)}
+            if self.headers.get("If-None-Match") == etag:
+                with state._lock:
+                    state.counts["not_modified"] += 1
+                return self._send(304, headers=headers)
+            with state._lock:
+                state.counts["ok"] += 1
+            self._send(200, body, {**headers, "Content-Type": "text/html; charset=utf-8"})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_fake_djp(state, port=0, host="127.0.0.1"):
+    """Jalankan server di thread daemon; hasilnya (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), _handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def run_demo(args):
+    from scraper import Scraper, ScrapeState
+
+    state = FakeDJPState(pages=args.pages, per_page=args.per_page, latency=args.latency,
+                         error_rate=args.error_rate, seed=1)
+    server, base_url = start_fake_djp(state)
+    state_path = os.path.join(tempfile.mkdtemp(), "scrape_state.json")
+    total = args.pages * args.per_page
+
+    def scrape(label, concurrency, stop_after=None):
+        before = dict(state.counts)
+        scraper = Scraper(base_url, ScrapeState(state_path), concurrency=concurrency, headless_fallback=False)
+        if stop_after:
+            def stopper():
+                while len(scraper.state.run["done"]) < stop_after:
+                    time.sleep(0.01)
+                scraper.stop()
+            scraper.state.start_run((0, args.pages))
+            threading.Thread(target=stopper, daemon=True).start()
+        rows, stats = scraper.run(0, args.pages)
+        scraper.close()
+        server_counts = {key: state.counts[key] - before[key] for key in state.counts}
+        print(json.dumps({"run": label, **stats, "server": server_counts}, ensure_ascii=False))
+        return rows
+
+    scrape("sequential_cold", 1)
+    os.remove(state_path)
+    scrape("parallel_cold", args.concurrency)
+    scrape("parallel_etag", args.concurrency)
+    for n in (3, 7):
+        state.mutate(n)
+    scrape("two_answers_changed", args.concurrency)
+    os.remove(state_path)
+    scrape("interrupted", args.concurrency, stop_after=total // 2)
+    scrape("resumed", args.concurrency)
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server HTML fixture FAQ DJP untuk uji scraper.py")
+    parser.add_argument("command", choices=["serve", "demo"])
+    parser.add_argument("--port", type=int, default=8788)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--per-page", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.2, help="Detik per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Peluang 503 acak per request")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.command == "demo":
+        run_demo(args)
+        return
+    state = FakeDJPState(pages=args.pages, per_page=args.per_page, latency=args.latency, error_rate=args.error_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), _handler(state))
+    print(f"ASTRAX_SCRAPE_BASE_URL=http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(state.counts))
+
+
+if __name__ == "__main__":
+    main()
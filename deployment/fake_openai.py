@@ -0,0 +1,315 @@
+"""Server OpenAI palsu lokal untuk menguji pembatas laju (ratelimit.py).
+
+Meniru endpoint /v1/chat/completions (termasuk stream SSE), /v1/embeddings
+dan Files + Batch API minimal (untuk batch.py) dengan latensi buatan, batas RPM (token bucket seperti OpenAI; 429 +
+retry-after + header x-ratelimit-*) dan 429 acak sebesar error_rate.
+
+Menjalankan server (lalu arahkan aplikasi dengan OPENAI_BASE_URL):
+    python fake_openai.py serve --port 8787 --rpm 60 --error-rate 0.1 --latency 0.5
+Demo beban: panggil ChatOpenAI bersamaan dengan dan tanpa pembatas laju:
+    python fake_openai.py demo --requests 100 --concurrency 20 --rpm 120 --error-rate 0.1
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fakes import FakeEmbeddings
+
+
+class FakeOpenAIState:
+    """Batas RPM ala OpenAI: jatah penuh rpm, terisi kembali rata selama satu menit"""
+
+    def __init__(self, rpm=0, error_rate=0.0, latency=0.0, retry_after=1.0, seed=None):
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.latency = latency
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._available = float(rpm)
+        self._updated = time.monotonic()
+        self.counts = {"requests": 0, "ok": 0, "rate_limited": 0, "injected": 0}
+        self.batches = FakeBatches()
+
+    def admit(self):
+        """(status, header tambahan): 200 atau 429 karena RPM habis / injeksi acak"""
+        with self._lock:
+            now = time.monotonic()
+            self.counts["requests"] += 1
+            headers = {}
+            if self.rpm:
+                self._available = min(self.rpm, self._available + (now - self._updated) * self.rpm / 60)
+                self._updated = now
+                if self._available < 1:
+                    self.counts["rate_limited"] += 1
+                    return 429, {
+                        "retry-after": f"{(1 - self._available) * 60 / self.rpm:.3f}",
+                        "x-ratelimit-limit-requests": str(self.rpm),
+                        "x-ratelimit-remaining-requests": "0",
+                    }
+                self._available -= 1
+                headers = {
+                    "x-ratelimit-limit-requests": str(self.rpm),
+                    "x-ratelimit-remaining-requests": str(int(self._available)),
+                    "x-ratelimit-reset-requests": f"{(self.rpm - self._available) * 60 / self.rpm:.3f}s",
+                }
+            if self.random.random() < self.error_rate:
+                self.counts["injected"] += 1
+                return 429, {"retry-after": str(self.retry_after)}
+            self.counts["ok"] += 1
+            return 200, headers
+
+
+def _reply(body):
+    """(kata jawaban, usage): potongan konteks prompt sebelum "Pertanyaan" """
+    prompt = body["messages"][-1].get("content") or ""
+    words = (str(prompt).split("Pertanyaan", 1)[0].split() or ["ok"])[-30:]
+    usage = {"prompt_tokens": len(str(prompt).split()), "completion_tokens": len(words),
+             "total_tokens": len(str(prompt).split()) + len(words)}
+    return words, usage
+
+
+def chat_completion(body):
+    words, usage = _reply(body)
+    message = {"role": "assistant", "content": " ".join(words)}
+    return {
+        "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": body.get("model"),
+        "choices": [{"index": 0, "message": message, "finish_reason": "stop"}], "usage": usage,
+    }
+
+
+class FakeBatches:
+    """Files + Batch API minimal: batch selesai setelah `polls` kali dicek"""
+
+    def __init__(self, polls=1):
+        self.polls = polls
+        self.files = {}
+        self.batches = {}
+        # describe() bisa membuat file output di dalam retrieve()
+        self._lock = threading.RLock()
+
+    def add_file(self, content):
+        with self._lock:
+            file_id = f"file-fake-{len(self.files) + 1}"
+            self.files[file_id] = content
+        return {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                "filename": "batch.jsonl", "purpose": "batch", "status": "processed"}
+
+    def create(self, body):
+        with self._lock:
+            batch_id = f"batch-fake-{len(self.batches) + 1}"
+            requests = [json.loads(line) for line in self.files[body["input_file_id"]].splitlines() if line.strip()]
+            self.batches[batch_id] = {"body": body, "requests": requests, "checks": 0, "output_file_id": None}
+        return self.describe(batch_id)
+
+    def describe(self, batch_id):
+        batch = self.batches[batch_id]
+        done = batch["checks"] > self.polls
+        if done and batch["output_file_id"] is None:
+            lines = [
+                json.dumps({"id": f"req-{i}", "custom_id": request["custom_id"], "error": None,
+                            "response": {"status_code": 200, "request_id": f"req-{i}",
+                                         "body": chat_completion(request["body"])}})
+                for i, request in enumerate(batch["requests"])
+            ]
+            batch["output_file_id"] = self.add_file("\n".join(lines) + "\n")["id"]
+        total = len(batch["requests"])
+        return {
+            "id": batch_id, "object": "batch", "endpoint": batch["body"]["endpoint"],
+            "input_file_id": batch["body"]["input_file_id"], "completion_window": "24h",
+            "status": "completed" if done else "in_progress", "created_at": int(time.time()),
+            "output_file_id": batch["output_file_id"],
+            "request_counts": {"total": total, "completed": total if done else 0, "failed": 0},
+        }
+
+    def retrieve(self, batch_id):
+        with self._lock:
+            self.batches[batch_id]["checks"] += 1
+            return self.describe(batch_id)
+
+
+def _multipart_file(body, content_type):
+    """Isi bagian "file" dari body multipart/form-data"""
+    boundary = content_type.split("boundary=", 1)[1].strip('"').encode()
+    for part in body.split(b"--" + boundary):
+        headers, _, content = part.partition(b"\r\n\r\n")
+        if b'name="file"' in headers:
+            return content.rsplit(b"\r\n", 1)[0].decode("utf-8")
+    return ""
+
+
+def _handler(state):
+    embeddings = FakeEmbeddings(dimensions=1536)
+    batches = state.batches
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            match = re.fullmatch(r"/v1/batches/([\w-]+)", self.path)
+            if match and match.group(1) in batches.batches:
+                return self._send_json(200, batches.retrieve(match.group(1)))
+            match = re.fullmatch(r"/v1/files/([\w-]+)/content", self.path)
+            if match and match.group(1) in batches.files:
+                content = batches.files[match.group(1)].encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                return self.wfile.write(content)
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+        def do_POST(self):
+            raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path.endswith("/files"):
+                return self._send_json(200, batches.add_file(_multipart_file(raw, self.headers["Content-Type"])))
+            body = json.loads(raw or b"{}")
+            if self.path.endswith("/batches"):
+                return self._send_json(200, batches.create(body))
+            status, headers = state.admit()
+            if state.latency:
+                time.sleep(state.latency)
+            if status == 429:
+                error = {"message": "Rate limit reached (fake)", "type": "requests", "code": "rate_limit_exceeded"}
+                return self._send_json(429, {"error": error}, headers)
+            if self.path.endswith("/embeddings"):
+                return self._embeddings(body, headers)
+            if self.path.endswith("/chat/completions"):
+                return self._chat(body, headers)
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+        def _embeddings(self, body, headers):
+            inputs = body.get("input")
+            if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+                inputs = [inputs]
+            texts = [" ".join(map(str, item)) if isinstance(item, list) else item for item in inputs]
+            vectors = embeddings.embed_documents(texts)
+            data = [{"object": "embedding", "index": i, "embedding": vector} for i, vector in enumerate(vectors)]
+            usage = {"prompt_tokens": sum(len(text.split()) for text in texts), "total_tokens": 0}
+            self._send_json(200, {"object": "list", "data": data, "model": body.get("model"), "usage": usage},
+                            headers)
+
+        def _chat(self, body, headers):
+            words, usage = _reply(body)
+            base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": body.get("model")}
+            if not body.get("stream"):
+                return self._send_json(200, chat_completion(body), headers)
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            for word in words:
+                chunk = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            final = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            self.wfile.write(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+            if (body.get("stream_options") or {}).get("include_usage"):
+                last = {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+                self.wfile.write(f"data: {json.dumps(last)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_fake_openai(state, port=0, host="127.0.0.1"):
+    """Jalankan server di thread daemon; hasilnya (server, base_url)"""
+    server = ThreadingHTTPServer((host, port), _handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def run_demo(args):
+    from langchain_openai import ChatOpenAI
+
+    import config
+    import ratelimit
+
+    results = []
+    for limited in (False, True):
+        state = FakeOpenAIState(rpm=args.rpm, error_rate=args.error_rate, latency=args.latency, seed=1)
+        server, base_url = start_fake_openai(state)
+        config.RATE_LIMIT_ENABLED = limited
+        ratelimit._limiter = None
+        from engine import create_http_client, openai_retry_kwargs
+
+        llm = ChatOpenAI(
+            model_name="gpt-4", openai_api_key="sk-fake", base_url=base_url,
+            http_client=create_http_client(), max_tokens=100, **openai_retry_kwargs()
+        )
+        failures = 0
+
+        def call(i):
+            nonlocal failures
+            try:
+                llm.invoke(f"Konteks pertanyaan nomor {i}")
+            except Exception:
+                failures += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(call, range(args.requests)))
+        elapsed = time.perf_counter() - started
+        server.shutdown()
+        limiter = ratelimit.get_rate_limiter()
+        results.append({
+            "mode": "rate_limited" if limited else "sdk_default",
+            "requests": args.requests,
+            "failed": failures,
+            "seconds": round(elapsed, 2),
+            "server": state.counts,
+            "limiter": limiter.stats() if limiter else None,
+        })
+    for result in results:
+        print(json.dumps(result, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server OpenAI palsu (429 + latensi) untuk uji pembatas laju")
+    parser.add_argument("command", choices=["serve", "demo"])
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--rpm", type=int, default=60, help="Batas request per menit (0 = tanpa batas)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Peluang 429 acak per request")
+    parser.add_argument("--latency", type=float, default=0.2, help="Detik per request")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "demo":
+        run_demo(args)
+        return
+    state = FakeOpenAIState(rpm=args.rpm, error_rate=args.error_rate, latency=args.latency)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), _handler(state))
+    print(f"OPENAI_BASE_URL=http://127.0.0.1:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(state.counts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Pengganti lokal untuk OpenAI (embedding + chat) tanpa akses jaringan.
+
+Dipakai load test dan benchmark agar bisa dijalankan offline dan hasilnya
+reproducible. Latensi API bisa disimulasikan lewat parameter latency.
+"""
+import asyncio
+import hashlib
+import re
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_TOKEN = re.compile(r"\w+")
+
+
+class FakeEmbeddings(Embeddings):
+    """Embedding bag-of-words ter-hash: teks dengan kata yang mirip menghasilkan vektor yang mirip"""
+
+    def __init__(self, dimensions=256, latency=0.0, dense=False):
+        self.dimensions = dimensions
+        self.latency = latency
+        # dense: tiap kata dipetakan ke vektor Gaussian acak (seperti embedding asli,
+        # semua dimensi terisi) agar pemotongan dimensi / quantization bisa diuji
+        self.dense = dense
+        self.model = f"fake-{dimensions}"
+        self.calls = 0
+        self._token_vectors = {}
+
+    def _token_vector(self, seed):
+        vector = self._token_vectors.get(seed)
+        if vector is None:
+            vector = np.random.default_rng(seed).standard_normal(self.dimensions).astype(np.float32)
+            self._token_vectors[seed] = vector
+        return vector
+
+    def _vector(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for token in _TOKEN.findall(text.lower()):
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            seed = int.from_bytes(digest[:4], "little")
+            if self.dense:
+                vector += self._token_vector(seed)
+            else:
+                vector[seed % self.dimensions] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model yang "menjawab" dengan potongan konteks di prompt.
+
+    latency = waktu sampai token pertama, token_latency = jeda antar token.
+    Token selalu dikirim ke callback on_llm_new_token seperti ChatOpenAI(streaming=True).
+    """
+
+    latency: float = 0.0
+    token_latency: float = 0.0
+    max_words: int = 60
+    model_name: str = "fake-chat"
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _reply(self, messages):
+        prompt = messages[-1].content if messages else ""
+        context = prompt.split("Pertanyaan", 1)[0]
+        words = context.split()[-self.max_words:]
+        return " ".join(words) or "Tidak ada konteks."
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        reply = self._reply(messages)
+        for word in reply.split(" "):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            if run_manager:
+                run_manager.on_llm_new_token(word + " ")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=reply))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        reply = self._reply(messages)
+        for word in reply.split(" "):
+            if self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            if run_manager:
+                await run_manager.on_llm_new_token(word + " ")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=reply))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        for word in self._reply(messages).split(" "):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def create_fake_index(csv_path, path, embeddings, topics_path=None):
+    """Bangun index lokal dari CSV FAQ memakai embedding palsu (tanpa Atlas/OpenAI)"""
+    from ingest import LocalIndexSink, ingest
+    from local_index import LocalVectorIndex
+
+    ingest(csv_path, LocalIndexSink(path), embeddings, topics_path=topics_path)
+    return LocalVectorIndex(path)
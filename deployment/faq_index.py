@@ -0,0 +1,250 @@
+"""Jalur cepat FAQ: pertanyaan yang (hampir) sama persis dengan kolom
+Question dijawab langsung dari Answer yang sudah dikurasi, tanpa retrieval
+dan tanpa panggilan LLM.
+
+Dua tingkat pencocokan:
+1. hash teks ternormalisasi (normalize_query) -> kecocokan persis, confidence 1.0
+2. kandidat BM25 atas kolom Question, di-skor ulang dengan kemiripan
+   n-gram karakter; dipakai hanya jika confidence >= threshold dan token
+   berangka (nomor formulir/pasal) serta kata negasi sama persis
+   (normalization.guard_tokens). Trigram karakter saja tidak membedakan
+   "SPT 1770" dari "SPT 1770 SS", atau "yang dapat" dari "yang tidak dapat".
+
+Evaluasi threshold atas pasangan pertanyaan hampir-kembar dan varian
+negasi dari korpus:
+    python faq_index.py evaluate
+"""
+import argparse
+import csv
+import json
+import random
+import threading
+
+import config
+from lexical import BM25Index, char_ngrams, ngram_similarity
+from normalization import NEGATIONS, guard_tokens, normalize_query
+from postprocess import clean_answer
+
+
+def load_faq_rows(csv_path):
+    """(question, answer) unik per Question; baris terakhir yang menang (sama dengan ingest.load_rows)"""
+    rows = {}
+    with open(csv_path, encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            question = (row.get("Question") or "").strip()
+            if question and (row.get("Answer") or "").strip():
+                rows[question] = row["Answer"]
+    return list(rows.items())
+
+
+class FaqIndex:
+    def __init__(self, rows, threshold=0.9, candidates=5):
+        self.threshold = threshold
+        self.candidates = candidates
+        self.questions = [question for question, _ in rows]
+        self.answers = [clean_answer(answer) for _, answer in rows]
+        self.exact = {normalize_query(question): i for i, question in enumerate(self.questions)}
+        self.ngrams = [char_ngrams(question) for question in self.questions]
+        self.guards = [guard_tokens(question) for question in self.questions]
+        self.bm25 = BM25Index(self.questions)
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_csv(cls, csv_path, **kwargs):
+        return cls(load_faq_rows(csv_path), **kwargs)
+
+    def lookup(self, query):
+        """(index, confidence, metode) kandidat terbaik tanpa memandang threshold"""
+        i = self.exact.get(normalize_query(query))
+        if i is not None:
+            return i, 1.0, "exact"
+        query_ngrams = char_ngrams(query)
+        query_guards = guard_tokens(query)
+        best, best_score = None, 0.0
+        for i, _ in self.bm25.search(query, k=self.candidates):
+            if self.guards[i] != query_guards:
+                continue
+            score = ngram_similarity(query_ngrams, self.ngrams[i])
+            if score > best_score:
+                best, best_score = i, score
+        return best, best_score, "fuzzy"
+
+    def match(self, query):
+        """{"question", "answer", "confidence", "method"} atau None jika tidak yakin"""
+        i, confidence, method = self.lookup(query)
+        matched = i is not None and confidence >= self.threshold
+        with self._lock:
+            if not matched:
+                self.misses += 1
+            elif method == "exact":
+                self.exact_hits += 1
+            else:
+                self.fuzzy_hits += 1
+        if not matched:
+            return None
+        return {
+            "question": self.questions[i],
+            "answer": self.answers[i],
+            "confidence": round(confidence, 4),
+            "method": method,
+        }
+
+    def stats(self):
+        total = self.exact_hits + self.fuzzy_hits + self.misses
+        return {
+            "questions": len(self.questions),
+            "threshold": self.threshold,
+            "exact_hits": self.exact_hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.fuzzy_hits) / total if total else 0.0,
+        }
+
+
+def create_faq_index():
+    """FaqIndex dari config, None jika dimatikan atau CSV tidak ada"""
+    if not config.FAQ_FAST_PATH_ENABLED:
+        return None
+    try:
+        return FaqIndex.from_csv(config.FAQ_CSV_PATH, threshold=config.FAQ_FAST_PATH_THRESHOLD)
+    except FileNotFoundError:
+        return None
+
+
+# (query, Question yang seharusnya dijawab; None = jangan dijawab dari FAQ)
+FORM_CODE_CASES = [
+    ("Bagaimana petunjuk pengisian SPT 1770?", "Bagaimana petunjuk pengisian SPT 1770?"),
+    ("Bagaimana petunjuk pengisian SPT 1770 S?", "Bagaimana petunjuk pengisian SPT 1770S?"),
+    ("Bagaimana petunjuk pengisian SPT 1770 SS?", "Bagaimana petunjuk pengisian SPT 1770SS?"),
+    ("Bagaimana petunjuk pengisian SPT 1721?", None),
+    ("Apa batasan khilaf yang tidak dapat diberikan pengurangan atau penghapusan sanksi administrasi?", None),
+    ("Dalam hal Wajib Pajak melakukan kesalahan berulang, bagaimana interpretasi khilaf, padahal diketahui "
+     "bahwa Wajib Pajak belum pernah diperiksa?", None),
+    ("Mengapa DJP Online bisa diakses?", None),
+]
+# Kata tempat "tidak" disisipkan untuk membuat varian negasi pertanyaan korpus
+NEGATABLE = ("dapat", "bisa", "boleh", "wajib", "perlu", "harus", "pernah", "ada", "akan", "termasuk", "diberikan")
+
+
+def check_cases(index, cases=FORM_CODE_CASES):
+    """Baris per kasus; ok=False jika FAQ yang salah (atau ada FAQ padahal tidak boleh) dijawab"""
+    results = []
+    for query, expected in cases:
+        match = index.match(query)
+        matched = match["question"] if match else None
+        results.append({
+            "query": query,
+            "expected": expected,
+            "matched": matched,
+            "confidence": match["confidence"] if match else None,
+            "ok": matched == expected,
+        })
+    return results
+
+
+def negate(question):
+    """Varian berlawanan: kata negasi dibuang, atau "tidak" disisipkan / "sudah" -> "belum".
+
+    None jika tidak ada tempat yang masuk akal untuk negasi.
+    """
+    words = question.split()
+    bare = [normalize_query(word) for word in words]
+    if any(word in NEGATIONS for word in bare):
+        return " ".join(word for word, key in zip(words, bare) if key not in NEGATIONS)
+    for i, key in enumerate(bare):
+        if key == "sudah":
+            return " ".join(words[:i] + ["belum"] + words[i + 1:])
+        if key in NEGATABLE:
+            return " ".join(words[:i] + ["tidak"] + words[i:])
+    return None
+
+
+def negation_scores(rows):
+    """(skor, sama dengan sumber?) varian negasi tiap pertanyaan ke index lengkap.
+
+    Hit ke pertanyaan sumbernya berarti jawaban yang berlawanan disajikan.
+    """
+    index = FaqIndex(rows)
+    scores = []
+    for question, _ in rows:
+        variant = negate(question)
+        if variant is None:
+            continue
+        i, score, _ = index.lookup(variant)
+        scores.append((score, i is not None and index.questions[i] == question))
+    return scores
+
+
+def near_duplicate_scores(rows, seed=42, drop=0.1):
+    """Skor fuzzy untuk dua jenis query dari korpus.
+
+    positives: variasi pertanyaan (huruf kecil, tanpa tanda baca, sebagian
+    kata dibuang) ke index lengkap -> (skor, benar?)
+    negatives: pertanyaan ke index tanpa pertanyaan itu sendiri (leave-one-out);
+    kandidat yang muncul adalah FAQ kembarannya, jadi setiap hit adalah jawaban salah
+    """
+    from benchmark import perturb
+
+    rng = random.Random(seed)
+    index = FaqIndex(rows)
+    positives = []
+    for question, _ in rows:
+        i, score, _ = index.lookup(perturb(question, rng, drop=drop))
+        positives.append((score, i is not None and index.questions[i] == question))
+    negatives = []
+    for j, (question, _) in enumerate(rows):
+        i, score, _ = FaqIndex(rows[:j] + rows[j + 1:]).lookup(question)
+        if i is not None:
+            negatives.append(score)
+    return positives, negatives
+
+
+def sweep_thresholds(positives, negatives, negations, thresholds):
+    rows = []
+    for threshold in thresholds:
+        accepted = [correct for score, correct in positives if score >= threshold]
+        rows.append({
+            "threshold": threshold,
+            "answered": len(accepted) / len(positives) if positives else 0.0,
+            "wrong": accepted.count(False),
+            "near_duplicate_hits": sum(score >= threshold for score in negatives),
+            "negation_hits": sum(score >= threshold and source for score, source in negations),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluasi jalur cepat FAQ")
+    sub = parser.add_subparsers(dest="command", required=True)
+    evaluate = sub.add_parser("evaluate", help="Sweep threshold + cek nomor formulir dan negasi")
+    evaluate.add_argument("--csv", default=config.FAQ_CSV_PATH)
+    evaluate.add_argument("--threshold", type=float, default=config.FAQ_FAST_PATH_THRESHOLD)
+    evaluate.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rows = load_faq_rows(args.csv)
+    positives, negatives = near_duplicate_scores(rows, seed=args.seed)
+    negations = negation_scores(rows)
+    thresholds = [round(0.80 + 0.01 * i, 2) for i in range(20)]
+    sweep = sweep_thresholds(positives, negatives, negations, thresholds)
+    safe = [
+        row["threshold"] for row in sweep
+        if not row["wrong"] and not row["near_duplicate_hits"] and not row["negation_hits"]
+    ]
+    checks = check_cases(FaqIndex(rows, threshold=args.threshold))
+    print(json.dumps({
+        "threshold": args.threshold,
+        "lowest_safe_threshold": safe[0] if safe else None,
+        "negation_variants": len(negations),
+        "sweep": sweep,
+        "cases": checks,
+    }, ensure_ascii=False, indent=2))
+    if not all(check["ok"] for check in checks):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Retrieval hybrid: BM25 atas teks chunk + vector search, digabung dengan
+reciprocal rank fusion (RRF).
+
+Token persis seperti "NPWP 16 digit", "SPT 1770 S" atau "PPh 21" sering
+kalah peringkat di embedding; BM25 menangkapnya, sehingga top-k kecil sudah
+cukup presisi. Skor RRF dokumen = sum(1 / (rrf_k + rank)) di setiap daftar.
+
+Vector search tetap menjadi penjaga relevansi: jika tidak ada dokumen yang
+lolos score_threshold, hasil hybrid juga kosong (jawaban "tidak ditemukan"
+tidak berubah).
+"""
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+import config
+from lexical import BM25Index
+
+RRF_K = 60
+
+
+class LexicalChunkIndex:
+    """BM25 atas chunk yang sama dengan isi vector store"""
+
+    def __init__(self, records):
+        self.records = records
+        # Pertanyaan FAQ ikut diindeks: token penting sering hanya ada di Question
+        self.bm25 = BM25Index([
+            f"{record.get('metadata', {}).get('Question', '')}\n{record['text']}" for record in records
+        ])
+
+    def documents(self, query, k=10):
+        results = []
+        for i, score in self.bm25.search(query, k=k):
+            record = self.records[i]
+            metadata = dict(record.get("metadata", {}), bm25_score=round(score, 4))
+            results.append(Document(page_content=record["text"], metadata=metadata))
+        return results
+
+
+def load_chunk_records(engine, text_key="text", embedding_key="embedding"):
+    """Teks + metadata seluruh chunk dari vector store engine (tanpa embedding)"""
+    if engine.retriever_backend == "local":
+        return engine.vector_store.records
+    records = []
+    for doc in engine.collection.find({}, {embedding_key: 0}):
+        text = doc.pop(text_key, "")
+        doc["_id"] = str(doc["_id"])
+        records.append({"text": text, "metadata": doc})
+    return records
+
+
+def document_key(doc):
+    # _id tidak selalu ada di metadata (tergantung backend), teks + pertanyaan selalu ada
+    return doc.metadata.get("Question"), doc.page_content
+
+
+def reciprocal_rank_fusion(result_lists, k, rrf_k=RRF_K):
+    """Gabungkan beberapa daftar dokumen terurut menjadi top-k berdasarkan skor RRF"""
+    fused, documents = {}, {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = document_key(doc)
+            fused[key] = fused.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            # Dokumen dari vector search (membawa score) diutamakan
+            if key not in documents or "score" in doc.metadata:
+                documents[key] = Document(
+                    page_content=doc.page_content,
+                    metadata={**documents.get(key, doc).metadata, **doc.metadata}
+                )
+    ranked = sorted(fused, key=fused.get, reverse=True)[:k]
+    for key in ranked:
+        documents[key].metadata["rrf_score"] = round(fused[key], 6)
+    return [documents[key] for key in ranked]
+
+
+def candidate_search_kwargs(search_kwargs):
+    """search_kwargs vector retriever: ambil lebih banyak kandidat untuk difusi"""
+    return {**search_kwargs, "k": max(search_kwargs.get("k", 4), config.HYBRID_CANDIDATES)}
+
+
+class HybridRetriever(BaseRetriever):
+    vector_retriever: BaseRetriever
+    lexical_index: LexicalChunkIndex
+    k: int = 3
+    candidates: int = 10
+    rrf_k: int = RRF_K
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _fuse(self, query, vector_documents):
+        if not vector_documents:
+            return []
+        lexical_documents = self.lexical_index.documents(query, k=self.candidates)
+        return reciprocal_rank_fusion([vector_documents, lexical_documents], self.k, self.rrf_k)
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        callbacks = run_manager.get_child() if run_manager else None
+        vector_documents = self.vector_retriever.invoke(query, config={"callbacks": callbacks})
+        return self._fuse(query, vector_documents)
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        callbacks = run_manager.get_child() if run_manager else None
+        vector_documents = await self.vector_retriever.ainvoke(query, config={"callbacks": callbacks})
+        return self._fuse(query, vector_documents)
+
+
+def create_hybrid_retriever(vector_retriever, lexical_index, search_kwargs):
+    return HybridRetriever(
+        vector_retriever=vector_retriever,
+        lexical_index=lexical_index,
+        k=search_kwargs.get("k", 4),
+        candidates=config.HYBRID_CANDIDATES
+    )
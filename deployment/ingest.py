@@ -0,0 +1,400 @@
+"""Pipeline ingestion FAQ ke vector store (pengganti modeling/RAG_vectorDB.ipynb).
+
+Setiap chunk diberi _id berupa hash isi (pertanyaan + teks chunk + model
+embedding), sehingga pada setiap run:
+- chunk yang sudah ada tidak di-embed ulang,
+- chunk baru/berubah di-embed per batch besar secara paralel (dengan retry),
+- chunk milik baris yang dihapus/berubah ikut dihapus dari koleksi,
+- penanda versi korpus (corpus.py) diperbarui agar cache service ikut kosong.
+
+Contoh:
+    python ingest.py --csv ../data/faq_combined.csv
+    python ingest.py --target local --dry-run
+"""
+import argparse
+import csv
+import hashlib
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+import openai
+from pymongo import MongoClient, ReplaceOne, UpdateOne
+from langchain_openai import OpenAIEmbeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+import config
+import context
+from corpus import corpus_fingerprint, write_atlas_version, write_local_version
+from embedding_cache import CachedEmbeddings
+from local_index import LocalVectorIndex, index_paths, save_index
+from quantization import VectorStorage, load_compact
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536
+
+
+def sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def create_text_splitter():
+    # Optimized Text Splitting (sama dengan RAG_vectorDB.ipynb)
+    return RecursiveCharacterTextSplitter(
+        chunk_size=500,  # Ukuran chunk lebih kecil untuk presisi
+        chunk_overlap=100,  # Overlap untuk menjaga konteks
+        separators=["\n\n", "\n", "(?<=\\. )", " "],
+        length_function=len
+    )
+
+
+def load_rows(csv_path):
+    """Baris FAQ unik per Question (baris terakhir yang menang, seperti answer_from_doc)"""
+    rows = {}
+    with open(csv_path, encoding="utf-8") as f:
+        for index, row in enumerate(csv.DictReader(f)):
+            question = (row.get("Question") or "").strip()
+            if question:
+                rows[question] = {"row": index, **row}
+    return list(rows.values())
+
+
+def attach_topics(rows, topics_path):
+    """Isi kolom Topik dari CSV berlabel (mis. faq_categorization.csv) berdasarkan Question"""
+    with open(topics_path, encoding="utf-8") as f:
+        topics = {
+            (row.get("Question") or "").strip(): row["Topik"]
+            for row in csv.DictReader(f) if row.get("Topik")
+        }
+    for row in rows:
+        if not row.get("Topik") and row["Question"].strip() in topics:
+            row["Topik"] = topics[row["Question"].strip()]
+    return rows
+
+
+def build_chunks(rows, csv_path, splitter, model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIMENSIONS):
+    """Pecah setiap baris FAQ menjadi chunk dengan _id berbasis hash isi"""
+    chunks = []
+    for row in rows:
+        question = row["Question"].strip()
+        # Format konten sama dengan CSVLoader(content_columns=["Answer"])
+        content = f"Answer: {row.get('Answer') or ''}"
+        row_key = sha256(question)
+        for position, text in enumerate(splitter.split_text(content)):
+            metadata = {
+                "Question": question,
+                "source": csv_path,
+                "row": row["row"],
+                "row_key": row_key,
+                "chunk": position,
+            }
+            key = f"{model}:{dimensions}\n{question}\n{position}\n{text}"
+            if row.get("Topik"):
+                metadata["Topik"] = row["Topik"]
+                # Topik ikut di _id agar perubahan label ikut ter-upsert (embedding tetap dari cache)
+                key += f"\n{row['Topik']}"
+            chunk_id = sha256(key)
+            chunks.append({"_id": chunk_id, "text": text, "metadata": metadata})
+    return chunks
+
+
+def is_transient(exc):
+    """Error yang bisa pulih dengan retry: 408/429/5xx, timeout, gagal koneksi.
+
+    429 karena kuota habis (insufficient_quota), auth dan validasi langsung
+    gagal, sama dengan ratelimit.py.
+    """
+    if isinstance(exc, openai.RateLimitError):
+        return exc.code != "insufficient_quota"
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code == 408 or exc.status_code >= 500
+    return isinstance(exc, (openai.APIConnectionError, httpx.TransportError))
+
+
+def retry_with_backoff(fn, attempts=5, base_delay=1.0, max_delay=30.0, retry_on=is_transient):
+    """Panggil fn, ulangi dengan exponential backoff + jitter jika retry_on(error) benar"""
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except Exception as exc:
+            if attempt == attempts - 1 or not retry_on(exc):
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+
+def embed_chunks(embeddings, chunks, batch_size=256, concurrency=4):
+    """Embed teks chunk per batch secara paralel, urutan hasil dipertahankan"""
+    batches = [chunks[i:i + batch_size] for i in range(0, len(chunks), batch_size)]
+
+    def embed_batch(batch):
+        texts = [chunk["text"] for chunk in batch]
+        return retry_with_backoff(lambda: embeddings.embed_documents(texts))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for batch, vectors in zip(batches, pool.map(embed_batch, batches)):
+            for chunk, vector in zip(batch, vectors):
+                chunk["embedding"] = vector
+    return chunks
+
+
+def count_tokens(texts):
+    return sum(context.count_tokens(text) for text in texts)
+
+
+class MongoSink:
+    """Koleksi Atlas sebagai tujuan ingestion (bulk upsert/delete)"""
+
+    def __init__(self, collection, text_key="text", embedding_key="embedding", storage=None):
+        self.collection = collection
+        self.text_key = text_key
+        self.embedding_key = embedding_key
+        # Field embedding_<dimensi> untuk tahap pertama (quantization.py)
+        self.storage = storage or VectorStorage.from_config()
+
+    def existing_ids(self):
+        return {doc["_id"] for doc in self.collection.find({}, {"_id": 1})}
+
+    def upsert(self, chunks, batch_size=500):
+        for i in range(0, len(chunks), batch_size):
+            operations = [
+                ReplaceOne(
+                    {"_id": chunk["_id"]},
+                    {
+                        self.text_key: chunk["text"],
+                        self.embedding_key: chunk["embedding"],
+                        **self.storage.reduced_fields(chunk["embedding"], self.embedding_key),
+                        **chunk["metadata"],
+                    },
+                    upsert=True
+                )
+                for chunk in chunks[i:i + batch_size]
+            ]
+            self.collection.bulk_write(operations, ordered=False)
+
+    def delete(self, ids):
+        ids = list(ids)
+        for i in range(0, len(ids), 1000):
+            self.collection.delete_many({"_id": {"$in": ids[i:i + 1000]}})
+
+    def backfill(self, batch_size=500):
+        """Isi field embedding_<dimensi> dari embedding tersimpan (tanpa embed ulang).
+
+        _id chunk tidak memuat ASTRAX_VECTOR_DIMENSIONS, jadi setelah mode ini
+        dinyalakan chunk lama tetap "tidak berubah" dan tidak pernah di-upsert;
+        tanpa backfill, vector search ke field baru hanya menemukan chunk baru.
+        """
+        if not self.storage.dimensions:
+            return 0
+        field = self.storage.field(self.embedding_key)
+        cursor = self.collection.find(
+            {field: {"$exists": False}, self.embedding_key: {"$exists": True}},
+            {self.embedding_key: 1}
+        )
+        filled = 0
+        batch = []
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) == batch_size:
+                filled += self._backfill_batch(field, batch)
+                batch = []
+        if batch:
+            filled += self._backfill_batch(field, batch)
+        return filled
+
+    def _backfill_batch(self, field, docs):
+        reduced = self.storage.reduce([doc[self.embedding_key] for doc in docs])
+        operations = [
+            UpdateOne({"_id": doc["_id"]}, {"$set": {field: vector.tolist()}})
+            for doc, vector in zip(docs, reduced)
+        ]
+        self.collection.bulk_write(operations, ordered=False)
+        return len(docs)
+
+    def finalize(self):
+        return self.backfill()
+
+    def publish_version(self, version):
+        # Dokumen penanda di koleksi terpisah, bukan di koleksi chunk (ikut terhapus saat diff)
+        write_atlas_version(self.collection, version)
+
+
+class LocalIndexSink:
+    """Index lokal (local_index.py) sebagai tujuan ingestion"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(index_paths(path)[0]):
+            index = LocalVectorIndex(path, mmap=False)
+            for vector, record in zip(index.matrix, index.records):
+                self.entries[record["metadata"]["_id"]] = (vector, record)
+
+    def existing_ids(self):
+        return set(self.entries)
+
+    def upsert(self, chunks):
+        for chunk in chunks:
+            metadata = dict(chunk["metadata"], _id=chunk["_id"])
+            self.entries[chunk["_id"]] = (chunk["embedding"], {"text": chunk["text"], "metadata": metadata})
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.entries.pop(chunk_id, None)
+
+    def finalize(self):
+        vectors = [vector for vector, _ in self.entries.values()]
+        records = [record for _, record in self.entries.values()]
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        save_index(self.path, matrix, records)
+        storage = VectorStorage.from_config()
+        if storage.active and len(records):
+            # Sidecar vektor ringkas dibangun sekarang, bukan saat engine pertama dibuka
+            load_compact(self.path, storage, matrix)
+
+    def publish_version(self, version):
+        write_local_version(self.path, version)
+
+
+class StageTimer:
+    """Catat durasi dan jumlah item per tahap untuk laporan throughput"""
+
+    def __init__(self):
+        self.stages = []
+
+    def run(self, name, fn):
+        started = time.perf_counter()
+        result = fn()
+        self.stages.append({"stage": name, "seconds": time.perf_counter() - started})
+        return result
+
+    def report(self, counts):
+        lines = []
+        for stage in self.stages:
+            seconds = stage["seconds"]
+            line = f"{stage['stage']:<8} {seconds:8.2f}s"
+            for unit, count in counts.get(stage["stage"], {}).items():
+                rate = count / seconds if seconds > 0 else float("inf")
+                line += f"  {count} {unit} ({rate:,.1f} {unit}/s)"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def ingest(csv_path, sink, embeddings, batch_size=256, concurrency=4, dry_run=False, topics_path=None):
+    timer = StageTimer()
+    counts = {}
+
+    rows = timer.run("load", lambda: load_rows(csv_path))
+    if topics_path:
+        rows = attach_topics(rows, topics_path)
+    counts["load"] = {"rows": len(rows)}
+
+    splitter = create_text_splitter()
+    chunks = timer.run("split", lambda: build_chunks(rows, csv_path, splitter))
+    counts["split"] = {"chunks": len(chunks)}
+
+    existing = timer.run("diff", sink.existing_ids)
+    wanted = {chunk["_id"] for chunk in chunks}
+    new_chunks = [chunk for chunk in chunks if chunk["_id"] not in existing]
+    stale_ids = existing - wanted
+
+    summary = {
+        "rows": len(rows),
+        "chunks": len(chunks),
+        "unchanged": len(chunks) - len(new_chunks),
+        "new": len(new_chunks),
+        "deleted": len(stale_ids),
+    }
+    if dry_run:
+        return summary, timer.report(counts)
+
+    if new_chunks:
+        timer.run("embed", lambda: embed_chunks(embeddings, new_chunks, batch_size, concurrency))
+        counts["embed"] = {
+            "chunks": len(new_chunks),
+            "tokens": count_tokens([chunk["text"] for chunk in new_chunks]),
+        }
+        timer.run("upsert", lambda: sink.upsert(new_chunks))
+        counts["upsert"] = {"docs": len(new_chunks)}
+    if stale_ids:
+        timer.run("delete", lambda: sink.delete(stale_ids))
+        counts["delete"] = {"docs": len(stale_ids)}
+    backfilled = timer.run("finalize", sink.finalize)
+    if backfilled:
+        counts["finalize"] = {"backfilled": backfilled}
+    # Ditulis terakhir: service baru mengosongkan cache setelah korpus selesai diperbarui
+    summary["version"] = corpus_fingerprint(wanted)
+    sink.publish_version(summary["version"])
+    return summary, timer.report(counts)
+
+
+def create_embeddings(use_cache=True):
+    embeddings = OpenAIEmbeddings(
+        model=EMBEDDING_MODEL,
+        openai_api_key=config.OPENAI_KEY,
+        dimensions=EMBEDDING_DIMENSIONS
+    )
+    if config.EMBEDDING_CACHE_ENABLED and use_cache:
+        embeddings = CachedEmbeddings(
+            embeddings,
+            config.EMBEDDING_CACHE_PATH,
+            max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES
+        )
+    return embeddings
+
+
+def create_sink(target, local_index=config.LOCAL_INDEX_PATH, collection=None):
+    if target == "atlas":
+        from engine import DB_NAME, COLLECTION_NAME
+
+        client = MongoClient(config.MONGODB_URI)
+        # Koleksi lain untuk shard korpus (shards.py), default koleksi utama
+        return MongoSink(client[DB_NAME][collection or COLLECTION_NAME])
+    return LocalIndexSink(local_index)
+
+
+def print_report(summary, report, embeddings):
+    print(report)
+    if isinstance(embeddings, CachedEmbeddings):
+        print(f"Cache embedding: {embeddings.stats()}")
+    print(
+        f"Baris: {summary['rows']} | Chunk: {summary['chunks']} | "
+        f"Tidak berubah: {summary['unchanged']} | Baru: {summary['new']} | Dihapus: {summary['deleted']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion FAQ Astrax ke vector store")
+    parser.add_argument("--csv", default=config.FAQ_CSV_PATH)
+    parser.add_argument("--target", choices=["atlas", "local"], default="atlas")
+    parser.add_argument("--local-index", default=config.LOCAL_INDEX_PATH)
+    parser.add_argument("--collection", help="Koleksi Atlas tujuan, mis. shard Astrax_regulasi (default: Astrax)")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--dry-run", action="store_true", help="Hanya hitung perubahan, tanpa embed/tulis")
+    parser.add_argument("--topics", default=config.FAQ_TOPICS_CSV_PATH,
+                        help="CSV berkolom Topik untuk metadata partisi topik (kosong = tanpa Topik)")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="Selalu panggil API embedding")
+    args = parser.parse_args()
+
+    # Unduh encoding tiktoken ke TIKTOKEN_CACHE_DIR selagi ada jaringan (dipakai budget konteks)
+    if context.get_encoding() is None:
+        print(f"Encoding tiktoken tidak tersedia di {context.encoding_cache_path()}; "
+              "hitungan token memakai perkiraan 4 karakter/token")
+    embeddings = create_embeddings(use_cache=not args.no_embedding_cache)
+    sink = create_sink(args.target, args.local_index, args.collection)
+    summary, report = ingest(
+        args.csv, sink, embeddings,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        dry_run=args.dry_run,
+        topics_path=args.topics if args.topics and os.path.exists(args.topics) else None
+    )
+    print_report(summary, report, embeddings)
+
+
+if __name__ == "__main__":
+    main()
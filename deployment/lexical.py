@@ -0,0 +1,72 @@
+"""Index leksikal ringan (BM25 dan n-gram karakter) tanpa dependensi tambahan.
+
+Dipakai untuk pencocokan pertanyaan FAQ (faq_index.py) dan sebagai sisi
+leksikal retriever hybrid. Tokenisasi memakai normalize_query sehingga
+"SPT 1770 S" dan "spt 1770 s" menghasilkan token yang sama.
+"""
+import math
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from normalization import normalize_query
+
+
+def tokenize(text):
+    return normalize_query(text).split()
+
+
+def char_ngrams(text, n=3):
+    """Multiset n-gram karakter dari teks yang sudah dinormalisasi"""
+    padded = f" {normalize_query(text)} "
+    return Counter(padded[i:i + n] for i in range(max(len(padded) - n + 1, 1)))
+
+
+def ngram_similarity(a, b):
+    """Cosine similarity antar multiset n-gram (0..1)"""
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[gram] for gram, count in a.items() if gram in b)
+    norm = math.sqrt(sum(c * c for c in a.values())) * math.sqrt(sum(c * c for c in b.values()))
+    return dot / norm if norm else 0.0
+
+
+class BM25Index:
+    """Inverted index BM25 (Okapi) di memori"""
+
+    def __init__(self, texts, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(texts)
+        self.postings = defaultdict(list)
+        lengths = np.zeros(self.size, dtype=np.float32)
+        for i, text in enumerate(texts):
+            terms = Counter(tokenize(text))
+            lengths[i] = sum(terms.values())
+            for term, count in terms.items():
+                self.postings[term].append((i, count))
+        self.average_length = float(lengths.mean()) if self.size else 0.0
+        # Normalisasi panjang dokumen dihitung sekali di depan
+        self.length_norm = k1 * (1 - b + b * lengths / (self.average_length or 1.0))
+        self.idf = {
+            term: math.log(1 + (self.size - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def scores(self, query):
+        """Skor BM25 seluruh dokumen untuk teks query (array numpy)"""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            for i, count in self.postings.get(term, ()):
+                scores[i] += self.idf[term] * count * (self.k1 + 1) / (count + self.length_norm[i])
+        return scores
+
+    def search(self, query, k=10):
+        """[(index dokumen, skor)] terurut menurun, hanya skor > 0"""
+        scores = self.scores(query)
+        if not self.size:
+            return []
+        k = min(k, self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
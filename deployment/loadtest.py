@@ -0,0 +1,118 @@
+"""Load test jalur async: throughput dan latensi terhadap jumlah request bersamaan.
+
+Mode simulasi (tanpa OpenAI/Atlas, latensi API disimulasikan):
+    python loadtest.py --simulate --concurrency 1,4,16,64 --requests 200
+Mode nyata (memakai .env):
+    python loadtest.py --concurrency 1,4,16 --requests 50
+"""
+import argparse
+import asyncio
+import csv
+import json
+import tempfile
+import time
+
+import config
+from async_engine import AsyncAnswerer, Overloaded, create_async_answerer
+from streaming import percentile
+
+
+def load_questions(csv_path):
+    with open(csv_path, encoding="utf-8") as f:
+        return [row["Question"] for row in csv.DictReader(f) if row.get("Question")]
+
+
+def build_simulated_qa(csv_path, embed_latency, llm_latency, workdir):
+    from langchain.chains import RetrievalQA
+    from fakes import FakeChatModel, FakeEmbeddings, create_fake_index
+    from local_index import LocalRetriever
+    from prompts import PROFESSIONAL_PROMPT
+
+    embeddings = FakeEmbeddings(latency=embed_latency)
+    index = create_fake_index(csv_path, f"{workdir}/index", embeddings)
+    return RetrievalQA.from_chain_type(
+        llm=FakeChatModel(latency=llm_latency),
+        chain_type="stuff",
+        retriever=LocalRetriever(index=index, embeddings=embeddings, search_kwargs={"k": 3}),
+        chain_type_kwargs={"prompt": PROFESSIONAL_PROMPT},
+        return_source_documents=True
+    )
+
+
+async def run_level(answerer, questions, concurrency, total):
+    """Jalankan total request dengan `concurrency` klien bersamaan"""
+    latencies = []
+    errors = 0
+    cursor = iter(range(total))
+
+    async def client():
+        nonlocal errors
+        for i in cursor:
+            started = time.perf_counter()
+            try:
+                await answerer.answer(questions[i % len(questions)])
+                latencies.append(time.perf_counter() - started)
+            except Overloaded:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        "rejected": errors,
+    }
+
+
+async def main_async(args):
+    questions = load_questions(args.csv)
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    engine = None
+    if args.simulate:
+        workdir = tempfile.mkdtemp(prefix="astrax-loadtest-")
+        qa = build_simulated_qa(args.csv, args.embed_latency, args.llm_latency, workdir)
+        make_answerer = lambda: AsyncAnswerer(qa, max_concurrency=args.limit, max_queue=args.queue)
+    else:
+        from engine import AstraxEngine
+
+        engine = AstraxEngine()
+        make_answerer = lambda: create_async_answerer(engine, max_concurrency=args.limit, max_queue=args.queue)
+
+    results = []
+    for level in levels:
+        result = await run_level(make_answerer(), questions, level, args.requests)
+        results.append(result)
+        print(
+            f"concurrency={result['concurrency']:>4}  throughput={result['throughput_rps']:>8} req/s  "
+            f"p50={result['p50_ms']} ms  p95={result['p95_ms']} ms  rejected={result['rejected']}"
+        )
+    if engine is not None:
+        await engine.aclose()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"limit": args.limit, "results": results}, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test jalur async Astrax")
+    parser.add_argument("--csv", default=config.FAQ_CSV_PATH)
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32,64")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=config.ASYNC_MAX_CONCURRENCY, help="Batas semaphore server")
+    parser.add_argument("--queue", type=int, default=config.ASYNC_MAX_QUEUE)
+    parser.add_argument("--simulate", action="store_true", help="Pakai embedding/LLM palsu + index lokal")
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--output", help="Simpan hasil sebagai JSON")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
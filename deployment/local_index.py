@@ -0,0 +1,171 @@
+"""Vector index lokal (in-process) sebagai alternatif MongoDB Atlas Vector Search.
+
+Embedding semua chunk disimpan sebagai matriks NumPy float32 (baris sudah
+dinormalisasi) di file .npy yang di-memory-map, teks dan metadata di file
+.jsonl dengan urutan baris yang sama. Pencarian top-k cosine dilakukan
+sekaligus dengan satu perkalian matriks.
+
+Skor memakai skala yang sama dengan Atlas untuk similarity cosine,
+yaitu (1 + cosine) / 2, sehingga score_threshold bisa dipakai bergantian.
+
+Membuat index dari koleksi Atlas yang sudah ada:
+    python local_index.py export --out ../data/index/astrax
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from telemetry import report_spans
+
+
+def index_paths(path):
+    return f"{path}.npy", f"{path}.jsonl"
+
+
+def normalize_rows(matrix):
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def save_index(path, embeddings, records):
+    """Simpan matriks embedding dan record {"text", "metadata"} ke disk"""
+    if len(embeddings) != len(records):
+        raise ValueError("Jumlah embedding dan record harus sama")
+    matrix_path, records_path = index_paths(path)
+    os.makedirs(os.path.dirname(os.path.abspath(matrix_path)), exist_ok=True)
+    # File baru lalu os.replace: proses yang sedang mmap index lama tidak terkena SIGBUS
+    with open(f"{matrix_path}.tmp", "wb") as f:
+        np.save(f, normalize_rows(embeddings))
+    with open(f"{records_path}.tmp", "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(f"{matrix_path}.tmp", matrix_path)
+    os.replace(f"{records_path}.tmp", records_path)
+
+
+class LocalVectorIndex:
+    def __init__(self, path, mmap=True):
+        matrix_path, records_path = index_paths(path)
+        self.path = path
+        self.matrix = np.load(matrix_path, mmap_mode="r" if mmap else None)
+        with open(records_path, encoding="utf-8") as f:
+            self.records = [json.loads(line) for line in f if line.strip()]
+        if self.matrix.shape[0] != len(self.records):
+            raise ValueError(f"Index {path} rusak: {self.matrix.shape[0]} vektor, {len(self.records)} record")
+        self._partitions = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def dimensions(self):
+        return self.matrix.shape[1]
+
+    def partition(self, pre_filter):
+        """(nomor baris, sub-matriks) untuk filter kesamaan metadata, mis. {"Topik": "Regulasi"}"""
+        key = tuple(sorted(pre_filter.items()))
+        if key not in self._partitions:
+            rows = np.asarray([
+                i for i, record in enumerate(self.records)
+                if all(record.get("metadata", {}).get(field) == value for field, value in pre_filter.items())
+            ], dtype=np.int64)
+            self._partitions[key] = (rows, np.ascontiguousarray(self.matrix[rows]))
+        return self._partitions[key]
+
+    def search(self, query_vector, k=4, score_threshold=None, pre_filter=None):
+        """Top-k (index baris, skor) terurut dari skor tertinggi"""
+        rows, matrix = None, self.matrix
+        if pre_filter:
+            rows, matrix = self.partition(pre_filter)
+        if not len(matrix):
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = (1.0 + matrix @ query) / 2.0
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results = [(int(i if rows is None else rows[i]), float(scores[i])) for i in top]
+        if score_threshold is not None:
+            results = [(i, s) for i, s in results if s >= score_threshold]
+        return results
+
+    def documents(self, query_vector, k=4, score_threshold=None, pre_filter=None):
+        results = []
+        for i, score in self.search(query_vector, k=k, score_threshold=score_threshold, pre_filter=pre_filter):
+            record = self.records[i]
+            metadata = dict(record.get("metadata", {}), score=score)
+            results.append(Document(page_content=record["text"], metadata=metadata))
+        return results
+
+
+class LocalRetriever(BaseRetriever):
+    """Retriever LangChain di atas LocalVectorIndex.
+
+    search_kwargs sama seperti vector_store.as_retriever: {"k", "score_threshold"},
+    ditambah "pre_filter" opsional berupa filter kesamaan metadata.
+    """
+
+    index: LocalVectorIndex
+    embeddings: object
+    search_kwargs: dict = {"k": 4}
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        started = time.perf_counter()
+        query_vector = self.embeddings.embed_query(query)
+        embedded = time.perf_counter()
+        documents = self.index.documents(
+            query_vector,
+            k=self.search_kwargs.get("k", 4),
+            score_threshold=self.search_kwargs.get("score_threshold"),
+            pre_filter=self.search_kwargs.get("pre_filter")
+        )
+        report_spans(run_manager, embed=embedded - started, vector_search=time.perf_counter() - embedded)
+        return documents
+
+
+def export_from_mongodb(collection, path, text_key="text", embedding_key="embedding"):
+    """Salin seluruh chunk (teks, embedding, metadata) dari koleksi Atlas ke index lokal"""
+    embeddings, records = [], []
+    for doc in collection.find({}):
+        embeddings.append(doc[embedding_key])
+        metadata = {
+            key: value for key, value in doc.items()
+            if key not in ("_id", text_key, embedding_key)
+        }
+        metadata["_id"] = str(doc["_id"])
+        records.append({"text": doc[text_key], "metadata": metadata})
+    save_index(path, np.asarray(embeddings, dtype=np.float32), records)
+    return len(records)
+
+
+def main():
+    import config
+    from pymongo import MongoClient
+    from engine import DB_NAME, COLLECTION_NAME
+
+    parser = argparse.ArgumentParser(description="Kelola vector index lokal Astrax")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Ekspor chunk dari MongoDB Atlas")
+    export.add_argument("--out", default=config.LOCAL_INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        client = MongoClient(config.MONGODB_URI)
+        count = export_from_mongodb(client[DB_NAME][COLLECTION_NAME], args.out)
+        print(f"{count} chunk diekspor ke {args.out}")
+
+
+if __name__ == "__main__":
+    main()
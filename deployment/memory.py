@@ -0,0 +1,119 @@
+"""Memori percakapan multi-turn dengan ukuran tetap.
+
+- ConversationMemory (per sesi, di st.session_state): hanya `window` giliran
+  terakhir disimpan (jawaban dipotong ke answer_max_tokens); giliran yang
+  lebih lama dilipat ke ringkasan bergulir berukuran maksimal
+  summary_max_tokens. Ringkasan bersifat ekstraktif (pertanyaan + kalimat
+  awal jawaban), tanpa panggilan LLM tambahan.
+- QueryCondenser: pertanyaan lanjutan ("lalu bagaimana jika terlambat?")
+  ditulis ulang menjadi pertanyaan mandiri dari ringkasan + giliran terakhir
+  sebelum FAQ/cache/retrieval. Pertanyaan yang sudah berdiri sendiri tidak
+  memanggil LLM. Prompt jawaban tetap hanya berisi pertanyaan mandiri,
+  sehingga ukurannya tidak bertambah seiring panjang percakapan.
+- visible_messages: riwayat chat ditampilkan per halaman.
+"""
+import re
+import threading
+import time
+
+from langchain_core.output_parsers import StrOutputParser
+
+from context import count_tokens, truncate_tokens
+from normalization import normalize_query
+from prompts import CONDENSE_PROMPT
+from streaming import LatencyStats
+
+# Kata penghubung di awal kalimat atau rujukan ke giliran sebelumnya
+_FOLLOW_UP = re.compile(
+    r"^(lalu|terus|trus|kalau|kalo|jika|dan|selain itu|bagaimana (jika|kalau|dengan))\b"
+    r"|\b(itu|tersebut|tadi|sebelumnya|di atas|caranya|syaratnya|dendanya|batasnya|waktunya)\b"
+)
+SHORT_QUESTION_WORDS = 3
+
+
+def is_follow_up(question):
+    text = normalize_query(question)
+    return len(text.split()) <= SHORT_QUESTION_WORDS or bool(_FOLLOW_UP.search(text))
+
+
+def format_history(history):
+    lines = []
+    if history.get("summary"):
+        lines.append(f"Ringkasan percakapan sebelumnya:\n{history['summary']}")
+    for question, answer in history.get("turns", []):
+        lines.append(f"Pengguna: {question}\nAstrax: {answer}")
+    return "\n\n".join(lines)
+
+
+class ConversationMemory:
+    def __init__(self, window=3, summary_max_tokens=150, answer_max_tokens=120):
+        self.window = window
+        self.summary_max_tokens = summary_max_tokens
+        self.answer_max_tokens = answer_max_tokens
+        self.turns = []
+        self.summary = ""
+
+    def add(self, question, answer):
+        self.turns.append((question, truncate_tokens(answer, self.answer_max_tokens)))
+        while len(self.turns) > self.window:
+            self._fold(*self.turns.pop(0))
+
+    def _fold(self, question, answer):
+        first_line = answer.strip().split("\n", 1)[0]
+        summary = f"{self.summary}\n- {question} {truncate_tokens(first_line, 40)}".strip()
+        # Giliran tertua dilupakan lebih dulu
+        while count_tokens(summary) > self.summary_max_tokens and "\n" in summary:
+            summary = summary.split("\n", 1)[1]
+        self.summary = truncate_tokens(summary, self.summary_max_tokens)
+
+    def history(self):
+        """Bentuk serializable untuk AnswerService.answer / API (None jika kosong)"""
+        if not self.turns and not self.summary:
+            return None
+        return {"summary": self.summary, "turns": [list(turn) for turn in self.turns]}
+
+
+class QueryCondenser:
+    def __init__(self, llm, prompt=CONDENSE_PROMPT, max_tokens=100):
+        self.chain = prompt | llm.bind(max_tokens=max_tokens) | StrOutputParser()
+        self.latency = LatencyStats()
+        self._lock = threading.Lock()
+        self.condensed = 0
+        self.skipped = 0
+
+    def _skip(self, question, history):
+        if history and is_follow_up(question):
+            return False
+        with self._lock:
+            self.skipped += 1
+        return True
+
+    def _done(self, question, standalone, started):
+        self.latency.record(time.perf_counter() - started)
+        with self._lock:
+            self.condensed += 1
+        return standalone.strip().strip('"') or question
+
+    def condense(self, question, history):
+        if self._skip(question, history):
+            return question
+        started = time.perf_counter()
+        standalone = self.chain.invoke({"history": format_history(history), "question": question})
+        return self._done(question, standalone, started)
+
+    async def acondense(self, question, history):
+        if self._skip(question, history):
+            return question
+        started = time.perf_counter()
+        standalone = await self.chain.ainvoke({"history": format_history(history), "question": question})
+        return self._done(question, standalone, started)
+
+    def stats(self):
+        with self._lock:
+            return {"condensed": self.condensed, "skipped": self.skipped, "latency": self.latency.summary()}
+
+
+def visible_messages(messages, pages, page_size):
+    """(jumlah pesan tersembunyi, pesan di `pages` halaman terakhir)"""
+    start = max(0, len(messages) - pages * page_size)
+    return start, messages[start:]
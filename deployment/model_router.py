@@ -0,0 +1,217 @@
+"""Routing model: pertanyaan sederhana dengan retrieval yakin ke model murah,
+selain itu ke GPT-4.
+
+Aturan (semua lewat config / environment variable):
+- skor dokumen teratas < MODEL_ROUTING_MIN_SCORE          -> strong
+- jumlah kata > MODEL_ROUTING_MAX_WORDS                     -> strong
+- pertanyaan majemuk (beberapa "?", beberapa kata tanya,
+  atau daftar bernomor)                                     -> strong
+- selain itu                                                -> fast
+
+Retrieval dijalankan sekali; dokumen yang sama dipakai oleh model mana pun
+yang terpilih. Latensi, token dan perkiraan biaya dicatat per route.
+"""
+import json
+import re
+import threading
+import time
+
+from langchain.chains import RetrievalQA
+from langchain.chains.question_answering import load_qa_chain
+from langchain_core.callbacks import BaseCallbackHandler, adispatch_custom_event, dispatch_custom_event
+
+import config
+from streaming import LatencyStats
+
+FAST = "fast"
+STRONG = "strong"
+
+# Harga USD per 1K token (prompt, completion); bisa diganti lewat ASTRAX_MODEL_PRICES
+DEFAULT_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+
+_QUESTION_WORDS = re.compile(
+    r"\b(apa|apakah|bagaimana|mengapa|kenapa|kapan|berapa|siapa|dimana|di mana|bolehkah|bisakah)\b"
+)
+_ENUMERATION = re.compile(r"(^|\s)(\d+[.)]|[a-e][.)])\s")
+
+
+def load_prices():
+    prices = dict(DEFAULT_PRICES)
+    if config.MODEL_PRICES:
+        prices.update({model: tuple(value) for model, value in json.loads(config.MODEL_PRICES).items()})
+    return prices
+
+
+class RoutingRules:
+    def __init__(self, min_score=0.85, max_words=25, max_question_words=1):
+        self.min_score = min_score
+        self.max_words = max_words
+        self.max_question_words = max_question_words
+
+    def is_complex(self, question):
+        text = question.lower()
+        return (
+            len(text.split()) > self.max_words
+            or text.count("?") > 1
+            or len(_QUESTION_WORDS.findall(text)) > self.max_question_words
+            or bool(_ENUMERATION.search(text))
+        )
+
+    def choose(self, question, documents):
+        """(route, alasan)"""
+        scores = [doc.metadata["score"] for doc in documents if "score" in doc.metadata]
+        if not scores or max(scores) < self.min_score:
+            return STRONG, "low_retrieval_score"
+        if self.is_complex(question):
+            return STRONG, "complex_question"
+        return FAST, "simple"
+
+
+class UsageCollector(BaseCallbackHandler):
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def on_llm_end(self, response, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage:
+            self.prompt_tokens += usage.get("prompt_tokens", 0)
+            self.completion_tokens += usage.get("completion_tokens", 0)
+            return
+        for generations in response.generations:
+            for generation in generations:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                self.prompt_tokens += metadata.get("input_tokens", 0)
+                self.completion_tokens += metadata.get("output_tokens", 0)
+
+
+class ModelRouter:
+    def __init__(self, models, rules, prices=None):
+        self.models = models  # {"fast": "gpt-3.5-turbo", "strong": "gpt-4"}
+        self.rules = rules
+        self.prices = prices or load_prices()
+        self._lock = threading.Lock()
+        self.latency = {route: LatencyStats() for route in models}
+        self.counts = {route: {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+                       for route in models}
+        self.reasons = {}
+
+    def cost(self, route, prompt_tokens, completion_tokens):
+        prompt_price, completion_price = self.prices.get(self.models[route], (0.0, 0.0))
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+    def record(self, route, reason, seconds, usage):
+        cost = self.cost(route, usage.prompt_tokens, usage.completion_tokens)
+        self.latency[route].record(seconds)
+        with self._lock:
+            counts = self.counts[route]
+            counts["requests"] += 1
+            counts["prompt_tokens"] += usage.prompt_tokens
+            counts["completion_tokens"] += usage.completion_tokens
+            counts["cost_usd"] += cost
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        return cost
+
+    def stats(self):
+        with self._lock:
+            routes = {
+                route: {
+                    "model": self.models[route],
+                    **counts,
+                    "cost_usd": round(counts["cost_usd"], 6),
+                    "latency": self.latency[route].summary(),
+                }
+                for route, counts in self.counts.items()
+            }
+            return {"routes": routes, "reasons": dict(self.reasons)}
+
+
+class RoutedRetrievalQA(RetrievalQA):
+    """RetrievalQA dengan dua combine chain; combine_documents_chain = route strong.
+
+    Tanpa dokumen, LLM tidak dipanggil sama sekali (hasil kosong, pemanggil
+    menampilkan pesan "tidak ditemukan").
+    """
+
+    fast_chain: object
+    router: object
+
+    def _llm_callbacks(self, run_manager, usage):
+        if run_manager is None:
+            return [usage]
+        callbacks = run_manager.get_child()
+        callbacks.add_handler(usage, inherit=True)
+        return callbacks
+
+    def _output(self, answer, docs):
+        if self.return_source_documents:
+            return {self.output_key: answer, "source_documents": docs}
+        return {self.output_key: answer}
+
+    def _call(self, inputs, run_manager=None):
+        question = inputs[self.input_key]
+        callbacks = run_manager.get_child() if run_manager else None
+        docs = self.retriever.invoke(question, config={"callbacks": callbacks})
+        if not docs:
+            return self._output("", docs)
+        route, reason = self.router.rules.choose(question, docs)
+        usage = UsageCollector()
+        started = time.perf_counter()
+        chain = self.fast_chain if route == FAST else self.combine_documents_chain
+        answer = chain.invoke(
+            {"input_documents": docs, "question": question},
+            config={"callbacks": self._llm_callbacks(run_manager, usage)}
+        )[chain.output_key]
+        cost = self.router.record(route, reason, time.perf_counter() - started, usage)
+        if callbacks:
+            dispatch_custom_event("model_route", self._event(route, reason, cost), config={"callbacks": callbacks})
+        return self._output(answer, docs)
+
+    async def _acall(self, inputs, run_manager=None):
+        question = inputs[self.input_key]
+        callbacks = run_manager.get_child() if run_manager else None
+        docs = await self.retriever.ainvoke(question, config={"callbacks": callbacks})
+        if not docs:
+            return self._output("", docs)
+        route, reason = self.router.rules.choose(question, docs)
+        usage = UsageCollector()
+        started = time.perf_counter()
+        chain = self.fast_chain if route == FAST else self.combine_documents_chain
+        answer = (await chain.ainvoke(
+            {"input_documents": docs, "question": question},
+            config={"callbacks": self._llm_callbacks(run_manager, usage)}
+        ))[chain.output_key]
+        cost = self.router.record(route, reason, time.perf_counter() - started, usage)
+        if callbacks:
+            await adispatch_custom_event(
+                "model_route", self._event(route, reason, cost), config={"callbacks": callbacks}
+            )
+        return self._output(answer, docs)
+
+    def _event(self, route, reason, cost):
+        return {"route": route, "model": self.router.models[route], "reason": reason, "cost_usd": round(cost, 6)}
+
+
+def create_model_router(fast_model, strong_model):
+    return ModelRouter(
+        {FAST: fast_model, STRONG: strong_model},
+        RoutingRules(
+            min_score=config.MODEL_ROUTING_MIN_SCORE,
+            max_words=config.MODEL_ROUTING_MAX_WORDS,
+            max_question_words=config.MODEL_ROUTING_MAX_QUESTION_WORDS
+        )
+    )
+
+
+def create_routed_qa(retriever, fast_llm, strong_llm, prompt, router, return_source_documents=True):
+    return RoutedRetrievalQA(
+        retriever=retriever,
+        combine_documents_chain=load_qa_chain(strong_llm, chain_type="stuff", prompt=prompt),
+        fast_chain=load_qa_chain(fast_llm, chain_type="stuff", prompt=prompt),
+        router=router,
+        return_source_documents=return_source_documents
+    )
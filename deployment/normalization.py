@@ -0,0 +1,66 @@
+"""Normalisasi teks pertanyaan untuk kunci cache dan pencocokan FAQ"""
+import re
+import unicodedata
+
+_PUNCTUATION = re.compile(r"[^\w\s-]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text):
+    """Huruf kecil, tanpa tanda baca, spasi dirapikan.
+
+    "Cara reset password DJP Online?" dan "cara  reset password djp online"
+    menghasilkan kunci yang sama.
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+# Sufiks kode formulir yang sering ditulis terpisah: "1770 S", "1770 SS", "1770 S-I"
+_FORM_SUFFIX = re.compile(r"^(?:[a-z]|ss)(?:-[ivx]+)?$")
+
+
+def code_tokens(text):
+    """Token berisi angka (nomor formulir, pasal, PMK), sufiks formulir digabung.
+
+    "SPT 1770 S", "spt 1770S" -> {"1770s"}; "SPT 1770 SS" -> {"1770ss"}.
+    Dua pertanyaan yang kemiripan teksnya tinggi tetapi set ini berbeda
+    menanyakan hal yang berbeda (1770 vs 1770S vs 1721).
+    """
+    tokens = normalize_query(text).split()
+    codes = set()
+    for i, token in enumerate(tokens):
+        if not any(ch.isdigit() for ch in token):
+            continue
+        if token[-1].isdigit() and i + 1 < len(tokens) and _FORM_SUFFIX.match(tokens[i + 1]):
+            token += tokens[i + 1]
+        codes.add(token)
+    return frozenset(codes)
+
+
+# Kata negasi dan variasi tulisannya -> bentuk baku
+NEGATIONS = {
+    "tidak": "tidak", "tak": "tidak", "tdk": "tidak", "gak": "tidak", "ga": "tidak",
+    "nggak": "tidak", "ngga": "tidak", "enggak": "tidak",
+    "bukan": "bukan", "bkn": "bukan",
+    "belum": "belum", "blm": "belum",
+    "tanpa": "tanpa",
+    "jangan": "jangan",
+    "kecuali": "kecuali",
+}
+
+
+def polarity_tokens(text):
+    """Kata negasi (bentuk baku) di teks: "yang tidak dapat" -> {"tidak"}.
+
+    Kemiripan n-gram/embedding "yang dapat diberikan" vs "yang tidak dapat
+    diberikan" atau "sudah pernah" vs "belum pernah" tetap tinggi padahal
+    jawabannya berlawanan.
+    """
+    return frozenset(NEGATIONS[token] for token in normalize_query(text).split() if token in NEGATIONS)
+
+
+def guard_tokens(text):
+    """(code_tokens, polarity_tokens); pencocokan fuzzy/semantic hanya sah jika keduanya sama persis"""
+    return code_tokens(text), polarity_tokens(text)
@@ -0,0 +1,72 @@
+"""Post-processing jawaban LLM (format daftar bernomor, hapus markdown tebal)"""
+import re
+
+NOT_FOUND_MESSAGE = "Informasi tidak ditemukan dalam database resmi. Silakan hubungi Kring Pajak 1500200"
+BUSY_MESSAGE = "Layanan sedang ramai. Mohon tunggu sebentar lalu kirim ulang pertanyaan Anda."
+SYSTEM_ERROR_MESSAGE = (
+    "⚠️ Gangguan Sistem\n"
+    "Mohon maaf, terjadi kesalahan teknis. Silakan coba lagi atau hubungi:\n"
+    "• Hotline: 1500200\n"
+    "• Email: djp@pajak.go.id"
+)
+
+# Aturan format dikompilasi sekali (clean_answer dipanggil per jawaban dan per token streaming)
+_NUMBERED_ITEM = re.compile(r'(\d+\.)\s')
+_BOLD_MARKS = re.compile(r'[*_]{2}')
+# Karakter di akhir buffer yang masih bisa menjadi awal pola clean_answer
+_PENDING_TAIL = re.compile(r'(\d+\.?|[*_]+)$')
+# Jawaban LLM yang menyatakan informasi tidak ada di konteks atau pertanyaan di luar lingkup
+_NOT_FOUND_ANSWER = re.compile(
+    r'^(mohon\s+)?maaf\b[^.\n]{0,200}?\b(tidak|belum)\s+(ditemukan|tersedia|terdapat|ada|memiliki|dapat|bisa)\b'
+    r'|\bhanya\s+dapat\s+(menjawab|membantu)\b',
+    re.IGNORECASE
+)
+
+
+def is_not_found(answer):
+    """True jika jawaban (sudah dibersihkan) berupa pesan tidak ditemukan / penolakan"""
+    answer = answer.strip()
+    return answer == NOT_FOUND_MESSAGE or bool(_NOT_FOUND_ANSWER.search(answer[:400]))
+
+
+def clean_answer(raw_answer):
+    """Membersihkan jawaban dari referensi dan format khusus"""
+    return _format(raw_answer).strip()
+
+
+def _format(text):
+    # Format daftar bernomor, lalu hapus karakter khusus
+    return _BOLD_MARKS.sub('', _NUMBERED_ITEM.sub(r'\n\1 ', text))
+
+
+class IncrementalCleaner:
+    """clean_answer untuk output streaming.
+
+    Token ditampung lalu bagian yang sudah pasti (tidak mungkin lagi menjadi
+    bagian dari pola "12. " atau "**") dibersihkan dan dikunci. Hasil akhir
+    dari finish() identik dengan clean_answer(teks lengkap).
+    """
+
+    def __init__(self):
+        self.raw = ""
+        self._committed = ""
+        self._pending = ""
+
+    def feed(self, token):
+        self.raw += token
+        self._pending += token
+        tail = _PENDING_TAIL.search(self._pending)
+        # Tahan angka / "angka." / deretan * _ di akhir sampai token berikutnya
+        cut = tail.start() if tail else len(self._pending)
+        ready, self._pending = self._pending[:cut], self._pending[cut:]
+        if ready:
+            self._committed += _format(ready)
+        return self.text
+
+    @property
+    def text(self):
+        """Teks yang sudah bersih sejauh ini (untuk ditampilkan)"""
+        return self._committed.lstrip()
+
+    def finish(self):
+        return clean_answer(self.raw)
@@ -0,0 +1,396 @@
+"""Penyimpanan embedding ringkas untuk pencarian tahap pertama + re-rank float.
+
+Embedding text-embedding-3 bersifat Matryoshka: `dimensions` awal vektor
+(dinormalisasi ulang) sudah merupakan embedding yang valid. Mode penyimpanan:
+- dimensions : jumlah dimensi tahap pertama (0 = penuh, mis. 1536)
+- quantization: "none" (float32), "int8" (skala per dimensi) atau "binary"
+  (1 bit per dimensi, jarak Hamming)
+Tahap pertama mengambil `candidates` kandidat dari vektor ringkas, lalu
+kandidat di-re-rank dengan cosine float penuh sehingga skor tetap berskala
+Atlas (1 + cosine) / 2 dan score_threshold tidak berubah.
+
+Index lokal: vektor ringkas di memori (file sidecar .npz), matriks float
+penuh tetap di-memory-map dan hanya baris kandidat yang dibaca.
+Atlas: field `embedding_<dims>` (ditulis ingest.py; dokumen lama diisi dari
+`embedding` tersimpan tanpa embed ulang) diindeks dengan
+quantization bawaan Atlas; re-rank dihitung di server dalam pipeline
+aggregate sehingga vektor penuh tidak ikut ditransfer.
+
+Laporan recall@k, ukuran dan latensi tiap konfigurasi vs float penuh:
+    python quantization.py report --pad 50000
+    python quantization.py report --index ../data/index/astrax --live
+Definisi vector index Atlas untuk mode tertentu:
+    python quantization.py atlas-index --dimensions 512 --quantization int8
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import config
+from local_index import LocalVectorIndex, normalize_rows
+
+QUANTIZATIONS = ("none", "int8", "binary")
+BLOCK_ROWS = 8192
+# Jumlah bit 1 untuk setiap nilai byte (popcount tabel, untuk NumPy < 2.0)
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+
+
+class VectorStorage:
+    """Mode penyimpanan tahap pertama; inactive = float penuh tanpa re-rank"""
+
+    def __init__(self, quantization="none", dimensions=0, candidates=40):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Quantization tidak dikenal: {quantization} (pilih {', '.join(QUANTIZATIONS)})")
+        self.quantization = quantization
+        self.dimensions = dimensions
+        self.candidates = candidates
+
+    @classmethod
+    def from_config(cls):
+        return cls(config.VECTOR_QUANTIZATION, config.VECTOR_DIMENSIONS, config.VECTOR_RERANK_CANDIDATES)
+
+    @property
+    def active(self):
+        return self.quantization != "none" or bool(self.dimensions)
+
+    @property
+    def name(self):
+        return f"{self.quantization}:{self.dimensions or 'full'}"
+
+    def field(self, embedding_key="embedding"):
+        """Field Atlas vektor tahap pertama"""
+        return f"{embedding_key}_{self.dimensions}" if self.dimensions else embedding_key
+
+    def reduce(self, matrix):
+        """Potong ke `dimensions` awal lalu normalisasi ulang (Matryoshka)"""
+        matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+        if self.dimensions and self.dimensions < matrix.shape[1]:
+            matrix = matrix[:, :self.dimensions]
+        return normalize_rows(matrix)
+
+    def reduced_fields(self, vector, embedding_key="embedding"):
+        """Field tambahan dokumen Atlas untuk vektor tahap pertama ({} jika dimensi penuh)"""
+        if not self.dimensions:
+            return {}
+        return {self.field(embedding_key): self.reduce(vector)[0].tolist()}
+
+
+class CompactVectors:
+    """Vektor tahap pertama (float32 terpotong, int8 atau bit) dan skor perkiraannya"""
+
+    def __init__(self, storage, codes, scale=None):
+        self.storage = storage
+        self.codes = codes
+        self.scale = scale
+
+    @classmethod
+    def build(cls, storage, matrix):
+        reduced = storage.reduce(matrix)
+        if storage.quantization == "int8":
+            # Skala per dimensi dari nilai absolut maksimum korpus
+            scale = np.abs(reduced).max(axis=0) / 127.0
+            scale[scale == 0] = 1.0
+            codes = np.clip(np.rint(reduced / scale), -127, 127).astype(np.int8)
+            return cls(storage, codes, scale.astype(np.float32))
+        if storage.quantization == "binary":
+            return cls(storage, np.packbits(reduced > 0, axis=1))
+        return cls(storage, reduced)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def subset(self, rows):
+        return CompactVectors(self.storage, np.ascontiguousarray(self.codes[rows]), self.scale)
+
+    def cosine(self, query):
+        """Perkiraan cosine setiap vektor terhadap query (float32 ternormalisasi)"""
+        reduced = self.storage.reduce(query)[0]
+        if self.storage.quantization == "int8":
+            # Per blok agar konversi int8 -> float32 tidak menyalin seluruh matriks sekaligus
+            weights = reduced * self.scale
+            scores = np.empty(len(self.codes), dtype=np.float32)
+            for start in range(0, len(self.codes), BLOCK_ROWS):
+                block = self.codes[start:start + BLOCK_ROWS]
+                scores[start:start + len(block)] = block.astype(np.float32) @ weights
+            return scores
+        if self.storage.quantization == "binary":
+            bits = np.packbits(reduced > 0)
+            codes = self.codes
+            if codes.shape[1] % 8 == 0:
+                # XOR 64 bit sekaligus
+                codes, bits = codes.view(np.uint64), bits.view(np.uint64)
+            difference = np.bitwise_xor(codes, bits)
+            if hasattr(np, "bitwise_count"):
+                distance = np.bitwise_count(difference).sum(axis=1, dtype=np.int32)
+            else:
+                distance = _POPCOUNT[difference.view(np.uint8)].sum(axis=1)
+            return 1.0 - 2.0 * distance / reduced.shape[0]
+        return self.codes @ reduced
+
+
+def compact_path(path, storage):
+    return f"{path}.{storage.quantization}-{storage.dimensions or 'full'}.npz"
+
+
+def _source_stamp(matrix_path):
+    stat = os.stat(matrix_path)
+    return np.asarray([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def load_compact(path, storage, matrix):
+    """Baca sidecar vektor ringkas; dibangun ulang jika belum ada atau matriks float berubah"""
+    sidecar = compact_path(path, storage)
+    stamp = _source_stamp(f"{path}.npy")
+    if os.path.exists(sidecar):
+        with np.load(sidecar) as data:
+            if np.array_equal(data["source"], stamp):
+                scale = data["scale"] if data["scale"].size else None
+                return CompactVectors(storage, data["codes"], scale)
+    compact = CompactVectors.build(storage, matrix)
+    scale = compact.scale if compact.scale is not None else np.zeros(0, dtype=np.float32)
+    np.savez(sidecar, codes=compact.codes, scale=scale, source=stamp)
+    return compact
+
+
+class QuantizedVectorIndex(LocalVectorIndex):
+    """LocalVectorIndex dengan tahap pertama atas vektor ringkas dan re-rank float kandidat"""
+
+    def __init__(self, path, storage, mmap=True):
+        super().__init__(path, mmap=mmap)
+        self.storage = storage
+        self.compact = load_compact(path, storage, self.matrix)
+        self._compact_partitions = {}
+
+    def compact_partition(self, pre_filter):
+        key = tuple(sorted(pre_filter.items()))
+        if key not in self._compact_partitions:
+            rows, _ = self.partition(pre_filter)
+            self._compact_partitions[key] = (rows, self.compact.subset(rows))
+        return self._compact_partitions[key]
+
+    def partition(self, pre_filter):
+        """Nomor baris partisi saja; matriks float tidak disalin ke memori"""
+        key = tuple(sorted(pre_filter.items()))
+        if key not in self._partitions:
+            rows = np.asarray([
+                i for i, record in enumerate(self.records)
+                if all(record.get("metadata", {}).get(field) == value for field, value in pre_filter.items())
+            ], dtype=np.int64)
+            self._partitions[key] = (rows, None)
+        return self._partitions[key]
+
+    def search(self, query_vector, k=4, score_threshold=None, pre_filter=None):
+        rows, compact = None, self.compact
+        if pre_filter:
+            rows, compact = self.compact_partition(pre_filter)
+        if not len(compact):
+            return []
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32)[None, :])[0]
+        approximate = compact.cosine(query)
+
+        rerank = self.storage.candidates > 0
+        n = min(max(self.storage.candidates, k) if rerank else k, len(approximate))
+        top = np.argpartition(-approximate, n - 1)[:n]
+        candidates = top if rows is None else rows[top]
+        if rerank:
+            # Baca hanya baris kandidat dari matriks float (memory-map), urut agar akses disk berurutan
+            candidates = np.sort(candidates)
+            scores = (1.0 + self.matrix[candidates] @ query) / 2.0
+        else:
+            scores = (1.0 + approximate[top]) / 2.0
+        order = np.argsort(-scores)[:k]
+        results = [(int(candidates[i]), float(scores[i])) for i in order]
+        if score_threshold is not None:
+            results = [(i, s) for i, s in results if s >= score_threshold]
+        return results
+
+    def stats(self):
+        return {
+            "storage": self.storage.name,
+            "candidates": self.storage.candidates,
+            "vectors": len(self),
+            "first_pass_bytes": self.compact.nbytes,
+            "float_bytes": int(self.matrix.nbytes),
+        }
+
+
+def open_local_index(path, storage=None):
+    """Index lokal sesuai mode penyimpanan (LocalVectorIndex biasa jika tidak aktif)"""
+    storage = storage or VectorStorage.from_config()
+    if storage.active:
+        return QuantizedVectorIndex(path, storage)
+    return LocalVectorIndex(path)
+
+
+def rerank_stages(query_vector, k, storage, embedding_key="embedding"):
+    """Tahap aggregate setelah $vectorSearch: cosine float penuh dihitung di server, urut, ambil k"""
+    query = normalize_rows(np.asarray(query_vector, dtype=np.float32)[None, :])[0].tolist()
+    dot = {
+        "$sum": {
+            "$map": {
+                "input": {"$zip": {"inputs": [f"${embedding_key}", {"$literal": query}]}},
+                "as": "pair",
+                "in": {"$multiply": [{"$arrayElemAt": ["$$pair", 0]}, {"$arrayElemAt": ["$$pair", 1]}]},
+            }
+        }
+    }
+    return [
+        {"$set": {"score": {"$divide": [{"$add": [1, dot]}, 2]}}},
+        {"$sort": {"score": -1}},
+        {"$limit": k},
+    ]
+
+
+def atlas_index_definition(storage, base_dimensions=1536, embedding_key="embedding", filters=("Topik",)):
+    """Definisi vector index Atlas untuk field tahap pertama (quantization dilakukan Atlas)"""
+    field = {
+        "type": "vector",
+        "path": storage.field(embedding_key),
+        "numDimensions": storage.dimensions or base_dimensions,
+        "similarity": "cosine",
+    }
+    if storage.quantization != "none":
+        field["quantization"] = "scalar" if storage.quantization == "int8" else "binary"
+    return {"fields": [field] + [{"type": "filter", "path": path} for path in filters]}
+
+
+def parse_configurations(text, candidates):
+    """"int8:512,binary:full" -> [VectorStorage]; tiap konfigurasi diukur dengan dan tanpa re-rank"""
+    storages = []
+    for item in text.split(","):
+        quantization, _, dimensions = item.strip().partition(":")
+        dimensions = 0 if dimensions in ("", "full") else int(dimensions)
+        for n in (0, candidates):
+            storages.append(VectorStorage(quantization, dimensions, n))
+    return storages
+
+
+def pad_index(index, path, extra, seed=0, noise=0.5):
+    """Salinan index dengan `extra` vektor pengisi (vektor korpus + noise) untuk mengukur skala besar"""
+    rng = np.random.default_rng(seed)
+    base = np.asarray(index.matrix, dtype=np.float32)
+    picks = rng.integers(0, len(base), size=extra)
+    filler = base[picks] + rng.normal(0, noise / np.sqrt(base.shape[1]), size=(extra, base.shape[1]))
+    from local_index import save_index
+
+    records = index.records + [{"text": "", "metadata": {"_id": f"pad-{i}"}} for i in range(extra)]
+    save_index(path, np.vstack([base, filler.astype(np.float32)]), records)
+    return LocalVectorIndex(path)
+
+
+def measure(index, queries, k):
+    """(hasil top-k per query, daftar latensi detik)"""
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append([i for i, _ in index.search(query, k=k)])
+        latencies.append(time.perf_counter() - started)
+    return results, latencies
+
+
+def run_report(index_path, queries, k, storages):
+    """Recall@k terhadap float penuh, ukuran tahap pertama dan latensi untuk tiap konfigurasi"""
+    from benchmark import summarize
+
+    baseline = LocalVectorIndex(index_path, mmap=False)
+    expected, latencies = measure(baseline, queries, k)
+    rows = [{
+        "storage": "float32:full", "candidates": 0,
+        "first_pass_mb": round(baseline.matrix.nbytes / 2 ** 20, 2),
+        "compression": 1.0,
+        f"recall@{k}": 1.0,
+        **summarize(latencies),
+    }]
+    for storage in storages:
+        index = QuantizedVectorIndex(index_path, storage)
+        results, latencies = measure(index, queries, k)
+        recall = np.mean([len(set(got) & set(want)) / len(want) for got, want in zip(results, expected) if want])
+        rows.append({
+            "storage": storage.name, "candidates": storage.candidates,
+            "first_pass_mb": round(index.compact.nbytes / 2 ** 20, 2),
+            "compression": round(baseline.matrix.nbytes / index.compact.nbytes, 1),
+            f"recall@{k}": round(float(recall), 4),
+            **summarize(latencies),
+        })
+    return rows
+
+
+def format_report(rows):
+    columns = list(rows[0])
+    lines = ["  ".join(f"{column:>14}" for column in columns)]
+    lines += ["  ".join(f"{str(row[column]):>14}" for column in columns) for row in rows]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mode penyimpanan embedding ringkas Astrax")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    report = sub.add_parser("report", help="Recall@k, ukuran dan latensi vs float penuh")
+    report.add_argument("--index", help="Index lokal float (default: dibangun dari FAQ dengan embedding palsu)")
+    report.add_argument("--csv", default=config.FAQ_CSV_PATH)
+    report.add_argument("--live", action="store_true", help="Embed pertanyaan dengan OpenAI")
+    report.add_argument("--configs", default="none:512,none:256,int8:full,int8:512,int8:256,binary:full,binary:512")
+    report.add_argument("--candidates", type=int, default=config.VECTOR_RERANK_CANDIDATES)
+    report.add_argument("--k", type=int, default=3)
+    report.add_argument("--size", type=int, default=200, help="Jumlah pertanyaan")
+    report.add_argument("--pad", type=int, default=0, help="Tambah vektor pengisi untuk simulasi korpus besar")
+    report.add_argument("--output", help="Simpan laporan JSON")
+
+    atlas = sub.add_parser("atlas-index", help="Cetak definisi vector index Atlas")
+    atlas.add_argument("--quantization", choices=QUANTIZATIONS, default=config.VECTOR_QUANTIZATION)
+    atlas.add_argument("--dimensions", type=int, default=config.VECTOR_DIMENSIONS)
+    args = parser.parse_args()
+
+    if args.command == "atlas-index":
+        storage = VectorStorage(args.quantization, args.dimensions)
+        print(json.dumps(atlas_index_definition(storage), indent=2))
+        if storage.dimensions:
+            # Index atas field yang belum terisi membuat vector search diam-diam kosong
+            print(f"Jalankan ingest.py dengan ASTRAX_VECTOR_DIMENSIONS={storage.dimensions} sebelum membuat "
+                  f"index ini agar {storage.field()} terisi di semua dokumen", file=sys.stderr)
+        return
+
+    from benchmark import build_question_set, load_faq
+
+    questions = build_question_set(load_faq(args.csv), args.size, seed=42, perturbed=True)
+    workdir = tempfile.mkdtemp(prefix="astrax-quant-")
+    if args.live:
+        from ingest import create_embeddings
+
+        embeddings = create_embeddings()
+    else:
+        from fakes import FakeEmbeddings
+
+        embeddings = FakeEmbeddings(dimensions=1536, dense=True)
+    index_path = args.index
+    if index_path is None:
+        from fakes import create_fake_index
+
+        index_path = os.path.join(workdir, "index")
+        create_fake_index(args.csv, index_path, embeddings)
+    if args.pad:
+        padded_path = os.path.join(workdir, "padded")
+        pad_index(LocalVectorIndex(index_path), padded_path, args.pad)
+        index_path = padded_path
+
+    queries = [np.asarray(vector, dtype=np.float32)
+               for vector in embeddings.embed_documents([item["query"] for item in questions])]
+    rows = run_report(index_path, queries, args.k, parse_configurations(args.configs, args.candidates))
+    print(format_report(rows))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
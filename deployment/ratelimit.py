@@ -0,0 +1,397 @@
+"""Pembatas laju panggilan OpenAI (RPM/TPM) yang dipasang sebagai transport httpx.
+
+Semua ChatOpenAI/OpenAIEmbeddings di engine memakai client httpx dari
+engine.create_http_client, sehingga setiap request ke OpenAI:
+1. menunggu jatah requests-per-minute dan tokens-per-minute model tersebut
+   (perkiraan token = prompt/input + max_tokens, sama seperti hitungan OpenAI);
+   request yang antre diberi jadwal berurutan sehingga laju tetap rata,
+2. menunggu slot konkurensi; batasnya adaptif (AIMD): naik perlahan selama
+   sukses, turun setengah saat mendapat 429,
+3. diulang saat 429/5xx/gagal koneksi dengan exponential backoff + jitter,
+   memakai retry-after dari server jika ada.
+
+Batas RPM/TPM diambil dari config atau dipelajari dari header x-ratelimit-*
+balasan OpenAI. Retry bawaan SDK dimatikan (max_retries=0) agar tidak
+berlipat. Jika retry habis atau total tunggu melewati max_wait, balasan
+terakhir diteruskan apa adanya (SDK melempar openai.RateLimitError).
+"""
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+
+import httpx
+
+import config
+from context import count_tokens
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+POLL_INTERVAL = 0.02
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value):
+    """"20" / "6m0s" / "1.5s" / "20ms" (format header OpenAI) -> detik, None jika tidak dikenal"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _UNITS[unit] for number, unit in parts)
+
+
+def retry_after(headers):
+    """Detik tunggu dari header retry-after-ms / retry-after"""
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+
+def _text_tokens(value):
+    if isinstance(value, str):
+        return count_tokens(value)
+    if isinstance(value, list):
+        # Input embedding bisa berupa token id (list int) atau daftar teks / daftar token id
+        if value and isinstance(value[0], int):
+            return len(value)
+        return sum(_text_tokens(item) for item in value)
+    if isinstance(value, dict):
+        return _text_tokens(value.get("text", ""))
+    return 0
+
+
+def estimate_request(request):
+    """(model, perkiraan token) dari body JSON request OpenAI"""
+    try:
+        body = json.loads(request.content or b"{}")
+    except (ValueError, httpx.RequestNotRead):
+        return None, 0
+    if not isinstance(body, dict):
+        return None, 0
+    if "messages" in body:
+        tokens = sum(4 + _text_tokens(message.get("content")) for message in body["messages"])
+        tokens += body.get("max_tokens") or body.get("max_completion_tokens") or 0
+    else:
+        tokens = _text_tokens(body.get("input"))
+    return body.get("model"), tokens
+
+
+class MinuteBudget:
+    """Token bucket berkapasitas per_minute yang terisi rata selama 60 detik.
+
+    reserve() langsung memotong jatah (boleh minus) dan mengembalikan lama
+    tunggu, sehingga pemanggil yang antre mendapat giliran berurutan.
+    """
+
+    def __init__(self, per_minute, now):
+        self.configured = per_minute
+        self.per_minute = per_minute
+        self.available = float(per_minute)
+        self.updated = now
+
+    def _refill(self, now):
+        if self.per_minute:
+            self.available = min(self.per_minute, self.available + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+
+    def reserve(self, amount, now):
+        if not self.per_minute:
+            return 0.0
+        self._refill(now)
+        self.available -= min(amount, self.per_minute)
+        return max(0.0, -self.available * 60 / self.per_minute)
+
+    def sync(self, limit, remaining, now):
+        """Samakan dengan header x-ratelimit-limit/remaining (batas config tetap menang jika lebih ketat)"""
+        self._refill(now)
+        if limit and not (self.configured and self.configured <= limit):
+            if not self.per_minute:
+                self.available = float(limit)
+            self.per_minute = limit
+        if remaining is not None and self.per_minute:
+            self.available = min(self.available, remaining)
+
+
+class ModelLimiter:
+    def __init__(self, rpm, tpm, max_concurrency, min_concurrency, now):
+        self.requests = MinuteBudget(rpm, now)
+        self.tokens = MinuteBudget(tpm, now)
+        self.concurrency = float(max_concurrency)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.counts = {"requests": 0, "retries": 0, "rate_limited": 0, "gave_up": 0, "wait_seconds": 0.0}
+
+    def slots(self, min_concurrency):
+        return max(min_concurrency, int(self.concurrency))
+
+
+class RateLimiter:
+    """Jatah RPM/TPM dan konkurensi per model, dipakai bersama transport sync dan async"""
+
+    def __init__(self, rpm=0, tpm=0, max_concurrency=16, min_concurrency=1, max_retries=6,
+                 base_delay=0.5, max_delay=20.0, max_wait=30.0, clock=time.monotonic):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._models = {}
+
+    def _model(self, model):
+        limiter = self._models.get(model)
+        if limiter is None:
+            limiter = self._models[model] = ModelLimiter(
+                self.rpm, self.tpm, self.max_concurrency, self.min_concurrency, self.clock()
+            )
+        return limiter
+
+    def schedule(self, model, tokens):
+        """Pesan jatah satu request; hasilnya lama tunggu sebelum boleh dikirim"""
+        with self._lock:
+            limiter = self._model(model)
+            now = self.clock()
+            delay = max(
+                limiter.requests.reserve(1, now),
+                limiter.tokens.reserve(tokens, now),
+                limiter.blocked_until - now,
+            )
+            limiter.counts["wait_seconds"] += delay
+            return delay
+
+    def try_acquire(self, model):
+        with self._lock:
+            limiter = self._model(model)
+            if limiter.in_flight >= limiter.slots(self.min_concurrency):
+                return False
+            limiter.in_flight += 1
+            limiter.counts["requests"] += 1
+            return True
+
+    def release(self, model):
+        with self._lock:
+            self._model(model).in_flight -= 1
+
+    def observe(self, model, status, headers):
+        """Pelajari batas dari header balasan dan sesuaikan konkurensi (AIMD)"""
+        with self._lock:
+            limiter = self._model(model)
+            now = self.clock()
+            for budget, kind in ((limiter.requests, "requests"), (limiter.tokens, "tokens")):
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                budget.sync(
+                    int(limit) if limit and limit.isdigit() else None,
+                    int(remaining) if remaining and remaining.isdigit() else None,
+                    now
+                )
+            if status == 429:
+                limiter.counts["rate_limited"] += 1
+                wait = retry_after(headers)
+                if wait:
+                    # Semua request ke model ini ikut menunggu, bukan hanya yang kena 429
+                    limiter.blocked_until = max(limiter.blocked_until, now + wait)
+                # Satu lonjakan 429 bersamaan cukup menurunkan batas sekali
+                if now - limiter.last_decrease >= 1.0:
+                    limiter.concurrency = max(self.min_concurrency, limiter.concurrency / 2)
+                    limiter.last_decrease = now
+            elif status is not None and status < 400:
+                limiter.concurrency = min(self.max_concurrency, limiter.concurrency + 1 / limiter.concurrency)
+
+    def retry_delay(self, model, attempt, headers, started):
+        """Lama tunggu sebelum percobaan berikutnya, None jika harus menyerah"""
+        delay = retry_after(headers) if headers is not None else None
+        if delay is None:
+            delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+        with self._lock:
+            counts = self._model(model).counts
+            if attempt >= self.max_retries or self.clock() - started + delay > self.max_wait:
+                counts["gave_up"] += 1
+                return None
+            counts["retries"] += 1
+            counts["wait_seconds"] += delay
+        return delay
+
+    def stats(self):
+        with self._lock:
+            return {
+                model or "unknown": {
+                    "rpm": limiter.requests.per_minute,
+                    "tpm": limiter.tokens.per_minute,
+                    "concurrency": round(limiter.concurrency, 2),
+                    "in_flight": limiter.in_flight,
+                    **limiter.counts,
+                    "wait_seconds": round(limiter.counts["wait_seconds"], 3),
+                }
+                for model, limiter in self._models.items()
+            }
+
+
+def _is_quota_error(body):
+    # 429 karena kuota/billing habis tidak akan pulih dengan retry
+    return b"insufficient_quota" in body
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Slot konkurensi baru dilepas setelah body balasan (termasuk stream SSE) selesai dibaca"""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+def _wrap(response, stream):
+    return httpx.Response(
+        status_code=response.status_code,
+        headers=response.headers,
+        stream=stream,
+        extensions=response.extensions
+    )
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    def __init__(self, transport, limiter):
+        self.transport = transport
+        self.limiter = limiter
+
+    def handle_request(self, request):
+        limiter = self.limiter
+        model, tokens = estimate_request(request)
+        started = limiter.clock()
+        attempt = 0
+        while True:
+            time.sleep(limiter.schedule(model, tokens))
+            while not limiter.try_acquire(model):
+                time.sleep(POLL_INTERVAL)
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError:
+                limiter.release(model)
+                limiter.observe(model, None, {})
+                delay = limiter.retry_delay(model, attempt, None, started)
+                if delay is None:
+                    raise
+            else:
+                limiter.observe(model, response.status_code, response.headers)
+                if response.status_code not in RETRY_STATUSES:
+                    return _wrap(response, _ReleasingStream(response.stream, lambda: limiter.release(model)))
+                body = response.read()
+                response.close()
+                limiter.release(model)
+                delay = None
+                if not (response.status_code == 429 and _is_quota_error(body)):
+                    delay = limiter.retry_delay(model, attempt, response.headers, started)
+                if delay is None:
+                    return response
+            attempt += 1
+            time.sleep(delay)
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport, limiter):
+        self.transport = transport
+        self.limiter = limiter
+
+    async def handle_async_request(self, request):
+        limiter = self.limiter
+        model, tokens = estimate_request(request)
+        started = limiter.clock()
+        attempt = 0
+        while True:
+            await asyncio.sleep(limiter.schedule(model, tokens))
+            while not limiter.try_acquire(model):
+                await asyncio.sleep(POLL_INTERVAL)
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError:
+                limiter.release(model)
+                limiter.observe(model, None, {})
+                delay = limiter.retry_delay(model, attempt, None, started)
+                if delay is None:
+                    raise
+            else:
+                limiter.observe(model, response.status_code, response.headers)
+                if response.status_code not in RETRY_STATUSES:
+                    return _wrap(response, _AsyncReleasingStream(response.stream, lambda: limiter.release(model)))
+                body = await response.aread()
+                await response.aclose()
+                limiter.release(model)
+                delay = None
+                if not (response.status_code == 429 and _is_quota_error(body)):
+                    delay = limiter.retry_delay(model, attempt, response.headers, started)
+                if delay is None:
+                    return response
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Satu RateLimiter per proses (None jika ASTRAX_RATE_LIMIT=false)"""
+    global _limiter
+    if not config.RATE_LIMIT_ENABLED:
+        return None
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(
+                rpm=config.RATE_LIMIT_RPM,
+                tpm=config.RATE_LIMIT_TPM,
+                max_concurrency=config.RATE_LIMIT_MAX_CONCURRENCY,
+                max_retries=config.RATE_LIMIT_MAX_RETRIES,
+                max_wait=config.RATE_LIMIT_MAX_WAIT
+            )
+        return _limiter
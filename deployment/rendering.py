@@ -0,0 +1,312 @@
+"""Lapisan render chat UI Streamlit.
+
+Setiap rerun Streamlit menjalankan ulang seluruh skrip, sehingga riwayat chat
+dan blok CSS tema dulu diformat ulang dari nol. Di sini:
+- HTML per pesan dimemo dengan kunci hash (peran, isi), dibatasi ukurannya
+  per proses dan dipakai bersama semua sesi; isi pesan di-escape sebelum
+  masuk HTML
+- CSS tema dibangun hanya ketika pilihan tema berubah; rerun lain memakai
+  string yang sama (payload identik, frontend tidak menyusun ulang style)
+
+Micro-benchmark percakapan 200 pesan (render lama vs. memo):
+    python rendering.py --messages 200 --reruns 200
+"""
+import argparse
+import html
+import json
+import re
+import threading
+import time
+from functools import lru_cache
+
+import config
+from postprocess import clean_answer
+
+THEMES = {
+    "Light ☀️": {
+        "primary_color": "#2A5C82",
+        "secondary_color": "#F0F4F8",
+        "accent_color": "#FF6B35",
+        "sidebar_bg": "#ffffff",
+        "sidebar_text": "#000000",
+        "selected_bg": "#2A5C82",
+        "selected_text": "#ffffff",
+        "text_color": "#ffffff",
+        "bg_color": "#f8f9fa",
+        "header": "#F0F4F8",
+    },
+    "Dark 🌙": {
+        "primary_color": "#ffffff",
+        "secondary_color": "#1E1E1E",
+        "accent_color": "#FF6B35",
+        "sidebar_bg": "#0e1117",
+        "sidebar_text": "#ffffff",
+        "selected_bg": "#f39c12",
+        "selected_text": "#000000",
+        "text_color": "#000000",
+        "bg_color": "#252422",
+        "header": "#1E1E1E",
+    },
+}
+
+CSS_TEMPLATE = """
+<style>
+    :root {{
+        --primary: {primary_color};
+        --secondary: {secondary_color};
+        --accent: {accent_color};
+        --text: {text_color};
+    }}
+
+    .stApp {{
+        background-color: {bg_color};
+    }}
+
+    .header {{
+        padding: 1rem 0;
+        border-bottom: 2px solid var(--primary);
+        margin-bottom: 2rem;
+    }}
+
+    .chat-container {{
+        max-width: 800px;
+        margin: 0 auto;
+        padding: 1rem;
+    }}
+
+    .user-message {{
+        background: var(--secondary);
+        border-radius: 15px;
+        padding: 1rem;
+        margin: 0.5rem 0;
+        border: 1px solid #DEE2E6;
+    }}
+
+    .assistant-message {{
+        background: var(--primary);
+        color: var(--text);
+        border-radius: 15px;
+        padding: 1rem;
+        margin: 0.5rem 0;
+        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+        border: 1px solid #DEE2E6;
+    }}
+
+    .pdf-ref {{
+        color: var(--primary);
+        border-left: 3px solid var(--accent);
+        padding-left: 1rem;
+        margin-top: 1rem;
+    }}
+</style>
+"""
+
+# (kelas CSS, ikon, label) per peran
+ROLE_STYLES = {
+    "user": ("user-message", "😀", "Anda"),
+    "assistant": ("assistant-message", "🤖", "Astrax"),
+}
+
+# Baris baru jadi <br>: tanpa baris kosong, satu bubble tetap satu blok HTML di markdown
+_NEWLINE = re.compile(r'\r?\n')
+
+
+@lru_cache(maxsize=None)
+def theme_css(theme_choice):
+    return CSS_TEMPLATE.format(**THEMES[theme_choice])
+
+
+def apply_theme(st, theme_choice):
+    """Pasang CSS tema; hasilnya warna tema (untuk option_menu).
+
+    String CSS dibangun ulang hanya ketika theme_choice berbeda dari rerun
+    sebelumnya. Streamlit menghapus elemen yang tidak dipanggil lagi pada
+    rerun, jadi string yang sama tetap dikirim setiap rerun.
+    """
+    if st.session_state.get("theme_choice") != theme_choice:
+        st.session_state.theme_choice = theme_choice
+        st.session_state.theme_css = theme_css(theme_choice)
+    st.markdown(st.session_state.theme_css, unsafe_allow_html=True)
+    return THEMES[theme_choice]
+
+
+def format_message(role, content):
+    """HTML satu bubble chat; isi pesan di-escape (tidak ada HTML dari pengguna/LLM yang lolos)"""
+    css_class, icon, label = ROLE_STYLES.get(role, ROLE_STYLES["assistant"])
+    body = _NEWLINE.sub("<br>", html.escape(content.strip(), quote=False))
+    return (
+        f'<div class="chat-container"><div class="{css_class}">'
+        f'{icon} <strong>{label}</strong><br>{body}</div></div>'
+    )
+
+
+class MessageRenderer:
+    """Memo HTML per pesan, kunci = (peran, isi).
+
+    Hash str Python dihitung sekali per objek lalu disimpan, jadi lookup pesan
+    yang sama di rerun berikutnya tidak meng-hash ulang isinya. Saat penuh,
+    entri tertua dibuang (pesan yang masih tampil dirender ulang sekali).
+    """
+
+    def __init__(self, max_size=2000):
+        self.max_size = max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, message):
+        return self.render_all([message])
+
+    def render_all(self, messages):
+        """Seluruh pesan sebagai satu string HTML (satu elemen st.markdown)"""
+        entries = self._entries
+        parts = []
+        misses = 0
+        for message in messages:
+            key = (message["role"], message["content"])
+            rendered = entries.get(key)
+            if rendered is None:
+                misses += 1
+                rendered = format_message(*key)
+                with self._lock:
+                    entries[key] = rendered
+                    while len(entries) > self.max_size:
+                        del entries[next(iter(entries))]
+            parts.append(rendered)
+        with self._lock:
+            self.hits += len(messages) - misses
+            self.misses += misses
+        return "".join(parts)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    """Satu MessageRenderer per proses, dipakai bersama semua sesi Streamlit"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = MessageRenderer(max_size=config.RENDER_CACHE_SIZE)
+        return _renderer
+
+
+def _legacy_rerun(messages, theme_choice):
+    """Pola render sebelumnya: CSS dan setiap bubble diformat ulang setiap rerun"""
+    css = CSS_TEMPLATE.format(**THEMES[theme_choice])
+    bubbles = []
+    for message in messages:
+        if message["role"] == "user":
+            bubbles.append(f"""
+            <div class="chat-container">
+                <div class="user-message">
+                    😀 <strong>Anda</strong><br>
+                    {message["content"]}
+                </div>
+            </div>
+            """)
+        else:
+            bubbles.append(f"""
+            <div class="chat-container">
+                <div class="assistant-message">
+                    🤖 <strong>Astrax</strong><br>
+                    {message["content"]}
+                </div>
+            </div>
+            """)
+    return css, "".join(bubbles)
+
+
+class _SessionState(dict):
+    __getattr__ = dict.__getitem__
+    __setattr__ = dict.__setitem__
+
+
+class _MarkdownSink:
+    """Pengganti modul streamlit untuk benchmark: session_state + st.markdown"""
+
+    def __init__(self):
+        self.session_state = _SessionState()
+
+    def markdown(self, body, unsafe_allow_html=False):
+        return body
+
+
+def sample_conversation(n_messages):
+    messages = []
+    for i in range(n_messages):
+        if i % 2 == 0:
+            messages.append({
+                "role": "user",
+                "content": f"Bagaimana cara lapor SPT Tahunan <b>nomor {i}</b> & reset EFIN?"
+            })
+        else:
+            raw = (f"Untuk pertanyaan {i}, berikut langkahnya: 1. Buka **DJP Online** "
+                   "2. Pilih menu e-Filing 3. Isi formulir SPT dan kirim. " * 3)
+            messages.append({"role": "assistant", "content": clean_answer(raw)})
+    return messages
+
+
+def _per_call_ms(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def run_benchmark(n_messages, reruns, theme_choice="Light ☀️"):
+    messages = sample_conversation(n_messages)
+    st = _MarkdownSink()
+    renderer = MessageRenderer(max_size=max(config.RENDER_CACHE_SIZE, n_messages))
+
+    def cached_rerun():
+        apply_theme(st, theme_choice)
+        return renderer.render_all(messages)
+
+    legacy_ms = _per_call_ms(lambda: _legacy_rerun(messages, theme_choice), reruns)
+    started = time.perf_counter()
+    cached_rerun()
+    cold_ms = (time.perf_counter() - started) * 1000
+    warm_ms = _per_call_ms(cached_rerun, reruns)
+    # Rerun setelah satu pesan baru: hanya pesan itu yang diformat
+    messages.append({"role": "user", "content": "Pertanyaan baru?"})
+    started = time.perf_counter()
+    cached_rerun()
+    append_ms = (time.perf_counter() - started) * 1000
+
+    raw = messages[1]["content"] * 2
+    return {
+        "messages": n_messages,
+        "reruns": reruns,
+        "legacy_rerun_ms": round(legacy_ms, 3),
+        "cold_rerun_ms": round(cold_ms, 3),
+        "warm_rerun_ms": round(warm_ms, 3),
+        "append_rerun_ms": round(append_ms, 3),
+        "speedup": round(legacy_ms / warm_ms, 1) if warm_ms else None,
+        "clean_answer_us": round(_per_call_ms(lambda: clean_answer(raw), reruns * 10) * 1000, 2),
+        "cache": renderer.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark render riwayat chat")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--reruns", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run_benchmark(args.messages, args.reruns), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""Cache hasil retrieval vector store di depan $vectorSearch / index lokal.
+
+Untuk versi korpus yang sama, vector search atas vektor query yang sama selalu
+memberi hasil yang sama, walaupun jawaban akhir harus dibuat ulang (konteks
+chat, prompt atau model berbeda). Cache menyimpan top-k (id dokumen, skor) per
+(vektor query terkuantisasi, k, score_threshold, pre_filter, versi korpus)
+dengan batas ukuran (LRU) dan TTL. Teks + metadata chunk disimpan sekali di
+DocumentStore bersama, bukan per entri atau per request, sehingga cache hit
+tidak menyentuh jaringan maupun deserialisasi BSON.
+
+Vektor query dikuantisasi ke int8 (skala per vektor) sebelum di-hash:
+representasi float64/float32 dari embedding yang sama (mis. dari
+PrewarmedEmbeddings vs API) menghasilkan kunci yang sama.
+
+Laporan latensi tanpa/dengan cache atas pertanyaan FAQ yang berulang:
+    python retrieval_cache.py report --repeat 3
+    python retrieval_cache.py report --atlas --live   # MongoDB Atlas + OpenAI dari .env
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+import config
+from hybrid import document_key
+from telemetry import areport_spans, report_spans
+
+# Field metadata yang bergantung pada query, tidak ikut disimpan di DocumentStore
+QUERY_FIELDS = ("score", "shard_score")
+
+
+class Uncacheable(list):
+    """Hasil search yang tidak disimpan cache (mis. sebagian shard melewati timeout)"""
+
+
+def quantize_query(query_vector, levels=127):
+    """Vektor unit -> int8 dengan skala nilai absolut maksimum vektor itu sendiri"""
+    query = np.asarray(query_vector, dtype=np.float32)
+    peak = np.abs(query).max() if len(query) else 0.0
+    if not peak:
+        return np.zeros(len(query), dtype=np.int8)
+    return np.rint(query / peak * levels).astype(np.int8)
+
+
+def document_id(doc):
+    # Atlas membawa _id; index lokal tanpa _id memakai (Question, teks) seperti hybrid.py
+    return doc.metadata.get("_id") or document_key(doc)
+
+
+class DocumentStore:
+    """Teks + metadata chunk sekali per proses, dibagi oleh semua entri cache"""
+
+    def __init__(self):
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def put(self, doc):
+        doc_id = document_id(doc)
+        if doc_id not in self._documents:
+            metadata = {key: value for key, value in doc.metadata.items() if key not in QUERY_FIELDS}
+            with self._lock:
+                self._documents.setdefault(doc_id, (doc.page_content, metadata))
+        return doc_id
+
+    def document(self, doc_id, query_fields=None):
+        """Document baru (metadata disalin; retriever di atasnya boleh menambah field)"""
+        text, metadata = self._documents[doc_id]
+        return Document(page_content=text, metadata={**metadata, **(query_fields or {})})
+
+    def __contains__(self, doc_id):
+        return doc_id in self._documents
+
+    def __len__(self):
+        return len(self._documents)
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+
+class RetrievalCache:
+    def __init__(self, max_size=5000, ttl=86400, corpus_version=None, documents=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.corpus_version = corpus_version
+        self.documents = documents if documents is not None else DocumentStore()
+        # key -> ([(id dokumen, {skor dan field QUERY_FIELDS lain})], waktu simpan)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, query_vector, k, score_threshold=None, pre_filter=None):
+        params = json.dumps(
+            [k, score_threshold, sorted((pre_filter or {}).items()), self.corpus_version], default=str
+        )
+        digest = hashlib.blake2b(quantize_query(query_vector).tobytes(), digest_size=16)
+        digest.update(params.encode("utf-8"))
+        return digest.digest()
+
+    def get(self, key):
+        """Daftar Document untuk key, atau None (miss / kedaluwarsa / dokumen sudah dibuang)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None or not all(doc_id in self.documents for doc_id, _ in entry[0]):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return [self.documents.document(doc_id, query_fields) for doc_id, query_fields in entry[0]]
+
+    def put(self, key, documents):
+        hits = [
+            (self.documents.put(doc), {field: doc.metadata[field] for field in QUERY_FIELDS if field in doc.metadata})
+            for doc in documents
+        ]
+        with self._lock:
+            self._entries[key] = (hits, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def wrap(self, search):
+        """search(query_vector, k, score_threshold, pre_filter) -> [Document], versi ber-cache"""
+        def cached_search(query_vector, k, score_threshold=None, pre_filter=None):
+            version = self.corpus_version
+            key = self.key(query_vector, k, score_threshold, pre_filter)
+            documents = self.get(key)
+            if documents is None:
+                documents = search(query_vector, k, score_threshold, pre_filter)
+                # Hasil search yang mulai sebelum korpus berganti versi tidak disimpan
+                if not isinstance(documents, Uncacheable) and version == self.corpus_version:
+                    self.put(key, documents)
+            return documents
+
+        return cached_search
+
+    def wrap_async(self, asearch):
+        """Pasangan async dari wrap"""
+        async def cached_asearch(query_vector, k, score_threshold=None, pre_filter=None):
+            version = self.corpus_version
+            key = self.key(query_vector, k, score_threshold, pre_filter)
+            documents = self.get(key)
+            if documents is None:
+                documents = await asearch(query_vector, k, score_threshold, pre_filter)
+                # Hasil search yang mulai sebelum korpus berganti versi tidak disimpan
+                if not isinstance(documents, Uncacheable) and version == self.corpus_version:
+                    self.put(key, documents)
+            return documents
+
+        return cached_asearch
+
+    def set_corpus_version(self, version):
+        """Kosongkan cache dan DocumentStore jika korpus sudah berganti versi"""
+        with self._lock:
+            if version != self.corpus_version:
+                self.corpus_version = version
+                self._entries.clear()
+                self.documents.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.documents.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "documents": len(self.documents),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "corpus_version": self.corpus_version,
+        }
+
+
+def create_retrieval_cache():
+    """RetrievalCache dari config, None jika ASTRAX_RETRIEVAL_CACHE=false"""
+    if not config.RETRIEVAL_CACHE_ENABLED:
+        return None
+    return RetrievalCache(
+        max_size=config.RETRIEVAL_CACHE_MAX_SIZE,
+        ttl=config.RETRIEVAL_CACHE_TTL,
+        corpus_version=config.CORPUS_VERSION
+    )
+
+
+class VectorSearchRetriever(BaseRetriever):
+    """Embed query lalu panggil fungsi search (query_vector, k, score_threshold, pre_filter).
+
+    Tanpa asearch, search sinkron dijalankan di thread.
+    """
+
+    embeddings: object
+    search: Callable
+    asearch: Optional[Callable] = None
+    search_kwargs: dict = {"k": 4}
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _search_args(self, query_vector):
+        return (
+            query_vector,
+            self.search_kwargs.get("k", 4),
+            self.search_kwargs.get("score_threshold"),
+            self.search_kwargs.get("pre_filter")
+        )
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        started = time.perf_counter()
+        query_vector = self.embeddings.embed_query(query)
+        embedded = time.perf_counter()
+        documents = self.search(*self._search_args(query_vector))
+        report_spans(run_manager, embed=embedded - started, vector_search=time.perf_counter() - embedded)
+        return documents
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        started = time.perf_counter()
+        args = self._search_args(await self.embeddings.aembed_query(query))
+        embedded = time.perf_counter()
+        if self.asearch is None:
+            documents = await asyncio.to_thread(self.search, *args)
+        else:
+            documents = await self.asearch(*args)
+        await areport_spans(run_manager, embed=embedded - started, vector_search=time.perf_counter() - embedded)
+        return documents
+
+
+def _latencies(search, queries, k, score_threshold):
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        search(query, k, score_threshold, None)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def run_report(search, queries, k, score_threshold, repeat):
+    """Latensi per putaran: putaran cache pertama mengisi cache, putaran berikutnya hit"""
+    from benchmark import summarize
+
+    cache = RetrievalCache(max_size=len(queries), corpus_version="report")
+    cached_search = cache.wrap(search)
+    rows = [{"round": "no_cache", **summarize(_latencies(search, queries, k, score_threshold))}]
+    for round_number in range(repeat):
+        latencies = _latencies(cached_search, queries, k, score_threshold)
+        rows.append({"round": f"cache_{round_number + 1}", **summarize(latencies)})
+    return rows, cache.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache hasil retrieval Astrax")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report", help="Latensi retrieval tanpa vs dengan cache")
+    report.add_argument("--csv", default=config.FAQ_CSV_PATH)
+    report.add_argument("--index", help="Index lokal (default: dibangun dari FAQ dengan embedding palsu)")
+    report.add_argument("--atlas", action="store_true", help="Vector search ke MongoDB Atlas")
+    report.add_argument("--live", action="store_true", help="Embed pertanyaan dengan OpenAI")
+    report.add_argument("--k", type=int, default=3)
+    report.add_argument("--score-threshold", type=float)
+    report.add_argument("--size", type=int, default=200, help="Jumlah pertanyaan")
+    report.add_argument("--repeat", type=int, default=2, help="Putaran dengan cache")
+    report.add_argument("--pad", type=int, default=0, help="Tambah vektor pengisi untuk simulasi korpus besar")
+    args = parser.parse_args()
+
+    from benchmark import build_question_set, load_faq
+
+    questions = build_question_set(load_faq(args.csv), args.size, seed=42, perturbed=True)
+    if args.live:
+        from ingest import create_embeddings
+
+        embeddings = create_embeddings()
+    else:
+        from fakes import FakeEmbeddings
+
+        embeddings = FakeEmbeddings(dimensions=1536, dense=True)
+    queries = embeddings.embed_documents([item["query"] for item in questions])
+
+    if args.atlas:
+        from pymongo import MongoClient
+
+        from engine import COLLECTION_NAME, DB_NAME, atlas_search_by_vector
+
+        collection = MongoClient(config.MONGODB_URI)[DB_NAME][COLLECTION_NAME]
+
+        def search(query_vector, k, score_threshold, pre_filter):
+            return atlas_search_by_vector(collection, query_vector, k, score_threshold, pre_filter)
+    else:
+        from local_index import LocalVectorIndex
+        from quantization import open_local_index, pad_index
+
+        workdir = tempfile.mkdtemp(prefix="astrax-retrieval-")
+        index_path = args.index
+        if index_path is None:
+            from fakes import create_fake_index
+
+            index_path = os.path.join(workdir, "index")
+            create_fake_index(args.csv, index_path, embeddings)
+        if args.pad:
+            padded_path = os.path.join(workdir, "padded")
+            pad_index(LocalVectorIndex(index_path), padded_path, args.pad)
+            index_path = padded_path
+        search = open_local_index(index_path).documents
+
+    rows, stats = run_report(search, queries, args.k, args.score_threshold, args.repeat)
+    from quantization import format_report
+
+    print(format_report(rows))
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,503 @@
+"""Scraper FAQ DJP (pajak.go.id) yang paralel dan bisa dilanjutkan.
+
+Pengganti scripts/scrapping.ipynb (satu browser Selenium + time.sleep per halaman):
+- halaman daftar dan detail diambil lewat HTTP biasa (httpx) dengan pool thread
+  terbatas (SCRAPE_CONCURRENCY); Selenium headless hanya dipakai sebagai
+  fallback jika HTML statis tidak berisi konten yang dicari,
+- request bersyarat (If-None-Match / If-Modified-Since): 304 memakai baris
+  tersimpan, 200 dibandingkan hash jawabannya,
+- progres disimpan ke file state JSON (SCRAPE_STATE_PATH) sehingga run yang
+  terputus dilanjutkan tanpa mengunduh ulang URL yang sudah selesai,
+- baris yang berubah/baru bisa langsung digabung ke FAQ_CSV_PATH dan di-ingest
+  (ingest.py hanya meng-embed chunk yang berubah).
+
+Aturan ekstraksi jawaban sama dengan notebook.
+
+Contoh:
+    python scraper.py --start-page 0 --end-page 8
+    python scraper.py --ingest --target local
+    python scraper.py --restart              # abaikan run yang belum selesai
+Uji lokal dengan server fixture: python fake_djp.py demo
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin
+
+import httpx
+from bs4 import BeautifulSoup
+
+import config
+from ingest import is_transient, retry_with_backoff
+
+LISTING_PATH = "/id/faq-page?page={page}"
+MAX_ANSWER_LENGTH = 1000
+USER_AGENT = "Mozilla/5.0 (compatible; AstraxScraper/1.0)"
+
+
+class RetryableStatus(Exception):
+    """Status 429/5xx yang layak dicoba ulang"""
+
+
+def is_retryable(exc):
+    return isinstance(exc, RetryableStatus) or is_transient(exc)
+
+
+def clean_question(text):
+    # Bersihkan penomoran di depan pertanyaan
+    return re.sub(r"^\d{1,2}\.\s*", "", text).strip()
+
+
+def extract_questions_and_links(soup):
+    """[(pertanyaan, link)] dari halaman daftar FAQ"""
+    items = []
+    for view in soup.find_all("div", class_="view-content"):
+        questions = [clean_question(td.get_text()) for td in view.find_all("td", class_="views-field views-field-title")]
+        links = [a["href"] for a in view.find_all("a", {"hreflang": "id"})]
+        items += zip(questions, links)
+    return items
+
+
+def absolute(base_url, src):
+    return urljoin(base_url, src) if src.startswith("/") else src
+
+
+def extract_answer(soup, question, full_link, base_url):
+    """Teks jawaban dari halaman detail, atau pesan rujukan ke link untuk konten kompleks"""
+    content = soup.find("div", class_="node__content")
+    if not content:
+        return None
+
+    if content.find_all("table", class_="table table-striped table-bordered table-hover"):
+        return f'Informasi tentang "{question}" berbentuk table, buka link berikut untuk selengkapnya : {full_link}'
+    if content.find_all("h3", {"aria-expanded": "true"}):
+        return f'Informasi tentang "{question}" berbentuk tablist, buka link berikut untuk selengkapnya : {full_link}'
+    if len(content.find_all("p")) > 3:
+        return f'Informasi tentang "{question}" panjang untuk ditampilkan di sini. Silakan baca langsung di: {full_link}'
+    # Kombinasi daftar bernomor dan strip tidak ditampilkan
+    if content.find("ol") is not None and content.find("ul") is not None:
+        return (f'Informasi tentang "{question}" mengandung daftar kombinasi (bernomor dan bullet). '
+                f'Silakan baca langsung di: {full_link}')
+
+    text_parts = []
+    for elem in content.find_all(["p", "ol", "ul"]):
+        if elem.name == "p":
+            text_parts.append(elem.get_text(strip=True))
+        elif elem.name == "ol":
+            text_parts += [f"{i}. {li.get_text(strip=True)}" for i, li in enumerate(elem.find_all("li"), start=1)]
+        else:
+            text_parts += [f"- {li.get_text(strip=True)}" for li in elem.find_all("li")]
+
+    images = content.find_all("img", {"data-entity-type": "file"})
+    if len(images) > 1:
+        return (f'Informasi tentang "{question}" dilengkapi beberapa gambar. '
+                f'Silahkan baca langsung melalui link berikut: {full_link}')
+    image_links = [f"Gambar: {absolute(base_url, img['src'])}" for img in images if img.get("src")]
+    file_links = [
+        f"Link PDF: {absolute(base_url, a['href'])}"
+        for a in content.find_all("a", {"data-asw-orgfontsize": "14"}) if a.get("href")
+    ]
+
+    answer = "\n".join(text_parts + image_links + file_links)
+    if len(answer) > MAX_ANSWER_LENGTH:
+        return (f'Jawaban untuk "{question}" terlalu panjang untuk ditampilkan. '
+                f'Silahkan baca langsung melalui link berikut: {full_link}')
+    return answer
+
+
+def content_hash(*parts):
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class ScrapeState:
+    """Checkpoint JSON: validator HTTP + hasil per URL, dan URL yang selesai pada run berjalan"""
+
+    def __init__(self, path, save_interval=1.0):
+        self.path = path
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._saved = 0.0
+        self.pages = {}
+        self.run = None
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.pages = data.get("pages", {})
+            self.run = data.get("run")
+
+    def start_run(self, pages, restart=False):
+        """Lanjutkan run yang belum selesai untuk rentang halaman yang sama; hasilnya jumlah URL yang sudah selesai"""
+        with self._lock:
+            if restart or not self.run or self.run.get("pages") != list(pages):
+                self.run = {"pages": list(pages), "started": time.time(), "done": []}
+            self._done = set(self.run["done"])
+            return len(self._done)
+
+    def is_done(self, url):
+        return url in self._done
+
+    def get(self, url):
+        return self.pages.get(url)
+
+    def put(self, url, entry):
+        with self._lock:
+            self.pages[url] = entry
+            if url not in self._done:
+                self._done.add(url)
+                self.run["done"].append(url)
+        self.save()
+
+    def finish_run(self):
+        with self._lock:
+            self.run = None
+        self.save(force=True)
+
+    def save(self, force=False):
+        if not self.path:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._saved < self.save_interval:
+                return
+            self._saved = now
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"pages": self.pages, "run": self.run}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+
+class HeadlessFallback:
+    """Chrome headless (Selenium) bersama untuk halaman yang butuh JavaScript; dibuat saat pertama dipakai"""
+
+    def __init__(self, timeout=15):
+        self.timeout = timeout
+        self._driver = None
+        self._lock = threading.Lock()
+        self.available = True
+
+    def render(self, url, css_selector):
+        with self._lock:
+            if self._driver is None:
+                try:
+                    from selenium import webdriver
+                except ImportError:
+                    self.available = False
+                    return None
+                options = webdriver.ChromeOptions()
+                options.add_argument("--headless=new")
+                self._driver = webdriver.Chrome(options=options)
+
+            from selenium.common.exceptions import TimeoutException
+            from selenium.webdriver.common.by import By
+            from selenium.webdriver.support import expected_conditions as EC
+            from selenium.webdriver.support.ui import WebDriverWait
+
+            self._driver.get(url)
+            try:
+                # Tunggu elemen yang dicari, bukan time.sleep tetap
+                WebDriverWait(self._driver, self.timeout).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, css_selector))
+                )
+            except TimeoutException:
+                pass
+            return self._driver.page_source
+
+    def close(self):
+        with self._lock:
+            if self._driver is not None:
+                self._driver.quit()
+                self._driver = None
+
+
+class Scraper:
+    def __init__(self, base_url=config.SCRAPE_BASE_URL, state=None, concurrency=config.SCRAPE_CONCURRENCY,
+                 timeout=30.0, attempts=4, headless_fallback=True):
+        self.base_url = base_url.rstrip("/")
+        self.state = state or ScrapeState(None)
+        self.concurrency = concurrency
+        self.attempts = attempts
+        self.client = httpx.Client(
+            base_url=self.base_url,
+            timeout=timeout,
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT},
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+        self.fallback = HeadlessFallback() if headless_fallback else None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + n
+
+    def stop(self):
+        """Hentikan run: pekerjaan yang belum mulai dilewati, progres tetap tersimpan"""
+        self._stop.set()
+
+    def fetch(self, url, cached=None):
+        """(status, html, validator) dengan request bersyarat jika ada validator tersimpan"""
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        def request():
+            response = self.client.get(url, headers=headers)
+            if response.status_code == 429 or response.status_code >= 500:
+                self._count("retried")
+                raise RetryableStatus(f"{response.status_code} {url}")
+            return response
+
+        response = retry_with_backoff(
+            request, attempts=self.attempts, base_delay=0.5, max_delay=10.0, retry_on=is_retryable
+        )
+        self._count("requests")
+        validators = {"etag": response.headers.get("etag"), "last_modified": response.headers.get("last-modified")}
+        if response.status_code == 304:
+            return 304, None, validators
+        response.raise_for_status()
+        return response.status_code, response.text, validators
+
+    def _render(self, url, css_selector):
+        if self.fallback is None or not self.fallback.available:
+            return None
+        html = self.fallback.render(urljoin(self.base_url, url), css_selector)
+        if html is not None:
+            self._count("fallback")
+        return html
+
+    def scrape_listing(self, page):
+        """[(pertanyaan, link)] satu halaman daftar"""
+        url = LISTING_PATH.format(page=page)
+        cached = self.state.get(url)
+        status, html, validators = self.fetch(url, cached)
+        if status == 304 and cached:
+            self._count("listing_not_modified")
+            return [tuple(item) for item in cached["items"]]
+
+        items = extract_questions_and_links(BeautifulSoup(html, "html.parser"))
+        if not items:
+            rendered = self._render(url, "div.view-content")
+            if rendered:
+                items = extract_questions_and_links(BeautifulSoup(rendered, "html.parser"))
+        self._count("listing_fetched")
+        self.state.put(url, {**validators, "items": [list(item) for item in items]})
+        return items
+
+    def scrape_detail(self, question, link):
+        """Baris {"Question", "Answer"} dan statusnya (resumed/not_modified/unchanged/changed/new/failed/skipped)"""
+        if self._stop.is_set():
+            return None, "skipped"
+        cached = self.state.get(link)
+        if cached and self.state.is_done(link):
+            return {"Question": question, "Answer": cached["answer"]}, "resumed"
+
+        full_link = urljoin(self.base_url, link)
+        try:
+            status, html, validators = self.fetch(link, cached)
+            if status == 304 and cached:
+                self.state.put(link, cached)
+                return {"Question": question, "Answer": cached["answer"]}, "not_modified"
+
+            answer = extract_answer(BeautifulSoup(html, "html.parser"), question, full_link, self.base_url)
+            if answer is None:
+                rendered = self._render(link, "div.node__content")
+                if rendered:
+                    answer = extract_answer(BeautifulSoup(rendered, "html.parser"), question, full_link, self.base_url)
+            if answer is None:
+                answer = "Tidak ada jawaban."
+        except Exception:
+            # Gagal setelah retry: pakai jawaban lama jika ada, URL dicoba lagi pada run berikutnya
+            if cached:
+                return {"Question": question, "Answer": cached["answer"]}, "failed"
+            return None, "failed"
+
+        digest = content_hash(question, answer)
+        if cached is None:
+            outcome = "new"
+        elif cached.get("hash") == digest:
+            outcome = "unchanged"
+        else:
+            outcome = "changed"
+        self.state.put(link, {**validators, "hash": digest, "question": question, "answer": answer})
+        return {"Question": question, "Answer": answer}, outcome
+
+    def run(self, start_page=0, end_page=8, restart=False):
+        """Scrape halaman [start_page, end_page); hasilnya (baris urut sesuai daftar, statistik)"""
+        started = time.perf_counter()
+        resumed = self.state.start_run((start_page, end_page), restart=restart)
+        pages = list(range(start_page, end_page))
+        listings = {}
+        details = {}
+        outcomes = {}
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            listing_futures = {pool.submit(self.scrape_listing, page): page for page in pages}
+            detail_futures = {}
+            # Detail tiap halaman langsung dijadwalkan begitu daftarnya selesai
+            for future in as_completed(listing_futures):
+                page = listing_futures[future]
+                try:
+                    listings[page] = future.result()
+                except Exception:
+                    self._count("listing_failed")
+                    listings[page] = []
+                for position, (question, link) in enumerate(listings[page]):
+                    detail_futures[pool.submit(self.scrape_detail, question, link)] = (page, position)
+            lost = 0
+            for future in as_completed(detail_futures):
+                row, outcome = future.result()
+                if row is None:
+                    if outcome == "failed":
+                        # Tanpa jawaban lama: baris tidak dibuat (bukan teks error sebagai Answer)
+                        lost += 1
+                        self._count(outcome)
+                    continue
+                details[detail_futures[future]] = row
+                outcomes.setdefault(outcome, []).append(row)
+                self._count(outcome)
+
+        rows = [
+            details[(page, position)]
+            for page in pages for position in range(len(listings.get(page, [])))
+            if (page, position) in details
+        ]
+        interrupted = self._stop.is_set() or len(rows) + lost < sum(len(items) for items in listings.values())
+        complete = not (interrupted or self.counts.get("failed") or self.counts.get("listing_failed"))
+        if not complete:
+            # Run belum tuntas: URL yang selesai tercatat di state untuk dilanjutkan
+            self.state.save(force=True)
+        else:
+            self.state.finish_run()
+
+        elapsed = time.perf_counter() - started
+        stats = {
+            "pages": len(pages),
+            "rows": len(rows),
+            "resumed_from": resumed,
+            "interrupted": interrupted,
+            "complete": complete,
+            "seconds": round(elapsed, 2),
+            "pages_per_second": round((len(pages) + len(details)) / elapsed, 1) if elapsed else 0.0,
+            **{key: self.counts.get(key, 0) for key in (
+                "requests", "retried", "listing_fetched", "listing_not_modified", "listing_failed",
+                "new", "changed", "unchanged", "not_modified", "resumed", "failed", "fallback",
+            )},
+        }
+        self.last_outcomes = outcomes
+        return rows, stats
+
+    def close(self):
+        self.client.close()
+        if self.fallback is not None:
+            self.fallback.close()
+
+
+def write_csv(rows, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["Question", "Answer"])
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+
+def merge_into_faq(rows, faq_csv_path):
+    """Ganti Answer untuk Question yang sama dan tambahkan pertanyaan baru; hasilnya (diganti, ditambah)"""
+    with open(faq_csv_path, encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames
+        existing = list(reader)
+
+    index = {(row.get("Question") or "").strip(): row for row in existing}
+    replaced = added = 0
+    for row in rows:
+        current = index.get(row["Question"])
+        if current is None:
+            new_row = {name: "" for name in fieldnames}
+            new_row.update(Question=row["Question"], Answer=row["Answer"])
+            existing.append(new_row)
+            index[row["Question"]] = new_row
+            added += 1
+        elif current.get("Answer") != row["Answer"]:
+            current["Answer"] = row["Answer"]
+            replaced += 1
+
+    if replaced or added:
+        tmp_path = f"{faq_csv_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(existing)
+        os.replace(tmp_path, faq_csv_path)
+    return replaced, added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scraper FAQ DJP paralel dengan ETag dan checkpoint")
+    parser.add_argument("--base-url", default=config.SCRAPE_BASE_URL)
+    parser.add_argument("--start-page", type=int, default=0)
+    parser.add_argument("--end-page", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=config.SCRAPE_CONCURRENCY)
+    parser.add_argument("--state", default=config.SCRAPE_STATE_PATH)
+    parser.add_argument("--output", default=config.SCRAPE_OUTPUT_PATH)
+    parser.add_argument("--restart", action="store_true", help="Abaikan run yang belum selesai")
+    parser.add_argument("--no-headless", action="store_true", help="Tanpa fallback Selenium headless")
+    parser.add_argument("--ingest", action="store_true", help="Gabung baris berubah/baru ke FAQ CSV lalu ingest")
+    parser.add_argument("--csv", default=config.FAQ_CSV_PATH, help="FAQ CSV tujuan --ingest")
+    parser.add_argument("--target", choices=["atlas", "local"], default="atlas")
+    args = parser.parse_args()
+
+    scraper = Scraper(
+        args.base_url, ScrapeState(args.state), concurrency=args.concurrency,
+        headless_fallback=not args.no_headless
+    )
+    try:
+        rows, stats = scraper.run(args.start_page, args.end_page, restart=args.restart)
+    except KeyboardInterrupt:
+        scraper.stop()
+        scraper.state.save(force=True)
+        print(f"Dihentikan; progres tersimpan di {args.state}, jalankan ulang untuk melanjutkan")
+        return
+    finally:
+        scraper.close()
+    print(json.dumps(stats))
+    if not stats["complete"]:
+        # Detail/daftar yang gagal tidak boleh menimpa CSV sebagai jawaban; state menyimpan progres
+        print(f"Run belum tuntas ({stats['failed']} detail, {stats['listing_failed']} halaman gagal); "
+              f"{args.output} tidak ditulis, jalankan ulang untuk melanjutkan")
+        return
+
+    write_csv(rows, args.output)
+    print(f"{len(rows)} baris disimpan ke {args.output}")
+
+    if args.ingest:
+        import ingest
+
+        # Baris hasil run yang dilanjutkan ikut digabung; yang sama dengan CSV dilewati
+        scraped = [row for outcome, rows in scraper.last_outcomes.items() if outcome != "failed" for row in rows]
+        replaced, added = merge_into_faq(scraped, args.csv)
+        print(f"FAQ CSV: {replaced} jawaban diganti, {added} pertanyaan baru")
+        if replaced or added:
+            embeddings = ingest.create_embeddings()
+            topics = config.FAQ_TOPICS_CSV_PATH
+            summary, report = ingest.ingest(
+                args.csv, ingest.create_sink(args.target), embeddings,
+                topics_path=topics if topics and os.path.exists(topics) else None
+            )
+            ingest.print_report(summary, report, embeddings)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""Layanan jawaban Astrax tanpa ketergantungan ke Streamlit.
+
+AnswerService menggabungkan engine, answer cache dan jalur async, dan
+dipakai oleh server API (api.py) maupun aplikasi Streamlit saat berjalan
+tanpa API (mode in-process). Semua hasil berbentuk dict:
+    {"answer", "found", "sources", "cached", "timings", "question"}
+question adalah pertanyaan yang benar-benar dijawab: sama dengan query, atau
+versi mandiri hasil kondensasi jika history percakapan (memory.py) diberikan.
+cached berisi "faq" (jalur cepat FAQ), "exact"/"semantic" (answer cache),
+"coalesced" (memakai hasil request identik yang sedang berjalan) atau None
+jika jawaban berasal dari LLM.
+"""
+import asyncio
+import contextlib
+import threading
+import time
+from collections import Counter
+
+import config
+from answer_cache import AnswerCache
+from async_engine import create_async_answerer
+from faq_index import create_faq_index
+from memory import QueryCondenser
+from normalization import normalize_query
+from postprocess import NOT_FOUND_MESSAGE, clean_answer, is_not_found
+from ratelimit import get_rate_limiter
+from singleflight import AsyncSingleFlight, SingleFlight
+from streaming import FirstTokenTimer, LatencyStats, TokenQueue
+from telemetry import RequestTrace, get_registry
+from warmup import PrewarmedEmbeddings, awarm_up, warm_up, warmup_questions
+
+
+class AnswerService:
+    def __init__(self, engine):
+        self.engine = engine
+        self.answer_cache = None
+        if config.ANSWER_CACHE_ENABLED:
+            self.answer_cache = AnswerCache(
+                max_size=config.ANSWER_CACHE_MAX_SIZE,
+                ttl=config.ANSWER_CACHE_TTL,
+                similarity_threshold=config.ANSWER_CACHE_SIMILARITY,
+                corpus_version=engine.corpus.version
+            )
+        self.faq_index = create_faq_index()
+        engine.corpus.subscribe(self._on_corpus_change)
+        self.telemetry = get_registry()
+        # Pertanyaan identik yang sedang diproses bersamaan dihitung sekali
+        self.flight = SingleFlight() if config.COALESCE_ENABLED else None
+        self.async_flight = AsyncSingleFlight() if config.COALESCE_ENABLED else None
+        self.rate_limiter = get_rate_limiter()
+        # Kondensasi pertanyaan lanjutan memakai model murah jika routing aktif
+        self.condenser = None
+        if config.MEMORY_ENABLED:
+            self.condenser = QueryCondenser(engine.fast_llm or engine.llm)
+        self._served = Counter()
+        self._served_lock = threading.Lock()
+        self.ttft_stats = LatencyStats()
+        self.latency_stats = LatencyStats()
+        self._async_answerer = None
+        self.warmup = None
+        self._warm_question = None
+        if self.telemetry is not None:
+            self.telemetry.set_startup("engine", engine.timings)
+
+    @property
+    def async_answerer(self):
+        # Dibuat saat pertama dipakai, di dalam event loop milik server
+        if self._async_answerer is None:
+            self._async_answerer = create_async_answerer(self.engine)
+        return self._async_answerer
+
+    def _on_corpus_change(self, version):
+        # Ingest baru selesai: jawaban lama bisa basi, CSV FAQ mungkin ikut berubah
+        if self.answer_cache is not None:
+            self.answer_cache.set_corpus_version(version)
+        self.faq_index = create_faq_index()
+
+    async def _acheck_corpus(self):
+        # Penanda dibaca (Mongo/disk) di thread terpisah, hanya jika interval sudah lewat
+        if self.engine.corpus.due():
+            await asyncio.to_thread(self.engine.corpus.check)
+
+    def _result(self, answer, found, sources, cached, started, **timings):
+        total = time.perf_counter() - started
+        self.latency_stats.record(total)
+        timings["total_ms"] = round(total * 1000, 1)
+        return {
+            "answer": answer,
+            "found": found,
+            "sources": sources,
+            "cached": cached,
+            "timings": timings,
+        }
+
+    def _faq(self, query, started, trace):
+        if self.faq_index is None:
+            return None
+        match = self.faq_index.match(query)
+        if trace is not None:
+            trace.add_span("faq_lookup", time.perf_counter() - started)
+        if match is None:
+            return None
+        return self._result(
+            match["answer"], True, [match["question"]], "faq", started,
+            faq_confidence=match["confidence"]
+        )
+
+    def _cached(self, query, query_embedding):
+        if self.answer_cache is None:
+            return None, None
+        cached = self.answer_cache.get_exact(query)
+        if cached is not None:
+            return cached, "exact"
+        if query_embedding is None:
+            return None, None
+        cached = self.answer_cache.get(query, embedding=query_embedding)
+        return cached, "semantic" if cached is not None else None
+
+    def _reuse_embedding(self, query, query_embedding):
+        # Vektor lookup cache semantik dipakai ulang oleh retriever, bukan di-embed kedua kali
+        embeddings = self.engine.embeddings
+        if isinstance(embeddings, PrewarmedEmbeddings):
+            return embeddings.reuse(query, query_embedding)
+        return contextlib.nullcontext()
+
+    def _remember(self, query, answer, query_embedding):
+        if self.answer_cache is not None:
+            self.answer_cache.put(query, answer, embedding=query_embedding)
+
+    def _new_trace(self, query):
+        return RequestTrace(query) if self.telemetry is not None else None
+
+    def _finish(self, trace, result=None, error=None):
+        with self._served_lock:
+            self._served["total"] += 1
+            if result is not None and result["cached"]:
+                self._served[result["cached"] if result["cached"] in ("faq", "coalesced") else "cache"] += 1
+        if trace is None:
+            return
+        if error is not None:
+            self.telemetry.record(trace.record(error=error))
+            return
+        if result["cached"] in ("faq", "coalesced"):
+            status = result["cached"]
+        elif result["cached"]:
+            status = "cached"
+        else:
+            status = "ok" if result["found"] else "not_found"
+        self.telemetry.record(trace.record(status=status, cached=result["cached"]))
+
+    def _shared(self, result, started):
+        return self._result(result["answer"], result["found"], result["sources"], "coalesced", started)
+
+    def _condense(self, query, history, trace):
+        if self.condenser is None or not history:
+            return query
+        started = time.perf_counter()
+        question = self.condenser.condense(query, history)
+        if trace is not None:
+            trace.add_span("condense", time.perf_counter() - started)
+        return question
+
+    async def _acondense(self, query, history, trace):
+        if self.condenser is None or not history:
+            return query
+        started = time.perf_counter()
+        question = await self.condenser.acondense(query, history)
+        if trace is not None:
+            trace.add_span("condense", time.perf_counter() - started)
+        return question
+
+    def answer(self, query, stream_handler=None, history=None):
+        """Jawab secara sinkron; token diteruskan ke stream_handler jika ada.
+
+        history = ConversationMemory.history() untuk pertanyaan lanjutan.
+        """
+        self.engine.corpus.check()
+        trace = self._new_trace(query)
+        started = time.perf_counter()
+        try:
+            question = self._condense(query, history, trace)
+            if self.flight is None:
+                result = self._answer(question, trace, stream_handler)
+            else:
+                result, shared = self.flight.do(
+                    normalize_query(question), lambda: self._answer(question, trace, stream_handler)
+                )
+                if shared:
+                    result = self._shared(result, started)
+        except Exception as e:
+            self._finish(trace, error=e)
+            raise
+        result["question"] = question
+        self._finish(trace, result=result)
+        return result
+
+    def _answer(self, query, trace, stream_handler):
+        started = time.perf_counter()
+        fast = self._faq(query, started, trace)
+        if fast is not None:
+            return fast
+        cached, tier = self._cached(query, None)
+        query_embedding = None
+        embed_seconds = 0.0
+        if cached is None and self.answer_cache is not None:
+            mark = time.perf_counter()
+            query_embedding = self.engine.embeddings.embed_query(query)
+            embed_seconds = time.perf_counter() - mark
+            cached, tier = self._cached(query, query_embedding)
+        if trace is not None:
+            # Embedding query dicatat sebagai span "embed" sendiri, bukan bagian lookup cache
+            trace.add_span("embed", embed_seconds)
+            trace.add_span("cache_lookup", time.perf_counter() - started - embed_seconds)
+        if cached is not None:
+            return self._result(cached, True, [], tier, started)
+
+        callbacks = [FirstTokenTimer(self.ttft_stats)]
+        if trace is not None:
+            callbacks.append(trace)
+        if stream_handler is not None:
+            callbacks.append(stream_handler)
+        chain_started = time.perf_counter()
+        with self._reuse_embedding(query, query_embedding):
+            result = self.engine.qa.invoke({"query": query}, config={"callbacks": callbacks})
+        chain_ms = round((time.perf_counter() - chain_started) * 1000, 1)
+
+        sources = result.get("source_documents", [])
+        if not sources:
+            return self._result(NOT_FOUND_MESSAGE, False, [], None, started, chain_ms=chain_ms)
+        answer = clean_answer(result["result"])
+        # Penolakan model ("Maaf, ... tidak ditemukan") bukan jawaban: tidak disimpan di cache
+        found = not is_not_found(answer)
+        if found:
+            self._remember(query, answer, query_embedding)
+        return self._result(
+            answer, found, [doc.metadata.get("Question") for doc in sources], None, started,
+            chain_ms=chain_ms
+        )
+
+    async def aanswer(self, query, callbacks=None, history=None):
+        """Jawab lewat jalur async (AsyncAnswerer, concurrency dibatasi)"""
+        await self._acheck_corpus()
+        trace = self._new_trace(query)
+        started = time.perf_counter()
+        try:
+            question = await self._acondense(query, history, trace)
+            if self.async_flight is None:
+                result = await self._aanswer(question, trace, callbacks)
+            else:
+                result, shared = await self.async_flight.do(
+                    normalize_query(question), lambda: self._aanswer(question, trace, callbacks)
+                )
+                if shared:
+                    result = self._shared(result, started)
+        except Exception as e:
+            self._finish(trace, error=e)
+            raise
+        result["question"] = question
+        self._finish(trace, result=result)
+        return result
+
+    async def _aanswer(self, query, trace, callbacks):
+        started = time.perf_counter()
+        fast = self._faq(query, started, trace)
+        if fast is not None:
+            return fast
+        cached, tier = self._cached(query, None)
+        query_embedding = None
+        embed_seconds = 0.0
+        if cached is None and self.answer_cache is not None:
+            mark = time.perf_counter()
+            query_embedding = await self.engine.embeddings.aembed_query(query)
+            embed_seconds = time.perf_counter() - mark
+            cached, tier = self._cached(query, query_embedding)
+        if trace is not None:
+            # Embedding query dicatat sebagai span "embed" sendiri, bukan bagian lookup cache
+            trace.add_span("embed", embed_seconds)
+            trace.add_span("cache_lookup", time.perf_counter() - started - embed_seconds)
+        if cached is not None:
+            return self._result(cached, True, [], tier, started)
+
+        callbacks = [FirstTokenTimer(self.ttft_stats)] + list(callbacks or [])
+        if trace is not None:
+            callbacks.append(trace)
+        with self._reuse_embedding(query, query_embedding):
+            result = await self.async_answerer.answer(query, callbacks=callbacks)
+        found = bool(result["sources"]) and not is_not_found(result["answer"])
+        if found:
+            self._remember(query, result["answer"], query_embedding)
+        return self._result(
+            result["answer"], found, result["sources"], None, started,
+            queue_ms=round(result["queue_seconds"] * 1000, 1),
+            chain_ms=round(result["seconds"] * 1000, 1)
+        )
+
+    async def astream(self, query, history=None):
+        """Async generator event {"token": ...} lalu satu event {"done": True, ...hasil}"""
+        queue = asyncio.Queue()
+        task = asyncio.create_task(self.aanswer(query, callbacks=[TokenQueue(queue)], history=history))
+        while True:
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                yield {"token": getter.result()}
+                continue
+            getter.cancel()
+            break
+        while not queue.empty():
+            yield {"token": queue.get_nowait()}
+        yield {"done": True, **task.result()}
+
+    def warm_up(self):
+        """Pemanasan sinkron (warmup.py); dipanggil sekali sebelum menerima traffic"""
+        if not config.WARMUP_ENABLED:
+            return None
+        questions = warmup_questions()
+        self._warm_question = questions[0] if questions else None
+        self.warmup = warm_up(self.engine, questions, concurrency=config.WARMUP_CONCURRENCY)
+        if self.telemetry is not None:
+            self.telemetry.set_startup("warmup", self.warmup["seconds"])
+        return self.warmup
+
+    async def awarm_up(self):
+        """Bangun jalur async di event loop server; jalankan setelah warm_up"""
+        if self._warm_question is None:
+            return
+        seconds = await awarm_up(self.async_answerer, self._warm_question)
+        self.warmup["seconds"]["async"] = seconds
+        if self.telemetry is not None:
+            self.telemetry.set_startup("warmup", {"async": seconds})
+
+    def metrics(self):
+        """Metrik format teks Prometheus, None jika telemetry mati"""
+        return self.telemetry.render_prometheus() if self.telemetry is not None else None
+
+    def _served_without_llm(self):
+        with self._served_lock:
+            served = dict(self._served)
+        total = served.get("total", 0)
+        without_llm = served.get("faq", 0) + served.get("cache", 0) + served.get("coalesced", 0)
+        return {
+            "requests": total,
+            "faq": served.get("faq", 0),
+            "cache": served.get("cache", 0),
+            "coalesced": served.get("coalesced", 0),
+            "share": without_llm / total if total else 0.0,
+        }
+
+    def stats(self):
+        return {
+            "engine_build_ms": round(self.engine.build_seconds * 1000, 1),
+            "startup": {
+                "engine_ms": {stage: round(seconds * 1000, 1) for stage, seconds in self.engine.timings.items()},
+                "warmup": self.warmup,
+            },
+            "latency": self.latency_stats.summary(),
+            "time_to_first_token": self.ttft_stats.summary(),
+            "answer_cache": self.answer_cache.stats() if self.answer_cache else None,
+            "faq_fast_path": self.faq_index.stats() if self.faq_index else None,
+            "corpus": self.engine.corpus.stats(),
+            "topic_router": self.engine.topic_router.stats() if self.engine.topic_router else None,
+            "context": self.engine.context_builder.stats() if self.engine.context_builder else None,
+            "retrieval_cache": self.engine.retrieval_cache.stats() if self.engine.retrieval_cache else None,
+            "shards": self.engine.shards.stats() if self.engine.shards else None,
+            "vector_storage": (
+                self.engine.vector_store.stats() if hasattr(self.engine.vector_store, "stats") else None
+            ),
+            "model_routing": self.engine.model_router.stats() if self.engine.model_router else None,
+            "coalescing": {
+                "sync": self.flight.stats(),
+                "async": self.async_flight.stats(),
+            } if self.flight else None,
+            "rate_limit": self.rate_limiter.stats() if self.rate_limiter else None,
+            "memory": self.condenser.stats() if self.condenser else None,
+            "served_without_llm": self._served_without_llm(),
+            "embedding_cache": (
+                self.engine.embeddings.stats() if hasattr(self.engine.embeddings, "stats") else None
+            ),
+            "async": self._async_answerer.stats() if self._async_answerer else None,
+        }
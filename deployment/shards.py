@@ -0,0 +1,416 @@
+"""Sharding korpus: beberapa koleksi / index bernama dicari paralel.
+
+Korpus FAQ, regulasi (PDF dari "Link PDF:") dan panduan SPT per tahun bisa
+disimpan di koleksi Atlas (atau index lokal) terpisah, masing-masing dengan
+vector index sendiri. Konfigurasi lewat ASTRAX_SHARDS (JSON):
+    {"faq": {},
+     "regulasi": {"collection": "Astrax_regulasi", "k": 2, "timeout": 1.5, "boost": -0.02},
+     "spt_2024": {"collection": "Astrax_spt_2024", "index": "vector_index", "k": 2, "filters": []}}
+Shard tanpa "collection"/"path" memakai koleksi utama engine (Astrax_db.Astrax);
+backend lokal memakai {"path": "../data/index/regulasi"}.
+
+- Fan-out paralel (thread pool; asyncio.gather di jalur async), tiap shard
+  mengambil k miliknya sendiri (default: k request)
+- Timeout per shard dihitung dari awal fan-out; shard yang terlambat atau
+  gagal dilewati dan dicatat di stats. Atlas juga menerima maxTimeMS agar
+  query di server ikut dihentikan
+- Merge: score_threshold tetap berlaku per shard atas skor mentah, lalu skor
+  dibuat sebanding antar shard (ASTRAX_SHARD_NORMALIZATION), ditambah boost
+  shard, dan diambil top-k gabungan:
+    none   : skor mentah (1 + cosine) / 2; tepat jika semua shard memakai
+             model embedding dan gaya chunk yang sama
+    zscore : z-score terhadap distribusi skor shard itu sendiri (mean/std
+             berjalan; statistik gabungan semua shard sebelum sampel cukup),
+             untuk shard dengan model embedding / chunking berbeda
+  boost berupa selisih skor pada mode none, satuan std pada mode zscore.
+  Normalisasi min-max per query tidak dipakai: dokumen terbaik shard yang
+  tidak relevan selalu ikut bernilai 1. metadata "score" tetap skor mentah,
+  "shard" dan "shard_score" ditambahkan
+- pre_filter (routing topik) hanya diteruskan ke shard yang field-nya
+  terdaftar di "filters" (default ["Topik"]); shard lain dicari tanpa filter
+
+Demo lokal (FAQ biasa vs FAQ berlampiran PDF + satu shard lambat):
+    python shards.py demo --slow-latency 0.5 --slow-timeout 0.2
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import config
+from retrieval_cache import Uncacheable, document_id
+from streaming import LatencyStats
+from topic_router import TOPIC_KEY
+
+
+NORMALIZATIONS = ("none", "zscore")
+
+
+class ShardsUnavailable(Exception):
+    """Tidak ada shard yang menjawab dalam batas waktunya"""
+
+
+class ScoreStats:
+    """Mean/variansi berjalan (Welford) skor yang dikembalikan satu shard"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, scores):
+        with self._lock:
+            for score in scores:
+                self.count += 1
+                delta = score - self.mean
+                self.mean += delta / self.count
+                self._m2 += delta * (score - self.mean)
+
+    @property
+    def std(self):
+        return (self._m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0.0
+
+    def summary(self):
+        return {"samples": self.count, "mean": round(self.mean, 4), "std": round(self.std, 4)}
+
+
+class Shard:
+    def __init__(self, name, search, asearch=None, k=None, timeout=2.0, boost=0.0, filters=(TOPIC_KEY,),
+                 spec=None):
+        self.name = name
+        self.search = search
+        self.asearch = asearch
+        self.k = k
+        self.timeout = timeout
+        self.boost = boost
+        self.filters = tuple(filters)
+        self.spec = spec or {}
+        self.scores = ScoreStats()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.latency = LatencyStats()
+
+    def filter_for(self, pre_filter):
+        pre_filter = {field: value for field, value in (pre_filter or {}).items() if field in self.filters}
+        return pre_filter or None
+
+    def count(self, outcome):
+        with self._lock:
+            self.calls += 1
+            if outcome == "timeout":
+                self.timeouts += 1
+            elif outcome == "error":
+                self.errors += 1
+
+    def stats(self):
+        return {
+            "k": self.k,
+            "timeout": self.timeout,
+            "boost": self.boost,
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "latency": self.latency.summary(),
+            "scores": self.scores.summary(),
+        }
+
+
+def _score(doc):
+    return doc.metadata.get("score") or 0.0
+
+
+class ShardedSearch:
+    """search / asearch dengan signature yang sama seperti engine.search_by_vector"""
+
+    def __init__(self, shards, max_workers=None, normalization="none", min_samples=50):
+        if normalization not in NORMALIZATIONS:
+            raise ValueError(f"Normalisasi tidak dikenal: {normalization} (pilih {', '.join(NORMALIZATIONS)})")
+        self.shards = list(shards)
+        self.normalization = normalization
+        self.min_samples = min_samples
+        self.pooled = ScoreStats()
+        # Thread tambahan agar shard yang melewati timeout tidak menahan request berikutnya
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers or 4 * len(self.shards), thread_name_prefix="astrax-shard"
+        )
+        self._lock = threading.Lock()
+        self.partial = 0
+
+    def _run(self, shard, query_vector, k, score_threshold, pre_filter):
+        started = time.perf_counter()
+        documents = shard.search(query_vector, shard.k or k, score_threshold, shard.filter_for(pre_filter))
+        shard.latency.record(time.perf_counter() - started)
+        return documents
+
+    async def _arun(self, shard, query_vector, k, score_threshold, pre_filter):
+        started = time.perf_counter()
+        args = (query_vector, shard.k or k, score_threshold, shard.filter_for(pre_filter))
+        if shard.asearch is not None:
+            documents = await shard.asearch(*args)
+        else:
+            documents = await asyncio.to_thread(shard.search, *args)
+        shard.latency.record(time.perf_counter() - started)
+        return documents
+
+    def _collect(self, outcomes, k):
+        """outcomes: [(shard, daftar Document | Exception)] -> hasil merge"""
+        results, errors = [], []
+        for shard, outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                timed_out = isinstance(outcome, (FutureTimeout, asyncio.TimeoutError))
+                shard.count("timeout" if timed_out else "error")
+                if not timed_out:
+                    errors.append(outcome)
+                continue
+            shard.count("ok")
+            results.append((shard, outcome))
+        if not results:
+            if errors:
+                raise errors[0]
+            raise ShardsUnavailable(f"Tidak ada shard yang menjawab ({len(outcomes)} shard)")
+        merged = self.merge(results, k)
+        if len(results) < len(outcomes):
+            with self._lock:
+                self.partial += 1
+            # Hasil sebagian tidak dibekukan di retrieval cache
+            return Uncacheable(merged)
+        return merged
+
+    def normalizer(self, shard):
+        """Statistik (mean, std) untuk z-score shard; None = skor mentah"""
+        if self.normalization == "none":
+            return None
+        for stats in (shard.scores, self.pooled):
+            if stats.count >= self.min_samples and stats.std > 0:
+                return stats.mean, stats.std
+        if self.pooled.count > 1 and self.pooled.std > 0:
+            return self.pooled.mean, self.pooled.std
+        return None
+
+    def merge(self, results, k):
+        """[(shard, [Document])] -> top-k gabungan berdasarkan skor ternormalisasi + boost shard"""
+        merged = {}
+        for shard, documents in results:
+            normalizer = self.normalizer(shard)
+            for doc in documents:
+                normalized = _score(doc) if normalizer is None else (_score(doc) - normalizer[0]) / normalizer[1]
+                doc.metadata["shard"] = shard.name
+                doc.metadata["shard_score"] = round(normalized + shard.boost, 6)
+                # Chunk yang sama di dua shard cukup muncul sekali
+                key = document_id(doc)
+                current = merged.get(key)
+                if current is None or doc.metadata["shard_score"] > current.metadata["shard_score"]:
+                    merged[key] = doc
+        # Statistik diperbarui setelah merge: skor query ini tidak menormalisasi dirinya sendiri
+        for shard, documents in results:
+            scores = [_score(doc) for doc in documents]
+            shard.scores.update(scores)
+            self.pooled.update(scores)
+        ranked = sorted(merged.values(), key=lambda doc: (doc.metadata["shard_score"], _score(doc)), reverse=True)
+        return ranked[:k]
+
+    def search(self, query_vector, k, score_threshold=None, pre_filter=None):
+        started = time.perf_counter()
+        futures = [
+            (shard, self._pool.submit(self._run, shard, query_vector, k, score_threshold, pre_filter))
+            for shard in self.shards
+        ]
+        outcomes = []
+        for shard, future in futures:
+            remaining = shard.timeout - (time.perf_counter() - started)
+            try:
+                outcomes.append((shard, future.result(timeout=max(0.0, remaining))))
+            except Exception as e:
+                future.cancel()
+                outcomes.append((shard, e))
+        return self._collect(outcomes, k)
+
+    async def asearch(self, query_vector, k, score_threshold=None, pre_filter=None):
+        calls = [
+            asyncio.wait_for(self._arun(shard, query_vector, k, score_threshold, pre_filter), shard.timeout)
+            for shard in self.shards
+        ]
+        outcomes = await asyncio.gather(*calls, return_exceptions=True)
+        return self._collect(list(zip(self.shards, outcomes)), k)
+
+    def attach_async(self, factory):
+        """Pasang asearch per shard: factory(shard) -> fungsi async atau None (pakai thread)"""
+        for shard in self.shards:
+            shard.asearch = factory(shard)
+
+    def stats(self):
+        return {
+            "partial_results": self.partial,
+            "pooled_scores": self.pooled.summary(),
+            "shards": {shard.name: shard.stats() for shard in self.shards},
+        }
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+SPEC_KEYS = ("collection", "path", "db", "index", "k", "timeout", "boost", "filters")
+
+
+def load_shard_specs(text=None):
+    """JSON ASTRAX_SHARDS -> {nama: spec}; kosong = tanpa sharding.
+
+    Key yang tidak dikenal (mis. salah ketik "weight" untuk "boost") ditolak,
+    bukan diabaikan diam-diam.
+    """
+    text = config.SHARDS if text is None else text
+    specs = json.loads(text) if text else {}
+    for name, spec in specs.items():
+        unknown = sorted(set(spec) - set(SPEC_KEYS))
+        if unknown:
+            raise ValueError(f"Shard {name}: key tidak dikenal {', '.join(unknown)} (pilih {', '.join(SPEC_KEYS)})")
+    return specs
+
+
+def create_shard(name, spec, search):
+    return Shard(
+        name,
+        search,
+        k=spec.get("k"),
+        timeout=spec.get("timeout", config.SHARD_TIMEOUT),
+        boost=spec.get("boost", 0.0),
+        filters=spec.get("filters", (TOPIC_KEY,)),
+        spec=spec
+    )
+
+
+def create_sharded_search(engine, specs, text_key="text"):
+    """ShardedSearch atas koleksi Atlas / index lokal engine; search_by_vector engine = shard utama"""
+    shards = []
+    for name, spec in specs.items():
+        if engine.retriever_backend == "local":
+            if spec.get("path"):
+                from quantization import open_local_index
+
+                search = open_local_index(spec["path"]).documents
+            else:
+                search = engine.search_by_vector
+        else:
+            from engine import DB_NAME, COLLECTION_NAME, INDEX_NAME, atlas_search_by_vector
+
+            collection = engine.mongo_client[spec.get("db", DB_NAME)][spec.get("collection", COLLECTION_NAME)]
+            timeout = spec.get("timeout", config.SHARD_TIMEOUT)
+
+            def search(query_vector, k, score_threshold=None, pre_filter=None,
+                       collection=collection, index_name=spec.get("index", INDEX_NAME), timeout=timeout):
+                return atlas_search_by_vector(
+                    collection, query_vector, k, score_threshold, pre_filter,
+                    text_key=text_key, index_name=index_name, max_time_ms=int(timeout * 1000)
+                )
+        shards.append(create_shard(name, spec, search))
+    return ShardedSearch(
+        shards, normalization=config.SHARD_NORMALIZATION, min_samples=config.SHARD_CALIBRATION_SAMPLES
+    )
+
+
+def _write_csv(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["Question", "Answer"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run_demo(args):
+    from benchmark import build_question_set, load_faq, summarize
+    from fakes import FakeEmbeddings, create_fake_index
+
+    rows = load_faq(args.csv)
+    workdir = tempfile.mkdtemp(prefix="astrax-shards-")
+    embeddings = FakeEmbeddings(dimensions=1536, dense=True)
+    parts = {
+        "faq": [row for row in rows if "Link PDF" not in row["Answer"]],
+        "pdf": [row for row in rows if "Link PDF" in row["Answer"]],
+    }
+    indexes = {}
+    for name, part in parts.items():
+        csv_path = os.path.join(workdir, f"{name}.csv")
+        _write_csv(csv_path, [{"Question": row["Question"], "Answer": row["Answer"]} for row in part])
+        indexes[name] = create_fake_index(csv_path, os.path.join(workdir, name), embeddings)
+
+    def slow(search, latency):
+        def search_slowly(*search_args):
+            time.sleep(latency)
+            return search(*search_args)
+        return search_slowly
+
+    unslowed = {"faq": indexes["faq"].documents, "pdf": indexes["pdf"].documents, "lambat": indexes["faq"].documents}
+
+    def build(slow_timeout, normalization):
+        return ShardedSearch([
+            Shard("faq", slow(unslowed["faq"], args.latency), k=args.k, timeout=args.timeout),
+            Shard("pdf", slow(unslowed["pdf"], args.latency), k=2, timeout=args.timeout),
+            Shard("lambat", slow(unslowed["lambat"], args.slow_latency), k=args.k, timeout=slow_timeout),
+        ], normalization=normalization, min_samples=args.min_samples)
+
+    def top_question(documents):
+        return documents[0].metadata.get("Question", "").strip() if documents else None
+
+    # Pertanyaan kalibrasi (seed lain) mengisi statistik skor tiap shard sebelum diukur
+    calibration = embeddings.embed_documents(
+        [item["query"] for item in build_question_set(rows, args.size, seed=7, perturbed=True)]
+    )
+    questions = build_question_set(rows, args.size, seed=42, perturbed=True)
+    queries = embeddings.embed_documents([item["query"] for item in questions])
+    runs = [(f"sequential_{mode}", 60.0, False, mode) for mode in NORMALIZATIONS]
+    runs += [("parallel", 60.0, True, args.normalization), ("parallel_timeout", args.slow_timeout, True, args.normalization)]
+    for label, slow_timeout, parallel, normalization in runs:
+        sharded = build(slow_timeout, normalization)
+        for query in calibration:
+            sharded.merge([(shard, unslowed[shard.name](query, shard.k, args.score_threshold))
+                           for shard in sharded.shards], args.k)
+        latencies, mix, hits = [], {}, 0
+        for query, item in zip(queries, questions):
+            started = time.perf_counter()
+            if parallel:
+                documents = sharded.search(query, args.k, args.score_threshold)
+            else:
+                documents = sharded.merge(
+                    [(shard, sharded._run(shard, query, args.k, args.score_threshold, None))
+                     for shard in sharded.shards], args.k
+                )
+            latencies.append(time.perf_counter() - started)
+            hits += top_question(documents) == item["expected"]
+            for doc in documents:
+                mix[doc.metadata["shard"]] = mix.get(doc.metadata["shard"], 0) + 1
+        sharded.close()
+        print(json.dumps({
+            "run": label, "normalization": normalization, **summarize(latencies),
+            "hit@1": round(hits / len(queries), 3), "merged_from": mix,
+            "timeouts": {shard.name: shard.timeouts for shard in sharded.shards if shard.timeouts},
+        }, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval multi-shard Astrax")
+    sub = parser.add_subparsers(dest="command", required=True)
+    demo = sub.add_parser("demo", help="Fan-out lokal: FAQ vs lampiran PDF + shard lambat")
+    demo.add_argument("--csv", default=config.FAQ_CSV_PATH)
+    demo.add_argument("--size", type=int, default=50, help="Jumlah pertanyaan")
+    demo.add_argument("--k", type=int, default=3)
+    demo.add_argument("--score-threshold", type=float)
+    demo.add_argument("--latency", type=float, default=0.05, help="Latensi simulasi shard normal (detik)")
+    demo.add_argument("--timeout", type=float, default=1.0)
+    demo.add_argument("--slow-latency", type=float, default=0.5)
+    demo.add_argument("--slow-timeout", type=float, default=0.2)
+    demo.add_argument("--normalization", choices=NORMALIZATIONS, default=config.SHARD_NORMALIZATION)
+    demo.add_argument("--min-samples", type=int, default=config.SHARD_CALIBRATION_SAMPLES,
+                      help="Sampel skor sebelum z-score per shard")
+    args = parser.parse_args()
+    run_demo(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Single-flight: pertanyaan identik (setelah normalize_query) yang sedang
+diproses bersamaan hanya dihitung sekali.
+
+Request pertama menjadi leader dan menjalankan embedding + vector search +
+LLM; request lain dengan kunci yang sama menunggu lalu memakai hasil (atau
+exception) yang sama. Setelah selesai kunci dilepas, request berikutnya
+kembali ke jalur biasa (answer cache dll).
+
+SingleFlight untuk thread (sesi Streamlit), AsyncSingleFlight untuk satu
+event loop (server API).
+"""
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Counters:
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+
+    def stats(self, in_flight):
+        total = self.leaders + self.coalesced
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": in_flight,
+            "coalesced_rate": self.coalesced / total if total else 0.0,
+        }
+
+
+class SingleFlight(_Counters):
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """(hasil fn, True jika hasil dipakai bersama dari leader lain)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def stats(self):
+        with self._lock:
+            return super().stats(len(self._calls))
+
+
+class AsyncSingleFlight(_Counters):
+    def __init__(self):
+        super().__init__()
+        self._tasks = {}
+
+    async def do(self, key, coroutine_fn):
+        task = self._tasks.get(key)
+        if task is not None:
+            self.coalesced += 1
+            # shield: waiter yang dibatalkan tidak ikut membatalkan komputasi bersama
+            return await asyncio.shield(task), True
+
+        self.leaders += 1
+        task = asyncio.ensure_future(coroutine_fn())
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return await asyncio.shield(task), False
+
+    def stats(self):
+        return super().stats(len(self._tasks))
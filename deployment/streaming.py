@@ -0,0 +1,94 @@
+"""Streaming token LLM ke chat bubble Streamlit"""
+import threading
+import time
+
+from langchain_core.callbacks import AsyncCallbackHandler, BaseCallbackHandler
+
+from postprocess import IncrementalCleaner
+
+CURSOR = "▌"
+
+
+class LatencyStats:
+    """Ringkasan latensi (ms) dalam satu proses, mis. time-to-first-token"""
+
+    def __init__(self, max_samples=1000):
+        self.max_samples = max_samples
+        self._samples = []
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds * 1000)
+            if len(self._samples) > self.max_samples:
+                del self._samples[0]
+
+    def summary(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            last = self._samples[-1] if self._samples else None
+        if not samples:
+            return {"count": 0}
+        return {
+            "count": len(samples),
+            "p50_ms": round(percentile(samples, 50), 1),
+            "p95_ms": round(percentile(samples, 95), 1),
+            "last_ms": round(last, 1),
+        }
+
+
+def percentile(sorted_samples, pct):
+    index = min(len(sorted_samples) - 1, int(round(pct / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+class StreamHandler(BaseCallbackHandler):
+    """Callback LangChain yang meneruskan token ke fungsi render.
+
+    render dipanggil dengan teks yang sudah dibersihkan (clean_answer
+    inkremental) setiap kali token baru datang.
+    """
+
+    def __init__(self, render, ttft_stats=None):
+        self.render = render
+        self.ttft_stats = ttft_stats
+        self.cleaner = IncrementalCleaner()
+        self.started = time.perf_counter()
+        self.first_token_seconds = None
+
+    def on_llm_new_token(self, token, **kwargs):
+        if self.first_token_seconds is None:
+            self.first_token_seconds = time.perf_counter() - self.started
+            if self.ttft_stats is not None:
+                self.ttft_stats.record(self.first_token_seconds)
+        self.render(self.cleaner.feed(token) + CURSOR)
+
+    def finish(self):
+        """Teks final (identik dengan clean_answer atas jawaban lengkap)"""
+        answer = self.cleaner.finish()
+        self.render(answer)
+        return answer
+
+
+class FirstTokenTimer(BaseCallbackHandler):
+    """Catat time-to-first-token ke LatencyStats tanpa merender apa pun"""
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.started = time.perf_counter()
+        self.recorded = False
+
+    def on_llm_new_token(self, token, **kwargs):
+        if not self.recorded:
+            self.recorded = True
+            self.stats.record(time.perf_counter() - self.started)
+
+
+class TokenQueue(AsyncCallbackHandler):
+    """Teruskan token mentah ke asyncio.Queue (untuk endpoint streaming)"""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    async def on_llm_new_token(self, token, **kwargs):
+        await self.queue.put(token)
@@ -0,0 +1,319 @@
+"""Tracing dan metrik per request untuk chain Astrax.
+
+RequestTrace (callback LangChain) mencatat durasi span chain / retriever /
+LLM, di dalam retriever juga embed query dan vector search secara terpisah
+(custom event "spans"), time-to-first-token, jumlah token, skor dokumen
+yang diambil dan kelas error. Hasilnya dikumpulkan di
+MetricsRegistry yang bisa diekspor dalam format teks Prometheus dan/atau
+ditulis per request ke file JSONL.
+
+Diaktifkan lewat environment variable, tanpa perubahan kode:
+    ASTRAX_TELEMETRY=prometheus,jsonl
+    ASTRAX_TELEMETRY_JSONL=../data/telemetry/requests.jsonl
+    ASTRAX_METRICS_PORT=9464   # /metrics untuk proses Streamlit (127.0.0.1)
+
+Teks pertanyaan tidak ditulis ke JSONL kecuali ASTRAX_TELEMETRY_QUERY=raw;
+default hanya hash-nya (pertanyaan yang sama tetap bisa dikelompokkan).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.callbacks import BaseCallbackHandler, adispatch_custom_event, dispatch_custom_event
+
+import config
+from normalization import normalize_query
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+SCORE_BUCKETS = (0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 1.0)
+
+
+def query_fields(query, mode=None):
+    """Field pertanyaan untuk satu baris JSONL sesuai ASTRAX_TELEMETRY_QUERY"""
+    mode = mode or config.TELEMETRY_QUERY
+    if query is None or mode == "off":
+        return {}
+    if mode == "raw":
+        return {"query": query}
+    return {"query_hash": hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()[:16]}
+
+
+def report_spans(run_manager, **seconds):
+    """Durasi tahap di dalam retriever (embed, vector_search) dikirim ke RequestTrace (custom event "spans")"""
+    if run_manager is not None:
+        dispatch_custom_event("spans", seconds, config={"callbacks": run_manager.get_child()})
+
+
+async def areport_spans(run_manager, **seconds):
+    if run_manager is not None:
+        await adispatch_custom_event("spans", seconds, config={"callbacks": run_manager.get_child()})
+
+
+class RequestTrace(BaseCallbackHandler):
+    """Callback yang merekam satu request (dipasang per invoke)"""
+
+    def __init__(self, query=None):
+        self.request_id = uuid.uuid4().hex[:12]
+        self.query = query
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.tokens = {"prompt": 0, "completion": 0}
+        self.scores = []
+        self.first_token_seconds = None
+        self.error_class = None
+        self.context = None
+        self.route = None
+        self._open = {}
+
+    def add_span(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def _start(self, run_id, name):
+        self._open[run_id] = (name, time.perf_counter())
+
+    def _end(self, run_id):
+        name, started = self._open.pop(run_id, (None, None))
+        if name is not None:
+            self.add_span(name, time.perf_counter() - started)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        if parent_run_id is None:
+            self._start(run_id, "chain")
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self.error_class = type(error).__name__
+        self._end(run_id)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        # Retriever bertingkat (mis. hybrid -> vector) dihitung sekali di level terluar
+        if self._open.get(parent_run_id, (None,))[0] != "retriever":
+            self._start(run_id, "retriever")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        if run_id not in self._open:
+            return
+        self._end(run_id)
+        self.scores.extend(
+            float(doc.metadata["score"]) for doc in documents if "score" in doc.metadata
+        )
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self.error_class = type(error).__name__
+        self._end(run_id)
+
+    def on_custom_event(self, name, data, *, run_id, **kwargs):
+        if name == "context_report":
+            self.context = data
+        elif name == "model_route":
+            self.route = data
+        elif name == "spans":
+            for span, seconds in data.items():
+                self.add_span(span, seconds)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, "llm")
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, "llm")
+
+    def on_llm_new_token(self, token, **kwargs):
+        if self.first_token_seconds is None:
+            self.first_token_seconds = time.perf_counter() - self.started
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end(run_id)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage:
+            self.tokens["prompt"] += usage.get("prompt_tokens", 0)
+            self.tokens["completion"] += usage.get("completion_tokens", 0)
+            return
+        # Mode streaming: usage ada di usage_metadata pesan
+        for generations in response.generations:
+            for generation in generations:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                self.tokens["prompt"] += metadata.get("input_tokens", 0)
+                self.tokens["completion"] += metadata.get("output_tokens", 0)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self.error_class = type(error).__name__
+        self._end(run_id)
+
+    def record(self, status="ok", error=None, **extra):
+        """Ringkasan request sebagai dict (satu baris JSONL)"""
+        if error is not None:
+            self.error_class = type(error).__name__
+            status = "error"
+        return {
+            "request_id": self.request_id,
+            **query_fields(self.query),
+            "timestamp": time.time(),
+            "status": status,
+            "error_class": self.error_class,
+            "total_seconds": round(time.perf_counter() - self.started, 4),
+            "time_to_first_token_seconds": (
+                round(self.first_token_seconds, 4) if self.first_token_seconds is not None else None
+            ),
+            "spans": {name: round(seconds, 4) for name, seconds in self.spans.items()},
+            "tokens": dict(self.tokens),
+            "scores": [round(score, 4) for score in self.scores],
+            "context": self.context,
+            "route": self.route,
+            **extra,
+        }
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.total += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRegistry:
+    def __init__(self, jsonl_path=None):
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.tokens = defaultdict(int)
+        self.routes = defaultdict(int)
+        self.route_cost = defaultdict(float)
+        self.spans = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.scores = Histogram(SCORE_BUCKETS)
+        self.startup = {}
+        if jsonl_path:
+            os.makedirs(os.path.dirname(os.path.abspath(jsonl_path)), exist_ok=True)
+
+    def record(self, record):
+        with self._lock:
+            self.requests[record["status"]] += 1
+            if record.get("error_class"):
+                self.errors[record["error_class"]] += 1
+            for kind, count in record["tokens"].items():
+                self.tokens[kind] += count
+            self.spans["total"].observe(record["total_seconds"])
+            if record.get("time_to_first_token_seconds") is not None:
+                self.spans["first_token"].observe(record["time_to_first_token_seconds"])
+            for name, seconds in record["spans"].items():
+                self.spans[name].observe(seconds)
+            for score in record["scores"]:
+                self.scores.observe(score)
+            if record.get("route"):
+                key = (record["route"]["route"], record["route"]["model"])
+                self.routes[key] += 1
+                self.route_cost[key] += record["route"]["cost_usd"]
+            if record.get("context"):
+                self.tokens["context_saved"] += record["context"]["tokens_saved"]
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def observe_span(self, name, seconds):
+        """Span di luar request chain, mis. render chat di Streamlit"""
+        with self._lock:
+            self.spans[name].observe(seconds)
+
+    def set_startup(self, phase, seconds):
+        """Durasi startup per tahap, mis. phase="engine" {"mongodb": 1.2, "total": 3.4}"""
+        with self._lock:
+            for stage, value in seconds.items():
+                self.startup[(phase, stage)] = value
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            lines.append("# TYPE astrax_requests_total counter")
+            for status, count in sorted(self.requests.items()):
+                lines.append(f'astrax_requests_total{{status="{status}"}} {count}')
+            lines.append("# TYPE astrax_errors_total counter")
+            for error_class, count in sorted(self.errors.items()):
+                lines.append(f'astrax_errors_total{{error_class="{error_class}"}} {count}')
+            lines.append("# TYPE astrax_tokens_total counter")
+            for kind, count in sorted(self.tokens.items()):
+                lines.append(f'astrax_tokens_total{{type="{kind}"}} {count}')
+            lines.append("# TYPE astrax_model_requests_total counter")
+            for (route, model), count in sorted(self.routes.items()):
+                lines.append(f'astrax_model_requests_total{{route="{route}",model="{model}"}} {count}')
+            lines.append("# TYPE astrax_model_cost_usd_total counter")
+            for (route, model), cost in sorted(self.route_cost.items()):
+                lines.append(f'astrax_model_cost_usd_total{{route="{route}",model="{model}"}} {round(cost, 6)}')
+            lines.append("# TYPE astrax_startup_seconds gauge")
+            for (phase, stage), value in sorted(self.startup.items()):
+                lines.append(f'astrax_startup_seconds{{phase="{phase}",stage="{stage}"}} {round(value, 4)}')
+            lines.append("# TYPE astrax_span_duration_seconds histogram")
+            for name, histogram in sorted(self.spans.items()):
+                lines.extend(_histogram_lines("astrax_span_duration_seconds", histogram, f'span="{name}"'))
+            lines.append("# TYPE astrax_retrieval_score histogram")
+            lines.extend(_histogram_lines("astrax_retrieval_score", self.scores))
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name, histogram, labels=""):
+    prefix = f"{labels}," if labels else ""
+    lines = [
+        f'{name}_bucket{{{prefix}le="{bound}"}} {count}'
+        for bound, count in zip(histogram.buckets, histogram.counts)
+    ]
+    lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {histogram.total}")
+    lines.append(f"{name}_count{suffix} {histogram.count}")
+    return lines
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Registry metrik bersama dalam proses, None jika telemetry dimatikan"""
+    global _registry
+    if not config.TELEMETRY:
+        return None
+    with _registry_lock:
+        if _registry is None:
+            jsonl_path = config.TELEMETRY_JSONL_PATH if "jsonl" in config.TELEMETRY else None
+            _registry = MetricsRegistry(jsonl_path=jsonl_path)
+            if "prometheus" in config.TELEMETRY and config.METRICS_PORT:
+                start_metrics_server(_registry, config.METRICS_PORT)
+        return _registry
+
+
+def start_metrics_server(registry, port, host=None):
+    """Server /metrics di thread terpisah (untuk proses tanpa API, mis. Streamlit)"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host or config.METRICS_HOST, port), MetricsHandler)
+    except OSError:
+        # Port sudah dipakai (mis. proses lain sudah mengekspor metrik)
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
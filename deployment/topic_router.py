@@ -0,0 +1,222 @@
+"""Routing pertanyaan ke partisi topik (kolom Topik faq_categorization.csv).
+
+Setiap topik diwakili centroid embedding chunk-nya. Pertanyaan diarahkan
+ke topik dengan centroid terdekat (tanpa panggilan LLM, embedding query
+yang sama dipakai untuk vector search), lalu pencarian dibatasi ke
+partisi itu dengan pre-filter metadata {"Topik": ...}. Jika selisih
+kemiripan topik terbaik dan kedua terlalu kecil, atau partisi tidak
+menghasilkan dokumen, pencarian kembali ke seluruh koleksi.
+
+Atlas: tambahkan field filter pada definisi vector index:
+    {"type": "filter", "path": "Topik"}
+
+Evaluasi akurasi routing terhadap label FAQ:
+    python topic_router.py evaluate --index ../data/index/astrax
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+from langchain_core.retrievers import BaseRetriever
+
+import config
+from local_index import normalize_rows
+from telemetry import areport_spans, report_spans
+
+TOPIC_KEY = "Topik"
+
+
+class TopicRouter:
+    def __init__(self, topics, centroids, min_margin=0.02):
+        self.topics = list(topics)
+        self.centroids = normalize_rows(centroids)
+        self.min_margin = min_margin
+        self._lock = threading.Lock()
+        self.routed = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def from_vectors(cls, vectors, labels, **kwargs):
+        """Centroid per label dari vektor-vektor berlabel (label kosong diabaikan)"""
+        vectors = normalize_rows(vectors)
+        labels = np.asarray(labels, dtype=object)
+        topics = sorted({label for label in labels if label})
+        if len(topics) < 2:
+            return None
+        centroids = np.stack([vectors[labels == topic].mean(axis=0) for topic in topics])
+        return cls(topics, centroids, **kwargs)
+
+    def scores(self, query_vector):
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        return self.centroids @ (query / norm if norm else query)
+
+    def route(self, query_vector):
+        """(topik atau None jika kurang yakin, margin kemiripan terhadap topik kedua)"""
+        scores = self.scores(query_vector)
+        second, best = np.argsort(scores)[-2:]
+        margin = float(scores[best] - scores[second])
+        return (self.topics[best] if margin >= self.min_margin else None), margin
+
+    def count(self, routed):
+        with self._lock:
+            if routed:
+                self.routed += 1
+            else:
+                self.fallbacks += 1
+
+    def stats(self):
+        total = self.routed + self.fallbacks
+        return {
+            "topics": len(self.topics),
+            "min_margin": self.min_margin,
+            "routed": self.routed,
+            "fallbacks": self.fallbacks,
+            "routed_rate": self.routed / total if total else 0.0,
+        }
+
+
+def load_topic_vectors(engine, embedding_key="embedding"):
+    """(vektor, label Topik) semua chunk di vector store engine"""
+    if engine.retriever_backend == "local":
+        index = engine.vector_store
+        labels = [record.get("metadata", {}).get(TOPIC_KEY) for record in index.records]
+        return np.asarray(index.matrix), labels
+    vectors, labels = [], []
+    cursor = engine.collection.find({TOPIC_KEY: {"$exists": True}}, {embedding_key: 1, TOPIC_KEY: 1})
+    for doc in cursor:
+        vectors.append(doc[embedding_key])
+        labels.append(doc[TOPIC_KEY])
+    return np.asarray(vectors, dtype=np.float32), labels
+
+
+def create_topic_router(engine):
+    """TopicRouter dari corpus engine, None jika chunk belum berlabel Topik"""
+    vectors, labels = load_topic_vectors(engine)
+    if not len(vectors):
+        return None
+    return TopicRouter.from_vectors(vectors, labels, min_margin=config.TOPIC_ROUTER_MIN_MARGIN)
+
+
+class TopicRoutedRetriever(BaseRetriever):
+    """Embed query sekali, pilih topik, lalu vector search dengan pre-filter Topik.
+
+    search / asearch: fungsi (query_vector, k, score_threshold, pre_filter) -> [Document].
+    Tanpa asearch, search sinkron dijalankan di thread.
+    """
+
+    embeddings: object
+    router: TopicRouter
+    search: Callable
+    asearch: Optional[Callable] = None
+    search_kwargs: dict = {"k": 4}
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _search_args(self, query_vector):
+        return query_vector, self.search_kwargs.get("k", 4), self.search_kwargs.get("score_threshold")
+
+    def _finish(self, topic, documents):
+        self.router.count(bool(topic and documents))
+        if topic and documents:
+            for doc in documents:
+                doc.metadata["routed_topic"] = topic
+        return documents
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        started = time.perf_counter()
+        query_vector = self.embeddings.embed_query(query)
+        embedded = time.perf_counter()
+        topic, _ = self.router.route(query_vector)
+        args = self._search_args(query_vector)
+        documents = self.search(*args, {TOPIC_KEY: topic}) if topic else []
+        if not documents:
+            topic, documents = None, self.search(*args, None)
+        report_spans(run_manager, embed=embedded - started, vector_search=time.perf_counter() - embedded)
+        return self._finish(topic, documents)
+
+    async def _aget_relevant_documents(self, query, *, run_manager=None):
+        started = time.perf_counter()
+        query_vector = await self.embeddings.aembed_query(query)
+        embedded = time.perf_counter()
+        topic, _ = self.router.route(query_vector)
+        args = self._search_args(query_vector)
+        asearch = self.asearch or (lambda *a: asyncio.to_thread(self.search, *a))
+        documents = await asearch(*args, {TOPIC_KEY: topic}) if topic else []
+        if not documents:
+            topic, documents = None, await asearch(*args, None)
+        await areport_spans(run_manager, embed=embedded - started, vector_search=time.perf_counter() - embedded)
+        return self._finish(topic, documents)
+
+
+def create_routed_retriever(engine, router, search_kwargs, asearch=None):
+    return TopicRoutedRetriever(
+        embeddings=engine.embeddings,
+        router=router,
+        search=engine.search_by_vector,
+        asearch=asearch,
+        search_kwargs=search_kwargs
+    )
+
+
+def evaluate(index_path, csv_path, margins):
+    """Akurasi routing pertanyaan FAQ (Question -> Topik) untuk beberapa nilai margin"""
+    import csv
+
+    from fakes import FakeEmbeddings
+    from local_index import LocalVectorIndex
+
+    index = LocalVectorIndex(index_path)
+    labels = [record.get("metadata", {}).get(TOPIC_KEY) for record in index.records]
+    router = TopicRouter.from_vectors(np.asarray(index.matrix), labels)
+    if router is None:
+        raise SystemExit("Index belum berlabel Topik, jalankan ingest.py dengan --topics")
+    with open(csv_path, encoding="utf-8") as f:
+        rows = [row for row in csv.DictReader(f) if row.get("Question") and row.get(TOPIC_KEY)]
+
+    # Index buatan fakes.py memakai FakeEmbeddings, selain itu embedding OpenAI
+    if index.dimensions == FakeEmbeddings().dimensions:
+        embeddings = FakeEmbeddings()
+    else:
+        from ingest import EMBEDDING_DIMENSIONS, EMBEDDING_MODEL
+        from langchain_openai import OpenAIEmbeddings
+
+        embeddings = OpenAIEmbeddings(
+            model=EMBEDDING_MODEL, openai_api_key=config.OPENAI_KEY, dimensions=EMBEDDING_DIMENSIONS
+        )
+    vectors = embeddings.embed_documents([row["Question"] for row in rows])
+    routes = [router.route(vector) for vector in vectors]
+
+    report = []
+    for margin in margins:
+        routed = [
+            (router.topics[int(np.argmax(router.scores(vector)))], row[TOPIC_KEY])
+            for vector, row, (_, route_margin) in zip(vectors, rows, routes) if route_margin >= margin
+        ]
+        correct = sum(predicted == expected for predicted, expected in routed)
+        report.append({
+            "min_margin": margin,
+            "coverage": round(len(routed) / len(rows), 4),
+            "accuracy": round(correct / len(routed), 4) if routed else None,
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluasi topic router Astrax")
+    sub = parser.add_subparsers(dest="command", required=True)
+    evaluate_parser = sub.add_parser("evaluate")
+    evaluate_parser.add_argument("--index", default=config.LOCAL_INDEX_PATH)
+    evaluate_parser.add_argument("--csv", default=config.FAQ_TOPICS_CSV_PATH)
+    evaluate_parser.add_argument("--margins", default="0,0.01,0.02,0.05,0.1")
+    args = parser.parse_args()
+    margins = [float(value) for value in args.margins.split(",")]
+    print(json.dumps(evaluate(args.index, args.csv, margins), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Tahap pemanasan saat proses start, sebelum menerima traffic.
+
+Setelah engine dibangun (koneksi MongoDB sudah memilih server):
+1. pertanyaan yang paling sering muncul (kolom Question FAQ + query di log
+   telemetry JSONL) di-embed per batch secara paralel dan disimpan di
+   lookup memori (PrewarmedEmbeddings) yang dicek sebelum API embedding;
+   batch paralel sekaligus membuka koneksi keep-alive ke OpenAI di pool,
+2. satu retrieval dummy lewat rantai retriever engine (vector search,
+   routing topik, BM25, encoder tiktoken untuk budget konteks),
+3. jalur async (API) ikut dipanaskan di event loop server.
+
+Durasi tiap tahap dilaporkan di /stats dan metrik astrax_startup_seconds.
+API baru menjawab /ready = 200 setelah pemanasan selesai.
+"""
+import contextvars
+import csv
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+import config
+from context import get_encoding
+
+
+# (teks, vektor) query yang sudah di-embed di request berjalan (lihat PrewarmedEmbeddings.reuse)
+_request_vector = contextvars.ContextVar("astrax_request_vector", default=None)
+
+
+class PrewarmedEmbeddings(Embeddings):
+    """Lookup memori {teks pertanyaan: vektor} di depan embeddings lain"""
+
+    def __init__(self, underlying):
+        self.underlying = underlying
+        self.model = getattr(underlying, "model", type(underlying).__name__)
+        self.vectors = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reused = 0
+
+    def warm(self, texts, batch_size=100, concurrency=4):
+        """Embed teks yang belum ada di lookup, per batch secara paralel"""
+        texts = [text for text in dict.fromkeys(texts) if text not in self.vectors]
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for batch, vectors in zip(batches, pool.map(self.underlying.embed_documents, batches)):
+                # float32 ringkas di memori (~6 KB per pertanyaan untuk 1536 dimensi)
+                self.vectors.update(zip(batch, np.asarray(vectors, dtype=np.float32)))
+        return len(texts)
+
+    def evict(self, texts):
+        """Buang vektor teks yang tidak dipakai lagi (mis. potongan batch yang sudah dijawab)"""
+        with self._lock:
+            for text in texts:
+                self.vectors.pop(text, None)
+
+    @contextmanager
+    def reuse(self, text, vector):
+        """Selama blok, embed_query(text) memakai vektor ini (mis. embedding lookup cache jawaban).
+
+        Berlaku per konteks (thread / task asyncio), jadi tidak bocor ke request lain
+        dan tidak menambah isi lookup.
+        """
+        token = _request_vector.set((text, vector) if vector is not None else None)
+        try:
+            yield
+        finally:
+            _request_vector.reset(token)
+
+    def _get(self, text):
+        current = _request_vector.get()
+        if current is not None and current[0] == text:
+            with self._lock:
+                self.reused += 1
+            return list(current[1])
+        vector = self.vectors.get(text)
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text):
+        vector = self._get(text)
+        return vector if vector is not None else self.underlying.embed_query(text)
+
+    async def aembed_documents(self, texts):
+        return await self.underlying.aembed_documents(texts)
+
+    async def aembed_query(self, text):
+        vector = self._get(text)
+        return vector if vector is not None else await self.underlying.aembed_query(text)
+
+    def stats(self):
+        total = self.hits + self.misses
+        stats = {
+            "prewarmed_entries": len(self.vectors),
+            "prewarmed_hits": self.hits,
+            "prewarmed_hit_rate": self.hits / total if total else 0.0,
+            "request_vector_reused": self.reused,
+        }
+        if hasattr(self.underlying, "stats"):
+            stats.update(self.underlying.stats())
+        return stats
+
+    def close(self):
+        if hasattr(self.underlying, "close"):
+            self.underlying.close()
+
+
+def logged_queries(jsonl_path):
+    """Counter query yang berhasil dijawab dari log telemetry JSONL.
+
+    Hanya baris dengan teks query (ASTRAX_TELEMETRY_QUERY=raw); baris hash dilewati.
+    """
+    counts = Counter()
+    if not jsonl_path or not os.path.exists(jsonl_path):
+        return counts
+    with open(jsonl_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("query") and record.get("status") != "error":
+                counts[record["query"].strip()] += 1
+    return counts
+
+
+def frequent_questions(faq_csv_path, log_path=None, limit=500):
+    """Query log terbanyak lebih dulu, lalu kolom Question FAQ; unik, maksimal limit"""
+    questions = [query for query, _ in logged_queries(log_path).most_common()]
+    if faq_csv_path and os.path.exists(faq_csv_path):
+        with open(faq_csv_path, encoding="utf-8") as f:
+            questions += [(row.get("Question") or "").strip() for row in csv.DictReader(f)]
+    return [question for question in dict.fromkeys(questions) if question][:limit]
+
+
+def warm_up(engine, questions, concurrency=4):
+    """Panaskan engine (sinkron); hasilnya jumlah pertanyaan dan durasi per tahap (detik)"""
+    seconds = {}
+    started = time.perf_counter()
+
+    embedded = 0
+    if isinstance(engine.embeddings, PrewarmedEmbeddings) and questions:
+        embedded = engine.embeddings.warm(questions, concurrency=concurrency)
+    seconds["embeddings"] = time.perf_counter() - started
+
+    mark = time.perf_counter()
+    get_encoding()
+    if questions:
+        engine.retriever.invoke(questions[0])
+    seconds["retrieval"] = time.perf_counter() - mark
+
+    seconds["total"] = time.perf_counter() - started
+    return {"questions": len(questions), "embedded": embedded, "seconds": seconds}
+
+
+async def awarm_up(answerer, question):
+    """Bangun jalur async (AsyncMongoClient dll) dan jalankan satu retrieval dummy"""
+    started = time.perf_counter()
+    await answerer.qa.retriever.ainvoke(question)
+    return time.perf_counter() - started
+
+
+def warmup_questions():
+    return frequent_questions(
+        config.FAQ_CSV_PATH, config.WARMUP_LOG_PATH, limit=config.WARMUP_MAX_QUESTIONS
+    )